@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
@@ -13,6 +13,7 @@ router = APIRouter()
 class ChatRequest(BaseModel):
     message: str
     conversation_id: int | None = None
+    use_cache: bool = True
 
 
 class SentimentRequest(BaseModel):
@@ -27,7 +28,7 @@ class TopicsRequest(BaseModel):
 @router.post("/chat")
 def chat(req: ChatRequest, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
     svc = AIService(db)
-    return svc.chat(user.id, req.message, req.conversation_id)
+    return svc.chat(user.id, req.message, req.conversation_id, req.use_cache)
 
 
 @router.post("/sentiment")
@@ -43,7 +44,25 @@ def topics(req: TopicsRequest, db: Session = Depends(get_db)):
 
 
 @router.get("/conversations")
-def conversations(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+def conversations(
+    limit: int = 50, offset: int = 0, db: Session = Depends(get_db), user: User = Depends(get_current_user),
+):
     svc = AIService(db)
-    convs = svc.get_conversations(user.id)
-    return [{"id": c.id, "created_at": str(c.created_at)} for c in convs]
+    convs = svc.get_conversations(user.id, limit, offset)
+    return [
+        {"id": c.id, "title": c.title, "last_message": c.last_message, "message_count": c.message_count,
+         "created_at": str(c.created_at), "updated_at": str(c.updated_at)}
+        for c in convs
+    ]
+
+
+@router.get("/conversations/{conversation_id}/messages")
+def conversation_messages(
+    conversation_id: int, before: int | None = None, limit: int = 50,
+    db: Session = Depends(get_db), user: User = Depends(get_current_user),
+):
+    svc = AIService(db)
+    page = svc.get_messages(conversation_id, user.id, before, limit)
+    if page is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return page
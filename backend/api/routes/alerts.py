@@ -24,7 +24,11 @@ class UpdateAlertRequest(BaseModel):
 def list_alerts(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
     svc = AlertService(db)
     alerts = svc.get_alerts(user.id)
-    return [{"id": a.id, "alert_type": a.alert_type, "condition": a.condition, "enabled": a.enabled} for a in alerts]
+    return [
+        {"id": a.id, "alert_type": a.alert_type, "condition": a.condition, "enabled": a.enabled,
+         "state": a.state, "last_fired_at": a.last_fired_at, "suppressed_count": a.suppressed_count}
+        for a in alerts
+    ]
 
 
 @router.post("/")
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
@@ -34,20 +34,38 @@ class ConfirmRequest(BaseModel):
     order_id: str
 
 
+class BasketRequest(BaseModel):
+    orders: list[OrderRequest]
+
+
+class BasketConfirmRequest(BaseModel):
+    basket_id: str
+
+
 @router.get("/account")
-def get_account(db: Session = Depends(get_db)):
+def get_account(response: Response, db: Session = Depends(get_db)):
     svc = BrokerService(db)
-    return svc.get_account()
+    account = svc.get_account()
+    response.headers["X-Cache-Age"] = str(account["cache_age"])
+    return account
 
 
 @router.get("/positions")
-def get_positions(db: Session = Depends(get_db)):
+def get_positions(response: Response, db: Session = Depends(get_db)):
     svc = BrokerService(db)
-    return svc.get_positions()
+    positions, age = svc.get_positions_snapshot()
+    response.headers["X-Cache-Age"] = str(round(age, 3))
+    return positions
+
+
+@router.get("/orders/pending")
+def get_pending_orders(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+    svc = BrokerService(db)
+    return svc.get_pending(user.id)
 
 
 @router.post("/order")
-def submit_order(req: OrderRequest, db: Session = Depends(get_db)):
+def submit_order(req: OrderRequest, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
     svc = BrokerService(db)
     return svc.submit_order(
         symbol=req.symbol, side=req.side, qty=req.qty, order_type=req.order_type,
@@ -55,7 +73,7 @@ def submit_order(req: OrderRequest, db: Session = Depends(get_db)):
         expiry=req.expiry, strike=req.strike, right=req.right,
         multiplier=req.multiplier, pair_currency=req.pair_currency,
         limit_price=req.limit_price, stop_price=req.stop_price,
-        time_in_force=req.time_in_force,
+        time_in_force=req.time_in_force, user_id=user.id,
     )
 
 
@@ -66,6 +84,28 @@ def confirm_order(req: ConfirmRequest, db: Session = Depends(get_db), user: User
 
 
 @router.post("/order/cancel")
-def cancel_order(req: ConfirmRequest, db: Session = Depends(get_db)):
+def cancel_order(req: ConfirmRequest, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+    svc = BrokerService(db)
+    return svc.cancel_order(req.order_id, user.id)
+
+
+@router.post("/order/batch")
+def submit_basket(req: BasketRequest, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+    svc = BrokerService(db)
+    return svc.submit_basket([o.model_dump() for o in req.orders], user_id=user.id)
+
+
+@router.post("/order/batch/confirm")
+def confirm_basket(
+    req: BasketConfirmRequest, db: Session = Depends(get_db), user: User = Depends(get_current_user),
+):
+    svc = BrokerService(db)
+    return svc.confirm_basket(req.basket_id, user.id)
+
+
+@router.post("/order/batch/cancel")
+def cancel_basket(
+    req: BasketConfirmRequest, db: Session = Depends(get_db), user: User = Depends(get_current_user),
+):
     svc = BrokerService(db)
-    return svc.cancel_order(req.order_id)
+    return svc.cancel_basket(req.basket_id, user.id)
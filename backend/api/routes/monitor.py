@@ -1,5 +1,6 @@
 from fastapi import APIRouter
 
+from backend.core.broadcast import broadcast_metrics
 from backend.services.monitor_service import MonitorService
 
 router = APIRouter()
@@ -19,3 +20,20 @@ def get_pnl():
 @router.get("/health")
 def get_health():
     return service.get_health()
+
+
+@router.get("/brokers")
+def get_broker_pool():
+    from backend.services.broker_pool import broker_pool
+    return broker_pool.stats()
+
+
+@router.get("/llm")
+def get_llm_stats():
+    from backend.services.llm_service import get_llm
+    return get_llm().stats()
+
+
+@router.get("/ws")
+def get_ws_metrics():
+    return broadcast_metrics()
@@ -1,7 +1,10 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from pydantic import BaseModel
+from sqlalchemy.orm import Session
 
+from backend.core.database import get_db
 from backend.services.portfolio_service import PortfolioService
+from backend.services.portfolio_snapshot_service import PortfolioSnapshotService
 
 router = APIRouter()
 service = PortfolioService()
@@ -26,3 +29,8 @@ def optimize(req: OptimizeRequest):
 @router.post("/tearsheet")
 def tearsheet(req: TearsheetRequest):
     return service.tearsheet(req.returns)
+
+
+@router.get("/snapshot")
+def snapshot(analytics: bool = True, db: Session = Depends(get_db)):
+    return PortfolioSnapshotService(db).get(analytics=analytics)
@@ -8,9 +8,11 @@ router = APIRouter()
 @router.websocket("/ws/agent")
 async def agent_ws(websocket: WebSocket):
     await websocket.accept()
-    agent_connections.append(websocket)
+    agent_connections.add(websocket)
     try:
         while True:
             await websocket.receive_text()
     except WebSocketDisconnect:
+        pass
+    finally:
         agent_connections.remove(websocket)
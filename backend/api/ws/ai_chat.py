@@ -2,6 +2,8 @@ import json
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
+from backend.services.llm_service import astream, get_llm
+
 router = APIRouter()
 
 
@@ -16,10 +18,12 @@ async def ai_chat_ws(websocket: WebSocket):
             # Stream response back
             await websocket.send_text(json.dumps({"type": "start"}))
             try:
-                from puffin.ai import ClaudeProvider
-                provider = ClaudeProvider()
-                response = provider.generate(message)
-                await websocket.send_text(json.dumps({"type": "token", "content": response}))
+                # The provider blocks, so tokens come from a worker thread
+                chunks = get_llm().stream(message, use_cache=data.get("use_cache", True))
+                async for token in astream(chunks):
+                    await websocket.send_text(json.dumps({"type": "token", "content": token}))
+            except WebSocketDisconnect:
+                raise
             except Exception as e:
                 await websocket.send_text(json.dumps({"type": "error", "content": str(e)}))
             await websocket.send_text(json.dumps({"type": "end"}))
@@ -8,9 +8,11 @@ router = APIRouter()
 @router.websocket("/ws/alerts")
 async def alerts_ws(websocket: WebSocket):
     await websocket.accept()
-    alert_connections.append(websocket)
+    alert_connections.add(websocket)
     try:
         while True:
             await websocket.receive_text()
     except WebSocketDisconnect:
+        pass
+    finally:
         alert_connections.remove(websocket)
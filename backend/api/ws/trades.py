@@ -1,16 +1,18 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
-router = APIRouter()
+from backend.services.order_tracking_service import trade_connections
 
-trade_connections: list[WebSocket] = []
+router = APIRouter()
 
 
 @router.websocket("/ws/trades")
 async def trades_ws(websocket: WebSocket):
     await websocket.accept()
-    trade_connections.append(websocket)
+    trade_connections.add(websocket)
     try:
         while True:
             await websocket.receive_text()
     except WebSocketDisconnect:
+        pass
+    finally:
         trade_connections.remove(websocket)
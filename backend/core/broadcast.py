@@ -0,0 +1,210 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("drop_oldest", "conflate", "disconnect")
+
+# Every Broadcaster registers itself here so lag metrics can be reported
+broadcasters: dict[str, "Broadcaster"] = {}
+
+
+class ClientQueue:
+    """Bounded outbound queue for one WebSocket, drained by its own writer task.
+
+    Overflow policies:
+        drop_oldest: discard the oldest queued message to make room.
+        conflate: a message whose key is already queued replaces it in place;
+            otherwise behaves like drop_oldest.
+        disconnect: close the connection when the queue is full.
+    """
+
+    def __init__(
+        self, websocket, maxsize: int | None = None, policy: str | None = None,
+        on_close: Callable[["ClientQueue"], None] | None = None,
+    ):
+        self.websocket = websocket
+        self.maxsize = maxsize or settings.ws_queue_size
+        self.policy = policy or settings.ws_overflow_policy
+        if self.policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {self.policy}")
+        self.on_close = on_close
+        self.closed = False
+        self._items: OrderedDict = OrderedDict()
+        self._seq = itertools.count()
+        self._ready = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        # Metrics
+        self.enqueued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.conflated = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.avg_lag = 0.0
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._writer())
+
+    def put(self, payload: str | bytes, key=None) -> bool:
+        """Enqueue a message. Must be called on the event loop thread."""
+        if self.closed:
+            return False
+        if key is not None and self.policy == "conflate" and key in self._items:
+            # Keep the slot's position and age; only the payload is refreshed
+            self._items[key] = (payload, self._items[key][1])
+            self.conflated += 1
+            return True
+        if len(self._items) >= self.maxsize:
+            if self.policy == "disconnect":
+                self._fail("outbound queue overflow")
+                return False
+            self._items.popitem(last=False)
+            self.dropped += 1
+        if key is None or self.policy != "conflate":
+            key = (None, next(self._seq))
+        self._items[key] = (payload, time.monotonic())
+        self.enqueued += 1
+        self._ready.set()
+        return True
+
+    async def _writer(self) -> None:
+        ws = self.websocket
+        try:
+            while True:
+                while not self._items:
+                    self._ready.clear()
+                    await self._ready.wait()
+                _, (payload, enqueued_at) = self._items.popitem(last=False)
+                if isinstance(payload, bytes):
+                    await ws.send_bytes(payload)
+                else:
+                    await ws.send_text(payload)
+                self._record_lag(time.monotonic() - enqueued_at)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._fail(str(e) or type(e).__name__)
+
+    def _record_lag(self, lag: float) -> None:
+        self.sent += 1
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self.avg_lag = lag if self.sent == 1 else 0.9 * self.avg_lag + 0.1 * lag
+
+    def _fail(self, reason: str) -> None:
+        if self.closed:
+            return
+        logger.info(f"Dropping WebSocket client: {reason}")
+        self.close()
+        try:
+            asyncio.get_running_loop().create_task(self._close_socket())
+        except RuntimeError:
+            pass
+        if self.on_close:
+            self.on_close(self)
+
+    async def _close_socket(self) -> None:
+        try:
+            await self.websocket.close(code=1013)  # try again later
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        self.closed = True
+        self._items.clear()
+        task = self._task
+        if task is not None and not task.done() and task is not asyncio.current_task():
+            task.cancel()
+
+    def metrics(self) -> dict:
+        return {
+            "depth": len(self._items),
+            "maxsize": self.maxsize,
+            "policy": self.policy,
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "conflated": self.conflated,
+            "last_lag_ms": round(self.last_lag * 1000, 2),
+            "avg_lag_ms": round(self.avg_lag * 1000, 2),
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+        }
+
+
+class Broadcaster:
+    """A named set of WebSocket clients, each with its own ClientQueue."""
+
+    def __init__(
+        self, name: str, maxsize: int | None = None, policy: str | None = None,
+        on_disconnect: Callable[[object], None] | None = None,
+    ):
+        self.name = name
+        self.maxsize = maxsize
+        self.policy = policy
+        self.on_disconnect = on_disconnect
+        self._clients: dict[object, ClientQueue] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        broadcasters[name] = self
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def __contains__(self, ws) -> bool:
+        return ws in self._clients
+
+    def add(self, ws) -> ClientQueue:
+        """Register a client and start its writer. Must be called on the event loop."""
+        self._loop = asyncio.get_running_loop()
+        queue = ClientQueue(ws, self.maxsize, self.policy, on_close=self._on_queue_closed)
+        self._clients[ws] = queue
+        queue.start()
+        return queue
+
+    def remove(self, ws) -> None:
+        queue = self._clients.pop(ws, None)
+        if queue is not None:
+            queue.close()
+
+    def _on_queue_closed(self, queue: ClientQueue) -> None:
+        if self._clients.get(queue.websocket) is queue:
+            del self._clients[queue.websocket]
+        if self.on_disconnect:
+            self.on_disconnect(queue.websocket)
+
+    def send(self, ws, payload: str | bytes, key=None) -> bool:
+        """Queue a message for one client. Must be called on the event loop."""
+        queue = self._clients.get(ws)
+        return queue.put(payload, key) if queue is not None else False
+
+    def publish(self, payload: str | bytes, key=None) -> None:
+        """Queue a message for every client. Safe to call from any thread."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return  # no client has ever connected
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._publish(payload, key)
+        else:
+            loop.call_soon_threadsafe(self._publish, payload, key)
+
+    def _publish(self, payload: str | bytes, key=None) -> None:
+        for queue in list(self._clients.values()):
+            queue.put(payload, key)
+
+    def metrics(self) -> list[dict]:
+        return [queue.metrics() for queue in self._clients.values()]
+
+
+def broadcast_metrics() -> dict:
+    """Per-connection queue metrics for every broadcaster."""
+    return {name: b.metrics() for name, b in broadcasters.items()}
@@ -12,6 +12,52 @@ class Settings(BaseSettings):
     ibkr_host: str = "127.0.0.1"
     ibkr_port: int = 4002
     ibkr_client_id: int = 1
+    ibkr_data_client_id: int | None = None  # market-data session; defaults to ibkr_client_id + 1
+    ibkr_connect_timeout: float = 10.0
+    broker_idle_timeout: float = 900.0  # seconds before an unused broker client is closed
+    broker_batch_workers: int = 8  # concurrent broker submissions per basket
+    pending_order_ttl: float = 900.0  # seconds an unconfirmed order stays confirmable
+    pending_order_retention: float = 7 * 86400.0  # seconds finished rows are kept
+    pretrade_quote_max_age: float = 60.0  # seconds a cached live quote is used for pre-trade checks
+    safety_cache_ttl: float = 30.0  # seconds get_settings serves safety limits from memory (can_trade checks the row version)
+    order_poll_interval: float = 5.0  # seconds between open-order status polls
+    broker_snapshot_ttl: float = 3.0  # seconds account/positions are served from memory
+    price_feed: str = "auto"  # "auto", "alpaca", "ibkr", "simulated" or "poll"
+    price_poll_interval: float = 10.0  # seconds, polling fallback only
+    alpaca_data_feed: str = "iex"  # "iex" (free) or "sip"
+    ws_queue_size: int = 256  # per-connection outbound messages
+    ws_overflow_policy: str = "drop_oldest"  # "drop_oldest", "conflate" or "disconnect"
+    price_overflow_policy: str = "conflate"
+    price_batch_interval: float = 0.05  # seconds of ticks coalesced into one frame
+    price_min_tick: float = 0.0  # smallest price change pushed to clients
+    alert_streaming: bool = True  # evaluate price alerts against the live price stream
+    alert_check_interval: float = 60.0  # seconds between batch alert checks when not streaming
+    risk_window: int = 390  # rolling return samples kept for risk alerts
+    risk_sample_interval: float = 60.0  # seconds between portfolio value samples
+    risk_var_confidence: float = 0.95
+    risk_positions_interval: float = 30.0  # seconds between position refreshes for risk alerts
+    alert_quote_max_age: float = 60.0  # seconds a cached live quote is good enough for alert checks
+    alert_cooldown: float = 300.0  # min seconds between notifications for one alert
+    alert_hysteresis: float = 0.005  # fraction past the threshold needed to re-arm
+    alert_max_per_minute: int = 30  # per user, across all alerts
+    alert_flush_interval: float = 1.0  # seconds between batched history writes
+    sim_feed_rate: float = 1.0  # simulated feed: ticks per second per symbol
+    sim_feed_symbols: int = 0  # simulated feed: extra SIMxxxx symbols that always tick
+    sim_feed_seed: int = 0
+    yfinance_batch_size: int = 50  # symbols per bulk quote request
+    yfinance_max_workers: int = 8
+    yfinance_timeout: float = 5.0  # seconds per request
+    yfinance_breaker_threshold: int = 3  # consecutive failures before a symbol is skipped
+    yfinance_breaker_cooldown: float = 300.0  # seconds a failing symbol is skipped
+    llm_provider: str = "claude"  # "claude" or "stub" (offline, deterministic)
+    llm_model: str = ""  # part of the cache key; defaults to the provider's model
+    llm_cache_enabled: bool = True
+    llm_cache_dir: str = ".cache/llm"
+    llm_cache_ttl: float = 3600.0  # seconds a cached response is reused
+    tool_max_workers: int = 4  # concurrent AI tool calls per turn
+    portfolio_snapshot_ttl: float = 60.0  # seconds before snapshot positions/account are refetched
+    portfolio_snapshot_interval: float = 300.0  # seconds between background snapshot refreshes
+    portfolio_snapshot_timeout: float = 20.0  # seconds each snapshot source may take
 
     model_config = {"env_prefix": "PUFFLING_"}
 
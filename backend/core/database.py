@@ -31,5 +31,7 @@ def get_db() -> Session:
 
 def init_db():
     import backend.models  # noqa: F401 — register all models
+    from backend.core.migrations import migrate
 
     Base.metadata.create_all(bind=engine)
+    migrate(engine)
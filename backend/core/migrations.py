@@ -0,0 +1,68 @@
+import logging
+
+from sqlalchemy import Column
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Columns added to a model after its table first shipped. ``create_all`` never
+# alters an existing table, so these are added to older databases at startup.
+ADDED_COLUMNS: dict[str, tuple[str, ...]] = {
+    "trade_history": ("broker_order_id", "status", "filled_qty", "filled_at"),
+    "alert_configs": ("state", "last_fired_at", "suppressed_count"),
+    "ai_conversations": ("title", "last_message", "message_count", "updated_at"),
+    "settings": ("version",),
+}
+
+# Statements run once, right after a table gained its columns, to fill in existing rows
+BACKFILLS: dict[str, tuple[str, ...]] = {
+    # Messages stay in the legacy blob until a conversation is opened; list it by age and first message
+    "ai_conversations": (
+        "UPDATE ai_conversations SET updated_at = created_at WHERE updated_at IS NULL",
+        "UPDATE ai_conversations SET title = substr(json_extract(messages, '$[0].content'), 1, 80)"
+        " WHERE title = '' AND json_valid(messages) AND json_type(messages, '$[0].content') = 'text'",
+    ),
+}
+
+
+def _column_ddl(column: Column, engine: Engine) -> str:
+    """``name TYPE [DEFAULT x]``, nullable: SQLite cannot add a NOT NULL column without a default."""
+    ddl = f"{engine.dialect.identifier_preparer.quote(column.name)} {column.type.compile(engine.dialect)}"
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if isinstance(default, bool):
+        ddl += f" DEFAULT {int(default)}"
+    elif isinstance(default, (int, float)):
+        ddl += f" DEFAULT {default}"
+    elif isinstance(default, str):
+        ddl += " DEFAULT '{}'".format(default.replace("'", "''"))
+    return ddl
+
+
+def migrate(engine: Engine) -> list[str]:
+    """Add missing ``ADDED_COLUMNS`` (and their indexes) to existing tables; return what was added.
+
+    Idempotent: a column is only added when ``PRAGMA table_info`` does not list it.
+    """
+    from backend.core.database import Base
+
+    added = []
+    with engine.begin() as conn:
+        for name, columns in ADDED_COLUMNS.items():
+            existing = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({name})")}
+            if not existing:
+                continue  # new table, created complete by create_all
+            missing = [c for c in columns if c not in existing]
+            if not missing:
+                continue
+            table = Base.metadata.tables[name]
+            for column in missing:
+                conn.exec_driver_sql(f"ALTER TABLE {name} ADD COLUMN {_column_ddl(table.c[column], engine)}")
+                added.append(f"{name}.{column}")
+            for index in table.indexes:
+                if any(c.name in missing for c in index.columns):
+                    index.create(conn, checkfirst=True)
+            for statement in BACKFILLS.get(name, ()):
+                conn.exec_driver_sql(statement)
+    if added:
+        logger.info(f"Schema migration added columns: {', '.join(added)}")
+    return added
@@ -18,7 +18,13 @@ async def lifespan(app: FastAPI):
         scheduler_svc.start()
     finally:
         db.close()
+    from backend.core.config import settings
+    if settings.alert_streaming:
+        from backend.services.alert_engine import alert_engine
+        await alert_engine.start()
     yield
+    if settings.alert_streaming:
+        alert_engine.stop()
 
 
 app = FastAPI(title="Puffling", version="0.1.0", lifespan=lifespan)
@@ -1,10 +1,13 @@
 from backend.models.agent_log import AgentLog
 from backend.models.ai_conversation import AIConversation
+from backend.models.ai_message import AIMessage
 from backend.models.alert_config import AlertConfig
 from backend.models.alert_history import AlertHistory
 from backend.models.backtest_result import BacktestResult
+from backend.models.daily_trade_count import DailyTradeCount
 from backend.models.live_adaptation import AdaptationEvent, LiveAdaptationConfig
 from backend.models.optimization_job import OptimizationJob
+from backend.models.pending_order import PendingOrder
 from backend.models.portfolio_goal import PortfolioGoal
 from backend.models.scheduled_job import ScheduledJob
 from backend.models.settings import Settings
@@ -17,11 +20,14 @@ __all__ = [
     "AdaptationEvent",
     "AgentLog",
     "AIConversation",
+    "AIMessage",
     "AlertConfig",
     "AlertHistory",
     "BacktestResult",
+    "DailyTradeCount",
     "LiveAdaptationConfig",
     "OptimizationJob",
+    "PendingOrder",
     "PortfolioGoal",
     "ScheduledJob",
     "Settings",
@@ -11,5 +11,11 @@ class AIConversation(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[str] = mapped_column(String, ForeignKey("users.id"), index=True)
-    messages: Mapped[str] = mapped_column(Text)  # JSON array string
+    # Legacy JSON array of messages, moved into ai_messages on first access. Emptied
+    # rather than nulled: databases created before the move keep it NOT NULL.
+    messages: Mapped[str | None] = mapped_column(Text, nullable=True, default="")
+    title: Mapped[str] = mapped_column(String, default="")  # first user message, truncated
+    last_message: Mapped[str] = mapped_column(Text, default="")  # truncated preview
+    message_count: Mapped[int] = mapped_column(Integer, default=0)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
@@ -0,0 +1,19 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey, Integer, String, Text, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from backend.core.database import Base
+
+
+class AIMessage(Base):
+    __tablename__ = "ai_messages"
+    # Pages are read by (conversation_id, seq); the constraint doubles as that index
+    __table_args__ = (UniqueConstraint("conversation_id", "seq", name="uq_ai_messages_conversation_seq"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    conversation_id: Mapped[int] = mapped_column(Integer, ForeignKey("ai_conversations.id", ondelete="CASCADE"))
+    seq: Mapped[int] = mapped_column(Integer)  # 0-based position in the conversation
+    role: Mapped[str] = mapped_column(String)  # user, assistant
+    content: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -1,4 +1,6 @@
-from sqlalchemy import Boolean, ForeignKey, Integer, String, Text
+from datetime import datetime
+
+from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, String, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from backend.core.database import Base
@@ -12,3 +14,7 @@ class AlertConfig(Base):
     alert_type: Mapped[str] = mapped_column(String)  # price, signal, risk, rebalance
     condition: Mapped[str] = mapped_column(Text)  # JSON: {"symbol": "AAPL", "above": 200}
     enabled: Mapped[bool] = mapped_column(Boolean, default=True)
+    # Notification state: "armed" fires on the next breach, "fired" waits to re-arm
+    state: Mapped[str] = mapped_column(String, default="armed")
+    last_fired_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    suppressed_count: Mapped[int] = mapped_column(Integer, default=0)
@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey, Index, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from backend.core.database import Base
+
+
+class PendingOrder(Base):
+    __tablename__ = "pending_orders"
+    # The sweeper and confirmation lookups filter on status + expiry
+    __table_args__ = (Index("ix_pending_orders_status_expires_at", "status", "expires_at"),)
+
+    id: Mapped[str] = mapped_column(String, primary_key=True)  # uuid4
+    user_id: Mapped[str | None] = mapped_column(String, ForeignKey("users.id"), nullable=True, index=True)
+    basket_id: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
+    status: Mapped[str] = mapped_column(String, default="pending")  # pending, submitted, failed, cancelled, expired
+    order: Mapped[str] = mapped_column(Text)  # JSON order spec
+    summary: Mapped[str] = mapped_column(Text)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    expires_at: Mapped[datetime] = mapped_column(DateTime)
@@ -1,4 +1,4 @@
-from sqlalchemy import ForeignKey, Integer, String, Text
+from sqlalchemy import ForeignKey, Integer, String, Text, literal_column
 from sqlalchemy.orm import Mapped, mapped_column
 
 from backend.core.database import Base
@@ -11,3 +11,5 @@ class Settings(Base):
     user_id: Mapped[str] = mapped_column(String, ForeignKey("users.id"), index=True)
     key: Mapped[str] = mapped_column(String, index=True)
     value: Mapped[str] = mapped_column(Text)  # JSON string
+    # Bumped on every update so other workers can tell a cached value is stale
+    version: Mapped[int] = mapped_column(Integer, default=0, onupdate=literal_column("version + 1"))
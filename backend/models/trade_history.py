@@ -22,3 +22,8 @@ class TradeHistory(Base):
     expiry: Mapped[str | None] = mapped_column(String, nullable=True)
     strike: Mapped[float | None] = mapped_column(Float, nullable=True)
     right: Mapped[str | None] = mapped_column(String, nullable=True)
+    # Order lifecycle, kept current by the order tracker
+    broker_order_id: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
+    status: Mapped[str | None] = mapped_column(String, nullable=True, index=True)  # submitted, partially_filled, filled, cancelled, rejected, expired
+    filled_qty: Mapped[float | None] = mapped_column(Float, nullable=True)
+    filled_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
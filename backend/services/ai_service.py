@@ -1,39 +1,97 @@
 import json
+from datetime import datetime
 
-from sqlalchemy.orm import Session
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, defer
 
 from backend.models.ai_conversation import AIConversation
+from backend.models.ai_message import AIMessage
+
+TITLE_LENGTH = 80
+PREVIEW_LENGTH = 200
+
+
+def _preview(text: str, length: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= length else text[: length - 1] + "…"
 
 
 class AIService:
     def __init__(self, db: Session):
         self.db = db
 
-    def chat(self, user_id: str, message: str, conversation_id: int | None = None) -> dict:
-        from puffin.ai import ClaudeProvider
-        provider = ClaudeProvider()
-        response = provider.generate(message)
+    def chat(self, user_id: str, message: str, conversation_id: int | None = None, use_cache: bool = True) -> dict:
+        from backend.services.llm_service import get_llm
+        response = get_llm().generate(message, use_cache=use_cache)
+        conv = None
         if conversation_id:
-            conv = self.db.query(AIConversation).filter(
-                AIConversation.id == conversation_id, AIConversation.user_id == user_id
-            ).first()
-            if conv:
-                messages = json.loads(conv.messages)
-                messages.append({"role": "user", "content": message})
-                messages.append({"role": "assistant", "content": response})
-                conv.messages = json.dumps(messages)
-                self.db.commit()
-        else:
-            messages = [
-                {"role": "user", "content": message},
-                {"role": "assistant", "content": response},
-            ]
-            conv = AIConversation(user_id=user_id, messages=json.dumps(messages))
+            conv = self._get_conversation(conversation_id, user_id)
+        if conv is None:
+            conv = AIConversation(user_id=user_id, title=_preview(message, TITLE_LENGTH))
             self.db.add(conv)
-            self.db.commit()
-            self.db.refresh(conv)
+            self.db.flush()
+        self._append(conv, [("user", message), ("assistant", response)])
+        self.db.commit()
         return {"conversation_id": conv.id, "response": response}
 
+    def _get_conversation(self, conversation_id: int, user_id: str) -> AIConversation | None:
+        conv = self.db.query(AIConversation).options(defer(AIConversation.messages)).filter(
+            AIConversation.id == conversation_id, AIConversation.user_id == user_id
+        ).first()
+        if conv is not None:
+            self._migrate_legacy(conv)
+        return conv
+
+    def _append(self, conv: AIConversation, messages: list[tuple[str, str]]) -> None:
+        """Insert new message rows after the last one; nothing already stored is rewritten."""
+        now = datetime.utcnow()
+        start = conv.message_count or 0
+        self.db.execute(insert(AIMessage), [
+            {"conversation_id": conv.id, "seq": start + i, "role": role, "content": content, "created_at": now}
+            for i, (role, content) in enumerate(messages)
+        ])
+        conv.message_count = start + len(messages)
+        conv.last_message = _preview(messages[-1][1], PREVIEW_LENGTH)
+        conv.updated_at = now
+
+    def _migrate_legacy(self, conv: AIConversation) -> None:
+        """Move a conversation stored as one JSON blob into message rows."""
+        if conv.message_count:
+            return
+        blob = self.db.query(AIConversation.messages).filter(AIConversation.id == conv.id).scalar()
+        if not blob:
+            return
+        legacy = [(m.get("role", "user"), m.get("content", "")) for m in json.loads(blob)]
+        if legacy:
+            self._append(conv, legacy)
+            conv.title = conv.title or _preview(next((c for r, c in legacy if r == "user"), ""), TITLE_LENGTH)
+            conv.updated_at = conv.created_at
+        conv.messages = ""
+        self.db.commit()
+
+    def get_messages(
+        self, conversation_id: int, user_id: str, before: int | None = None, limit: int = 50,
+    ) -> dict | None:
+        """A page of messages in order, ending just before ``before`` (default: the latest)."""
+        conv = self._get_conversation(conversation_id, user_id)
+        if conv is None:
+            return None
+        query = self.db.query(AIMessage).filter(AIMessage.conversation_id == conversation_id)
+        if before is not None:
+            query = query.filter(AIMessage.seq < before)
+        rows = query.order_by(AIMessage.seq.desc()).limit(limit).all()
+        rows.reverse()
+        return {
+            "conversation_id": conversation_id,
+            "messages": [
+                {"seq": m.seq, "role": m.role, "content": m.content, "created_at": str(m.created_at)}
+                for m in rows
+            ],
+            # Pass as ``before`` to load older messages; None once the start is reached
+            "next_before": rows[0].seq if rows and rows[0].seq > 0 else None,
+            "message_count": conv.message_count,
+        }
+
     def analyze_sentiment(self, text: str) -> dict:
         try:
             from puffin.nlp import RuleSentiment
@@ -51,5 +109,14 @@ class AIService:
         model.fit(documents)
         return {"topics": model.get_topics()}
 
-    def get_conversations(self, user_id: str) -> list[AIConversation]:
-        return self.db.query(AIConversation).filter(AIConversation.user_id == user_id).all()
+    def get_conversations(self, user_id: str, limit: int = 50, offset: int = 0) -> list[AIConversation]:
+        """Conversation summaries, most recently active first; message bodies are not loaded."""
+        return (
+            self.db.query(AIConversation)
+            .options(defer(AIConversation.messages))
+            .filter(AIConversation.user_id == user_id)
+            .order_by(AIConversation.updated_at.desc(), AIConversation.id.desc())
+            .offset(offset)
+            .limit(limit)
+            .all()
+        )
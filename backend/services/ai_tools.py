@@ -1,3 +1,14 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
 AI_TOOL_SCHEMAS = [
     {
         "name": "get_market_data",
@@ -127,10 +138,146 @@ AI_TOOL_SCHEMAS = [
 ]
 
 
-def execute_tool(tool_name: str, args: dict, user_id: str, db) -> dict:
+# Tools with no side effects, memoized across turns for this many seconds
+MEMOIZED_TOOL_TTLS: dict[str, float] = {
+    "get_market_data": 300.0,
+    "compute_factors": 300.0,
+    "optimize_portfolio": 300.0,
+    "check_risk": 300.0,
+    "analyze_sentiment": 3600.0,
+    "get_position_size": 3600.0,
+}
+# Tools that use the database session, which must stay on the caller's thread
+CALLER_THREAD_TOOLS = {"run_backtest", "place_order"}
+_MEMO_MAX_ENTRIES = 256
+
+_memo: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def _memo_key(tool_name: str, args: dict) -> str:
+    return tool_name + ":" + json.dumps(args, sort_keys=True, default=str)
+
+
+def _memo_get(key: str):
+    with _memo_lock:
+        entry = _memo.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        _memo.move_to_end(key)
+        return entry[1]
+
+
+def _memo_set(key: str, ttl: float, result: dict) -> None:
+    with _memo_lock:
+        _memo[key] = (time.monotonic() + ttl, result)
+        _memo.move_to_end(key)
+        while len(_memo) > _MEMO_MAX_ENTRIES:
+            _memo.popitem(last=False)
+
+
+class TurnDataCache:
+    """Market data provider shared by every tool in one turn.
+
+    Wraps ``get_data`` so tools asking for the same symbols and range fetch
+    it once; concurrent requests for a key wait for the first fetch. A single
+    symbol and a one-item list share a key, as do a missing ``interval`` and
+    the provider's default ``"1d"``.
+    """
+
+    def __init__(self, provider=None):
+        self._provider = provider
+        self._data: dict[tuple, object] = {}
+        self._locks: dict[tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.fetches = 0
+
+    @property
+    def provider(self):
+        if self._provider is None:
+            from puffin.data import YFinanceProvider
+            self._provider = YFinanceProvider()
+        return self._provider
+
+    def get_data(self, symbols, start=None, end=None, **kwargs):
+        key = (
+            (symbols,) if isinstance(symbols, str) else tuple(symbols), start, end,
+            tuple(sorted({"interval": "1d", **kwargs}.items())),
+        )
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self._data:
+                self.fetches += 1
+                self._data[key] = self.provider.get_data(symbols, start=start, end=end, **kwargs)
+            return self._data[key]
+
+    def __getattr__(self, name):
+        return getattr(self.provider, name)
+
+
+class ToolExecutor:
+    """Executes the tool calls of one model turn.
+
+    Calls that only read market data run concurrently on worker threads and
+    share a ``TurnDataCache``, so ``get_market_data``, ``compute_factors`` and
+    ``check_risk`` over the same symbols fetch once. Side-effect-free tools
+    are memoized across turns (``MEMOIZED_TOOL_TTLS``). Tools in
+    ``CALLER_THREAD_TOOLS`` use the database session and run afterwards on
+    the caller's thread, one at a time in request order; ``place_order`` is
+    never cached.
+    """
+
+    def __init__(self, user_id: str, db, max_workers: int | None = None, data: TurnDataCache | None = None):
+        self.user_id = user_id
+        self.db = db
+        self.max_workers = max_workers or settings.tool_max_workers
+        self.data = data or TurnDataCache()
+
+    def execute(self, tool_name: str, args: dict) -> dict:
+        ttl = MEMOIZED_TOOL_TTLS.get(tool_name)
+        key = _memo_key(tool_name, args) if ttl else None
+        if key is not None and (cached := _memo_get(key)) is not None:
+            return cached
+        try:
+            result = execute_tool(tool_name, args, self.user_id, self.db, provider=self.data)
+        except Exception as e:
+            logger.warning(f"Tool {tool_name} failed: {e}")
+            return {"error": str(e)}
+        if key is not None and not (isinstance(result, dict) and "error" in result):
+            _memo_set(key, ttl, result)
+        return result
+
+    def execute_many(self, calls: list[dict]) -> list[dict]:
+        """Run ``[{"name", "args"}, ...]`` and return results in the same order."""
+        results: list[dict | None] = [None] * len(calls)
+        parallel = [i for i, c in enumerate(calls) if c["name"] not in CALLER_THREAD_TOOLS]
+        if len(parallel) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(parallel)),
+                                    thread_name_prefix="ai-tools") as pool:
+                futures = {i: pool.submit(self.execute, calls[i]["name"], calls[i].get("args", {})) for i in parallel}
+                for i, future in futures.items():
+                    results[i] = future.result()
+        elif parallel:
+            i = parallel[0]
+            results[i] = self.execute(calls[i]["name"], calls[i].get("args", {}))
+        for i, call in enumerate(calls):
+            if results[i] is None:
+                results[i] = self.execute(call["name"], call.get("args", {}))
+        return results
+
+
+def _with_provider(service, provider):
+    """Point a data-backed service at a shared provider, if one is given."""
+    if provider is not None:
+        service.provider = provider
+    return service
+
+
+def execute_tool(tool_name: str, args: dict, user_id: str, db, provider=None) -> dict:
     if tool_name == "get_market_data":
         from backend.services.data_service import DataService
-        return DataService().get_ohlcv(args["symbol"], args["start"], args["end"])
+        return _with_provider(DataService(), provider).get_ohlcv(args["symbol"], args["start"], args["end"])
 
     elif tool_name == "run_backtest":
         from backend.services.backtest_service import BacktestService
@@ -143,11 +290,12 @@ def execute_tool(tool_name: str, args: dict, user_id: str, db) -> dict:
 
     elif tool_name == "compute_factors":
         from backend.services.factors_service import FactorsService
-        return FactorsService().compute(args["symbols"], args["start"], args["end"])
+        return _with_provider(FactorsService(), provider).compute(args["symbols"], args["start"], args["end"])
 
     elif tool_name == "optimize_portfolio":
         from backend.services.portfolio_service import PortfolioService
-        return PortfolioService().optimize(args["symbols"], args["start"], args["end"], args.get("method", "mean_variance"))
+        svc = _with_provider(PortfolioService(), provider)
+        return svc.optimize(args["symbols"], args["start"], args["end"], args.get("method", "mean_variance"))
 
     elif tool_name == "place_order":
         from backend.services.broker_service import BrokerService
@@ -162,11 +310,12 @@ def execute_tool(tool_name: str, args: dict, user_id: str, db) -> dict:
             pair_currency=args.get("pair_currency"),
             limit_price=args.get("limit_price"), stop_price=args.get("stop_price"),
             time_in_force=args.get("time_in_force", "DAY"),
+            user_id=user_id,
         )
 
     elif tool_name == "check_risk":
         from backend.services.risk_service import RiskService
-        return RiskService().portfolio_risk(args["symbols"], args["weights"], args["start"], args["end"])
+        return RiskService(provider).portfolio_risk(args["symbols"], args["weights"], args["start"], args["end"])
 
     elif tool_name == "get_position_size":
         from backend.services.risk_service import RiskService
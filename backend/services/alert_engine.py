@@ -0,0 +1,311 @@
+import asyncio
+import json
+import logging
+import time
+from bisect import bisect_left, bisect_right
+
+from backend.core.config import settings
+from backend.services.alert_service import alert_connections, alert_gate, write_alerts
+
+logger = logging.getLogger(__name__)
+
+
+class _Thresholds:
+    """Sorted thresholds with the alert ids they belong to."""
+
+    __slots__ = ("values", "ids")
+
+    def __init__(self):
+        self.values: list[float] = []
+        self.ids: list[int] = []
+
+    def add(self, value: float, alert_id: int) -> None:
+        i = bisect_right(self.values, value)
+        self.values.insert(i, value)
+        self.ids.insert(i, alert_id)
+
+
+class PriceAlertIndex:
+    """Enabled price alerts indexed by symbol, with sorted above/below thresholds.
+
+    ``crossed`` finds the alerts whose condition became true between two
+    prices with two binary searches per side, so a tick costs O(log n) plus
+    the number of alerts it fires.
+    """
+
+    def __init__(self):
+        self._above: dict[str, _Thresholds] = {}
+        self._below: dict[str, _Thresholds] = {}
+        self.alerts: dict[int, dict] = {}  # alert id -> {"user_id", "symbol", "above", "below"}
+
+    def __len__(self) -> int:
+        return len(self.alerts)
+
+    def add(self, alert_id: int, user_id: str, condition: dict) -> None:
+        symbol = (condition.get("symbol") or "").upper()
+        if not symbol or ("above" not in condition and "below" not in condition):
+            return
+        self.alerts[alert_id] = {**condition, "user_id": user_id, "symbol": symbol}
+        if "above" in condition:
+            self._above.setdefault(symbol, _Thresholds()).add(float(condition["above"]), alert_id)
+        if "below" in condition:
+            self._below.setdefault(symbol, _Thresholds()).add(float(condition["below"]), alert_id)
+
+    def symbols(self) -> set[str]:
+        return set(self._above) | set(self._below)
+
+    def crossed(self, symbol: str, price: float, last: float | None) -> list[tuple[int, str]]:
+        """Alerts that fire moving from ``last`` to ``price``, as ``(alert_id, direction)``.
+
+        With no previous price every alert whose condition holds at ``price``
+        fires, matching a one-off evaluation.
+        """
+        fired = []
+        above = self._above.get(symbol)
+        if above is not None:
+            # "above t" becomes true when price > t and it was not before (last <= t)
+            hi = bisect_left(above.values, price)
+            lo = 0 if last is None else bisect_left(above.values, last)
+            fired.extend((aid, "above") for aid in above.ids[lo:hi])
+        below = self._below.get(symbol)
+        if below is not None:
+            # "below t" becomes true when price < t and it was not before (last >= t)
+            lo = bisect_right(below.values, price)
+            hi = len(below.values) if last is None else bisect_right(below.values, last)
+            fired.extend((aid, "below") for aid in below.ids[lo:hi])
+        return fired
+
+
+def _breached(alert: dict, price: float) -> bool:
+    above, below = alert.get("above"), alert.get("below")
+    return (above is not None and price > float(above)) or (below is not None and price < float(below))
+
+
+class AlertEngine:
+    """Evaluates price alerts against the live price stream.
+
+    Alerts are loaded from the database into a ``PriceAlertIndex``, their
+    symbols are pinned on the price hub, and every tick is checked as it
+    arrives. Breaches pass through the ``AlertGate`` (hysteresis, cooldown,
+    per-user rate limit) before they are pushed to ``/ws/alerts``. Breaches the
+    cooldown or rate limit held back are re-checked on every tick until they
+    notify or recover, as a batch sweep would; history rows
+    and state changes are buffered and written in one transaction every
+    ``alert_flush_interval`` seconds, off the event loop.
+
+    Risk alerts are checked against the rolling ``PortfolioRiskState``, which
+    every tick on a held symbol updates; they are re-evaluated at most once a
+    second.
+    """
+
+    RISK_CHECK_INTERVAL = 1.0
+
+    def __init__(self, hub=None, session_factory=None, gate=None):
+        self._hub = hub
+        self._session_factory = session_factory
+        self.gate = gate or alert_gate
+        self.index = PriceAlertIndex()
+        self._fired: dict[str, set[int]] = {}  # symbol -> price alerts waiting to re-arm
+        self._held: dict[str, set[int]] = {}  # symbol -> armed alerts in breach, suppressed by the gate
+        self._pending: list[dict] = []
+        self._flush_task: asyncio.Task | None = None
+        self._last: dict[str, float] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._reload_lock: asyncio.Lock | None = None  # reloads apply in the order they read the database
+        self.running = False
+        self.risk_alerts: list[tuple[int, str, dict]] = []  # (alert id, user id, condition)
+        self._risk_checked_at = 0.0
+
+    @property
+    def hub(self):
+        if self._hub is None:
+            from backend.services.price_hub import price_hub
+            self._hub = price_hub
+        return self._hub
+
+    def _session(self):
+        if self._session_factory is None:
+            from backend.core.database import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    async def start(self) -> None:
+        """Load alerts and start listening. Must be called on the event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._reload_lock = asyncio.Lock()
+        self.running = True
+        self.hub.add_listener(self.on_tick)
+        await self.reload()
+        self._flush_task = self._loop.create_task(self._flush_loop())
+
+    def stop(self) -> None:
+        self.running = False
+        self.hub.remove_listener(self.on_tick)
+        self.hub.pin("alerts", set())
+        self.hub.pin("risk", set())
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self.flush()
+
+    async def reload(self) -> None:
+        """Rebuild the index from the enabled price and risk alerts.
+
+        The database read (and the positions refresh risk alerts need) runs on
+        a worker thread; only swapping in the new index happens on the loop.
+        """
+        async with self._reload_lock:
+            events, self._pending = self._pending, []
+            loop = asyncio.get_running_loop()
+            try:
+                index, risk_alerts = await loop.run_in_executor(None, self._load, events, bool(self.risk_alerts))
+            except Exception as e:
+                logger.error(f"Alert reload failed, keeping the current alerts: {e}")
+                return
+            self.index = index
+            self._fired, self._held = {}, {}
+            for alert_id, alert in index.alerts.items():
+                last = self._last.get(alert["symbol"])
+                if self.gate.is_fired(alert_id):
+                    self._fired.setdefault(alert["symbol"], set()).add(alert_id)
+                elif last is not None and _breached(alert, last):
+                    self._held.setdefault(alert["symbol"], set()).add(alert_id)
+            self.risk_alerts = risk_alerts
+            self.hub.pin("alerts", index.symbols())
+            self.repin_risk()
+        logger.info(f"Alert engine watching {len(index)} price alerts on {len(index.symbols())} symbols")
+
+    def _load(self, events: list[dict], had_risk: bool) -> tuple[PriceAlertIndex, list]:
+        """Persist buffered state, then read alert configs (blocking)."""
+        from backend.models.alert_config import AlertConfig
+
+        self._write(events)  # persist in-memory state before re-reading it
+        db = self._session()
+        try:
+            rows = db.query(AlertConfig).filter(
+                AlertConfig.alert_type.in_(("price", "risk")), AlertConfig.enabled.is_(True)
+            ).all()
+            index = PriceAlertIndex()
+            risk_alerts = []
+            for row in rows:
+                try:
+                    condition = json.loads(row.condition)
+                    self.gate.seed(row)
+                    if row.alert_type == "risk":
+                        risk_alerts.append((row.id, row.user_id, condition))
+                    else:
+                        index.add(row.id, row.user_id, condition)
+                except (ValueError, TypeError) as e:
+                    logger.warning(f"Skipping alert {row.id} with bad condition: {e}")
+            if risk_alerts and not had_risk:
+                from backend.services.risk_state_service import refresh_positions
+                refresh_positions(db)
+        finally:
+            db.close()
+        return index, risk_alerts
+
+    def repin_risk(self) -> None:
+        """Stream every held symbol while risk alerts exist. Call on the event loop."""
+        from backend.services.risk_state_service import portfolio_risk_state
+        self.hub.pin("risk", portfolio_risk_state.symbols() if self.risk_alerts else set())
+
+    def request_repin_risk(self) -> None:
+        loop = self._loop
+        if self.running and loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self.repin_risk)
+
+    def request_reload(self) -> None:
+        """Schedule a reload from any thread (e.g. after alerts are edited)."""
+        loop = self._loop
+        if self.running and loop is not None and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(self.reload(), loop)
+
+    def on_tick(self, symbol: str, price: float, timestamp: float) -> list[dict]:
+        last = self._last.get(symbol)
+        self._last[symbol] = price
+        if last == price:
+            return []
+        events = self._check_risk(symbol, price, timestamp) if self.risk_alerts else []
+        candidates = {alert_id for alert_id, _ in self.index.crossed(symbol, price, last)}
+        waiting = self._fired.get(symbol)
+        if waiting:
+            candidates |= waiting
+        held = self._held.get(symbol)
+        if held:
+            candidates |= held
+        for alert_id in candidates:
+            alert = self.index.alerts[alert_id]
+            direction = self.gate.check(alert_id, alert["user_id"], price, alert)
+            if self.gate.is_fired(alert_id):
+                self._fired.setdefault(symbol, set()).add(alert_id)
+                if held:
+                    held.discard(alert_id)
+            else:
+                if waiting:
+                    waiting.discard(alert_id)
+                if _breached(alert, price):  # held back by cooldown or rate limit: retry next tick
+                    self._held.setdefault(symbol, set()).add(alert_id)
+                elif held:
+                    held.discard(alert_id)
+            if direction is None:
+                continue
+            message = f"{symbol} is at ${price:.2f}, {direction} ${alert[direction]}"
+            event = {
+                "type": "alert", "alert_id": alert_id, "user_id": alert["user_id"],
+                "symbol": symbol, "price": price, "timestamp": timestamp, "message": message,
+            }
+            alert_connections.publish(json.dumps(event))
+            events.append(event)
+        self._pending.extend(events)
+        return events
+
+    def _check_risk(self, symbol: str, price: float, timestamp: float) -> list[dict]:
+        from backend.services.risk_state_service import RISK_METRICS, portfolio_risk_state, risk_breach
+
+        if not portfolio_risk_state.on_price(symbol, price, timestamp):
+            return []
+        now = time.monotonic()
+        if now - self._risk_checked_at < self.RISK_CHECK_INTERVAL:
+            return []
+        self._risk_checked_at = now
+        metrics = portfolio_risk_state.metrics()
+        events = []
+        for alert_id, user_id, condition in self.risk_alerts:
+            metric = condition.get("metric")
+            value = metrics.get(metric) if metric in RISK_METRICS else None
+            if self.gate.check(alert_id, user_id, value, condition) is None:
+                continue
+            event = {
+                "type": "alert", "alert_id": alert_id, "user_id": user_id, "metric": metric,
+                "timestamp": timestamp, "message": risk_breach(metrics, condition),
+            }
+            alert_connections.publish(json.dumps(event))
+            events.append(event)
+        return events
+
+    async def _flush_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(settings.alert_flush_interval)
+            events, self._pending = self._pending, []
+            await loop.run_in_executor(None, self._write, events)
+
+    def flush(self) -> None:
+        """Write buffered history and state changes now (blocking)."""
+        events, self._pending = self._pending, []
+        self._write(events)
+
+    def _write(self, events: list[dict]) -> None:
+        states = self.gate.drain()
+        if not events and not states:
+            return
+        db = self._session()
+        try:
+            write_alerts(db, events, states)
+        except Exception as e:
+            logger.error(f"Failed to record {len(events)} fired alert(s): {e}")
+        finally:
+            db.close()
+
+
+alert_engine = AlertEngine()
@@ -1,16 +1,170 @@
 import json
 import logging
-from datetime import datetime
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
 
+import numpy as np
+from sqlalchemy import insert, update
 from sqlalchemy.orm import Session
 
+from backend.core.broadcast import Broadcaster
+from backend.core.config import settings
 from backend.models.alert_config import AlertConfig
 from backend.models.alert_history import AlertHistory
 
 logger = logging.getLogger(__name__)
 
 # Connected WebSocket clients for alert notifications
-alert_connections: list = []
+alert_connections = Broadcaster("alerts")
+
+
+def _latest_prices(symbols: list[str]) -> dict[str, float]:
+    """Quotes for ``symbols``: fresh ones from the live price cache, the rest in one batch fetch."""
+    from backend.services.price_hub import price_hub
+    from backend.services.price_stream_service import fetch_quotes
+
+    now = time.time()
+    prices = {
+        symbol: price for symbol, (price, ts) in price_hub.last_prices(symbols).items()
+        if now - ts <= settings.alert_quote_max_age
+    }
+    missing = [s for s in symbols if s not in prices]
+    if missing:
+        try:
+            prices.update(fetch_quotes(missing))
+        except Exception as e:
+            logger.error(f"Price fetch for alerts failed: {e}")
+    return prices
+
+
+def _to_datetime(ts: float | None) -> datetime | None:
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None) if ts is not None else None
+
+
+def _to_timestamp(dt: datetime | None) -> float | None:
+    return dt.replace(tzinfo=timezone.utc).timestamp() if dt is not None else None
+
+
+class AlertGate:
+    """Armed/fired state per alert, so a breach notifies once instead of on every check.
+
+    An armed alert fires when its condition holds, then stays fired until the
+    value moves back past its threshold by the hysteresis band
+    (``alert_hysteresis`` of the threshold, or the condition's own
+    ``"hysteresis"``). Even when armed, an alert notifies at most once per
+    cooldown and each user at most ``alert_max_per_minute`` times; breaches
+    held back by either are only counted as suppressed.
+    """
+
+    def __init__(
+        self, cooldown: float | None = None, hysteresis: float | None = None,
+        max_per_minute: int | None = None,
+    ):
+        self.cooldown = cooldown if cooldown is not None else settings.alert_cooldown
+        self.hysteresis = hysteresis if hysteresis is not None else settings.alert_hysteresis
+        self.max_per_minute = max_per_minute if max_per_minute is not None else settings.alert_max_per_minute
+        self._states: dict[int, dict] = {}  # alert id -> {"state", "fired_at", "suppressed"}
+        self._sent: dict[str, deque[float]] = {}  # user id -> notification times in the last minute
+        self._dirty: set[int] = set()
+        self._lock = threading.Lock()
+
+    def seed(self, alert: AlertConfig) -> None:
+        """Load an alert's persisted state, once: in-memory state is newer than the database."""
+        with self._lock:
+            if alert.id in self._states:
+                return
+            self._states[alert.id] = {
+                "state": alert.state or "armed",
+                "fired_at": _to_timestamp(alert.last_fired_at),
+                "suppressed": alert.suppressed_count or 0,
+            }
+
+    def reset(self, alert_id: int) -> None:
+        with self._lock:
+            self._states.pop(alert_id, None)
+            self._dirty.discard(alert_id)
+
+    def is_fired(self, alert_id: int) -> bool:
+        state = self._states.get(alert_id)
+        return state is not None and state["state"] == "fired"
+
+    def check(self, alert_id: int, user_id: str, value: float | None, condition: dict,
+              now: float | None = None) -> str | None:
+        """Feed the alert's current value; return "above"/"below" if it should notify now."""
+        if value is None or math.isnan(value):
+            return None
+        now = now if now is not None else time.time()
+        above, below = condition.get("above"), condition.get("below")
+        with self._lock:
+            st = self._states.setdefault(alert_id, {"state": "armed", "fired_at": None, "suppressed": 0})
+            if st["state"] == "fired":
+                h = float(condition.get("hysteresis", self.hysteresis))
+                near_above = above is not None and value > float(above) - abs(float(above)) * h
+                near_below = below is not None and value < float(below) + abs(float(below)) * h
+                if near_above or near_below:
+                    return None
+                st["state"] = "armed"
+                self._dirty.add(alert_id)
+            if above is not None and value > float(above):
+                direction = "above"
+            elif below is not None and value < float(below):
+                direction = "below"
+            else:
+                return None
+
+            sent = self._sent.setdefault(user_id, deque())
+            while sent and now - sent[0] >= 60.0:
+                sent.popleft()
+            cooldown = float(condition.get("cooldown", self.cooldown))
+            if (st["fired_at"] is not None and now - st["fired_at"] < cooldown) or len(sent) >= self.max_per_minute:
+                st["suppressed"] += 1
+                self._dirty.add(alert_id)
+                return None
+            sent.append(now)
+            st.update(state="fired", fired_at=now)
+            self._dirty.add(alert_id)
+            return direction
+
+    def drain(self) -> list[dict]:
+        """State rows changed since the last drain, ready for a bulk AlertConfig update."""
+        with self._lock:
+            rows = [
+                {"id": aid, "state": st["state"], "last_fired_at": _to_datetime(st["fired_at"]),
+                 "suppressed_count": st["suppressed"]}
+                for aid in self._dirty if (st := self._states.get(aid)) is not None
+            ]
+            self._dirty.clear()
+        return rows
+
+
+def write_alerts(db: Session, events: list[dict], states: list[dict]) -> None:
+    """Record fired alerts and alert state changes in one transaction."""
+    if not events and not states:
+        return
+    if events:
+        db.execute(insert(AlertHistory), [
+            {"user_id": e["user_id"], "alert_config_id": e["alert_id"], "message": e["message"],
+             "triggered_at": _to_datetime(e.get("timestamp")) or datetime.utcnow()}
+            for e in events
+        ])
+    if states:
+        existing = {i for (i,) in db.query(AlertConfig.id).filter(AlertConfig.id.in_([r["id"] for r in states]))}
+        states = [r for r in states if r["id"] in existing]  # alerts deleted meanwhile
+        if states:
+            db.execute(update(AlertConfig), states)
+    db.commit()
+
+
+alert_gate = AlertGate()
+
+
+def _alerts_changed() -> None:
+    """Tell the streaming alert engine to re-read alert configs."""
+    from backend.services.alert_engine import alert_engine
+    alert_engine.request_reload()
 
 
 class AlertService:
@@ -25,6 +179,7 @@ class AlertService:
         self.db.add(alert)
         self.db.commit()
         self.db.refresh(alert)
+        _alerts_changed()
         return alert
 
     def get_alerts(self, user_id: str) -> list[AlertConfig]:
@@ -40,8 +195,13 @@ class AlertService:
             if key == "condition":
                 value = json.dumps(value)
             setattr(alert, key, value)
+        if "condition" in kwargs or kwargs.get("enabled"):
+            # A changed or re-enabled alert starts armed
+            alert.state, alert.suppressed_count = "armed", 0
+            alert_gate.reset(alert.id)
         self.db.commit()
         self.db.refresh(alert)
+        _alerts_changed()
         return alert
 
     def delete_alert(self, alert_id: int, user_id: str) -> bool:
@@ -52,6 +212,8 @@ class AlertService:
             return False
         self.db.delete(alert)
         self.db.commit()
+        alert_gate.reset(alert_id)
+        _alerts_changed()
         return True
 
     def get_history(self, user_id: str, limit: int = 50) -> list[AlertHistory]:
@@ -64,52 +226,88 @@ class AlertService:
         )
 
     def evaluate_alerts(self, user_id: str) -> list[dict]:
-        alerts = self.db.query(AlertConfig).filter(
-            AlertConfig.user_id == user_id, AlertConfig.enabled.is_(True)
-        ).all()
+        return self.evaluate_all(user_id)
 
-        triggered = []
+    def evaluate_all(self, user_id: str | None = None) -> list[dict]:
+        """Evaluate every enabled alert (optionally for one user) in one batch.
+
+        Price alerts are grouped by symbol, each symbol is quoted once and all
+        thresholds are compared in one vectorized pass, so the cost scales
+        with distinct symbols rather than alert count. Breaches go through
+        ``alert_gate``, so an alert notifies once per crossing; notifications
+        are bulk-inserted into AlertHistory with the state changes and pushed
+        to ``/ws/alerts``.
+        """
+        query = self.db.query(AlertConfig).filter(AlertConfig.enabled.is_(True))
+        if user_id is not None:
+            query = query.filter(AlertConfig.user_id == user_id)
+        alerts = query.all()
+
+        price_alerts, other_alerts = [], []
         for alert in alerts:
+            alert_gate.seed(alert)  # first sighting only; later sweeps keep the gate's state
             condition = json.loads(alert.condition)
+            if alert.alert_type == "price":
+                price_alerts.append((alert, condition))
+            else:
+                other_alerts.append((alert, condition))
+
+        triggered = self._evaluate_price_batch(price_alerts)
+        if any(alert.alert_type == "risk" for alert, _ in other_alerts):
+            # One positions refresh serves every risk alert in the batch
+            from backend.services.risk_state_service import refresh_positions
+            refresh_positions(self.db)
+        for alert, condition in other_alerts:
             result = self._evaluate_condition(alert.alert_type, condition)
-            if result["triggered"]:
-                history = AlertHistory(
-                    user_id=user_id, alert_config_id=alert.id,
-                    message=result["message"],
-                )
-                self.db.add(history)
-                triggered.append({"alert_id": alert.id, "type": alert.alert_type, "message": result["message"]})
-
-        if triggered:
-            self.db.commit()
+            if "value" in result:
+                fires = alert_gate.check(alert.id, alert.user_id, result["value"], condition) is not None
+            else:
+                fires = result["triggered"]
+            if fires and result["triggered"]:
+                triggered.append({
+                    "alert_id": alert.id, "user_id": alert.user_id,
+                    "type": alert.alert_type, "message": result["message"],
+                })
+
+        write_alerts(self.db, triggered, alert_gate.drain())
+        for t in triggered:
+            alert_connections.publish(json.dumps({"type": "alert", **t}))
+        return triggered
+
+    def _evaluate_price_batch(self, price_alerts: list[tuple[AlertConfig, dict]]) -> list[dict]:
+        price_alerts = [(a, c) for a, c in price_alerts if c.get("symbol")]
+        if not price_alerts:
+            return []
+        symbols = sorted({c["symbol"].upper() for _, c in price_alerts})
+        prices = _latest_prices(symbols)
+
+        nan = float("nan")
+        price = np.array([prices.get(c["symbol"].upper(), nan) for _, c in price_alerts])
+        above = np.array([float(c.get("above", nan)) for _, c in price_alerts])
+        below = np.array([float(c.get("below", nan)) for _, c in price_alerts])
+        # Comparisons against NaN are False, so missing prices/thresholds never fire
+        hit = (price > above) | (price < below)
+        fired = np.array([alert_gate.is_fired(a.id) for a, _ in price_alerts])
+
+        triggered = []
+        # Only breaches and alerts waiting to re-arm need the gate
+        for i in np.flatnonzero(hit | (fired & ~np.isnan(price))):
+            alert, condition = price_alerts[i]
+            direction = alert_gate.check(alert.id, alert.user_id, float(price[i]), condition)
+            if direction is None:
+                continue
+            message = f"{condition['symbol']} is at ${price[i]:.2f}, {direction} ${condition[direction]}"
+            triggered.append({"alert_id": alert.id, "user_id": alert.user_id, "type": "price", "message": message})
         return triggered
 
     def _evaluate_condition(self, alert_type: str, condition: dict) -> dict:
-        if alert_type == "price":
-            return self._check_price(condition)
-        elif alert_type == "risk":
+        if alert_type == "risk":
             return self._check_risk(condition)
         return {"triggered": False, "message": ""}
 
-    def _check_price(self, condition: dict) -> dict:
-        symbol = condition.get("symbol", "")
-        try:
-            from puffin.data import YFinanceProvider
-            provider = YFinanceProvider()
-            import datetime
-            end = datetime.date.today().isoformat()
-            start = (datetime.date.today() - datetime.timedelta(days=5)).isoformat()
-            data = provider.get_data(symbol, start=start, end=end)
-            current_price = float(data["Close"].iloc[-1])
-
-            if "above" in condition and current_price > condition["above"]:
-                return {"triggered": True, "message": f"{symbol} is at ${current_price:.2f}, above ${condition['above']}"}
-            if "below" in condition and current_price < condition["below"]:
-                return {"triggered": True, "message": f"{symbol} is at ${current_price:.2f}, below ${condition['below']}"}
-        except Exception as e:
-            logger.error(f"Price check failed: {e}")
-        return {"triggered": False, "message": ""}
-
     def _check_risk(self, condition: dict) -> dict:
-        # Placeholder for risk threshold checking
-        return {"triggered": False, "message": ""}
+        from backend.services.risk_state_service import RISK_METRICS, portfolio_risk_state, risk_breach
+        metrics = portfolio_risk_state.metrics()
+        message = risk_breach(metrics, condition)
+        value = metrics.get(condition["metric"]) if condition.get("metric") in RISK_METRICS else None
+        return {"triggered": message is not None, "message": message or "", "value": value}
@@ -1,16 +1,18 @@
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 from sqlalchemy.orm import Session
 
+from backend.core.broadcast import Broadcaster
 from backend.models.agent_log import AgentLog
-from backend.services.ai_tools import AI_TOOL_SCHEMAS, execute_tool
+from backend.services.ai_tools import AI_TOOL_SCHEMAS, ToolExecutor
 
 logger = logging.getLogger(__name__)
 
 # Connected WebSocket clients for agent activity streaming
-agent_connections: list = []
+agent_connections = Broadcaster("agent")
 
 
 class AutonomousAgentService:
@@ -38,6 +40,14 @@ class AutonomousAgentService:
             "tool_calls": analysis.get("tool_calls", []),
         }
 
+        # Tools the model asked for run in one concurrent batch; orders only go
+        # through the safety-checked suggestions below
+        tool_calls = [c for c in report["tool_calls"] if c.get("name") != "place_order"]
+        if tool_calls and api_calls < max_api_calls:
+            api_calls += 1
+            report["tool_results"] = ToolExecutor(user_id, self.db).execute_many(tool_calls)
+            self._stream_activity({"step": "tools", "count": len(tool_calls)})
+
         # Step 4: Extract suggestions
         suggestions = analysis.get("suggestions", [])
         report["suggestions"] = suggestions
@@ -50,12 +60,13 @@ class AutonomousAgentService:
         if auto_trade:
             from backend.services.safety_service import SafetyService
             safety = SafetyService(self.db)
+            tools = ToolExecutor(user_id, self.db)
             for suggestion in suggestions:
                 if api_calls >= max_api_calls:
                     report["budget_exhausted"] = True
                     break
                 if suggestion.get("action") == "trade" and safety.can_trade(user_id):
-                    result = execute_tool("place_order", suggestion.get("params", {}), user_id, self.db)
+                    result = tools.execute("place_order", suggestion.get("params", {}))
                     actions_taken.append({"action": suggestion, "result": result})
                     self._stream_activity({"step": "execute", "action": suggestion})
 
@@ -75,68 +86,47 @@ class AutonomousAgentService:
         return {"log_id": log.id, "report": report}
 
     def _gather_context(self, user_id: str) -> dict:
-        context = {}
-        try:
-            from backend.services.broker_service import BrokerService
-            broker = BrokerService(self.db)
-            context["positions"] = broker.get_positions()
-        except Exception:
-            context["positions"] = []
-
-        try:
-            from backend.services.broker_service import BrokerService
-            broker = BrokerService(self.db)
-            context["account"] = broker.get_account()
-        except Exception:
-            context["account"] = {}
+        """Portfolio view from the shared snapshot plus the user's alerts and strategies."""
+        from backend.services.portfolio_snapshot_service import PortfolioSnapshotService
+
+        # The snapshot only waits on the broker and analytics, never this session,
+        # so the database reads run here while it refreshes
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="agent-context") as pool:
+            snapshot_f = pool.submit(PortfolioSnapshotService(self.db).get)
+            recent_alerts = self._recent_alerts(user_id)
+            active_strategies = self._active_strategies(user_id)
+            try:
+                snapshot = snapshot_f.result()
+            except Exception as e:
+                logger.warning(f"Portfolio snapshot unavailable: {e}")
+                snapshot = {}
+        context = {
+            "positions": snapshot.get("positions", []),
+            "account": snapshot.get("account", {}),
+            "recent_alerts": recent_alerts,
+            "active_strategies": active_strategies,
+            "snapshot_version": snapshot.get("version"),
+            "snapshot_age": snapshot.get("age"),
+        }
+        if context["positions"]:
+            context["portfolio_risk"] = snapshot.get("portfolio_risk", {})
+            context["factor_exposure"] = snapshot.get("factor_exposure", {})
+        return context
 
+    def _recent_alerts(self, user_id: str) -> list[dict]:
         try:
             from backend.services.alert_service import AlertService
-            alert_svc = AlertService(self.db)
-            history = alert_svc.get_history(user_id, limit=10)
-            context["recent_alerts"] = [{"message": h.message, "time": str(h.triggered_at)} for h in history]
+            history = AlertService(self.db).get_history(user_id, limit=10)
+            return [{"message": h.message, "time": str(h.triggered_at)} for h in history]
         except Exception:
-            context["recent_alerts"] = []
+            return []
 
+    def _active_strategies(self, user_id: str) -> list:
         try:
             from backend.services.strategy_runner_service import StrategyRunnerService
-            runner = StrategyRunnerService(self.db)
-            context["active_strategies"] = runner.get_active(user_id)
+            return StrategyRunnerService(self.db).get_active(user_id)
         except Exception:
-            context["active_strategies"] = []
-
-        # Risk check on current positions
-        positions = context.get("positions", [])
-        if positions:
-            try:
-                from backend.services.risk_service import RiskService
-                symbols = [p["symbol"] for p in positions if p.get("symbol")]
-                if symbols:
-                    n = len(symbols)
-                    weights = [1.0 / n] * n
-                    today = datetime.utcnow().strftime("%Y-%m-%d")
-                    start = (datetime.utcnow().replace(year=datetime.utcnow().year - 1)).strftime("%Y-%m-%d")
-                    risk_svc = RiskService()
-                    context["portfolio_risk"] = risk_svc.portfolio_risk(symbols, weights, start, today)
-            except Exception as e:
-                logger.debug(f"Risk check failed: {e}")
-                context["portfolio_risk"] = {}
-
-        # Factor analysis on top holdings
-        if positions:
-            try:
-                from backend.services.factors_service import FactorsService
-                symbols = [p["symbol"] for p in positions if p.get("symbol")][:5]
-                if symbols:
-                    today = datetime.utcnow().strftime("%Y-%m-%d")
-                    start = (datetime.utcnow().replace(year=datetime.utcnow().year - 1)).strftime("%Y-%m-%d")
-                    factors_svc = FactorsService()
-                    context["factor_exposure"] = factors_svc.compute(symbols, start, today)
-            except Exception as e:
-                logger.debug(f"Factor analysis failed: {e}")
-                context["factor_exposure"] = {}
-
-        return context
+            return []
 
     def _analyze(self, context: dict, user_id: str) -> dict:
         prompt = f"""You are an autonomous trading agent. Analyze the current portfolio and market conditions.
@@ -157,23 +147,15 @@ Provide:
 Be conservative and risk-aware."""
 
         try:
-            from puffin.ai import ClaudeProvider
-            provider = ClaudeProvider()
-            response = provider.generate(prompt)
+            from backend.services.llm_service import get_llm
+            response = get_llm().generate(prompt)
             return {"response": response, "suggestions": [], "tool_calls": []}
         except Exception as e:
             logger.error(f"Agent LLM call failed: {e}")
             return {"response": f"Analysis unavailable: {e}", "suggestions": []}
 
     def _stream_activity(self, data: dict):
-        import asyncio
-        for ws in agent_connections[:]:
-            try:
-                asyncio.get_event_loop().create_task(
-                    ws.send_text(json.dumps(data))
-                )
-            except Exception:
-                agent_connections.remove(ws)
+        agent_connections.publish(json.dumps(data))
 
     def get_logs(self, user_id: str, limit: int = 20) -> list[AgentLog]:
         return (
@@ -0,0 +1,194 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the client's connection is gone and it should be rebuilt
+CONNECTION_ERRORS = (ConnectionError, TimeoutError, OSError)
+
+
+def _alpaca_factory():
+    from puffin.broker import AlpacaBroker
+    return AlpacaBroker(
+        api_key=settings.alpaca_api_key,
+        secret_key=settings.alpaca_secret_key,
+        paper=settings.paper_trading,
+    )
+
+
+def _ibkr_factory():
+    from puffin.broker import IBKRBroker
+
+    from backend.services.ib_session_service import ThreadAffineProxy
+
+    # ib_insync clients are loop-bound, so the shared client lives on one thread
+    return ThreadAffineProxy(lambda: IBKRBroker(
+        host=settings.ibkr_host,
+        port=settings.ibkr_port,
+        client_id=settings.ibkr_client_id,
+        paper=settings.paper_trading,
+    ))
+
+
+BROKER_FACTORIES: dict[str, Callable[[], object]] = {
+    "alpaca": _alpaca_factory,
+    "ibkr": _ibkr_factory,
+}
+
+
+class _Entry:
+    __slots__ = ("client", "created_at", "last_used", "in_use")
+
+    def __init__(self, client):
+        self.client = client
+        self.created_at = self.last_used = time.monotonic()
+        self.in_use = 0
+
+
+class BrokerPool:
+    """Process-wide broker clients, one per broker kind, shared by every service.
+
+    A client is rebuilt when its health check fails, when a call through it
+    raises a connection error, or when it has sat idle longer than
+    ``broker_idle_timeout``. Idle clients are also closed by a scheduler sweep
+    so an unused IB connection does not hold its client id.
+    """
+
+    def __init__(
+        self, idle_timeout: float | None = None,
+        factories: dict[str, Callable[[], object]] | None = None,
+    ):
+        self.idle_timeout = idle_timeout if idle_timeout is not None else settings.broker_idle_timeout
+        self.factories = factories if factories is not None else BROKER_FACTORIES
+        self._entries: dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def get(self, kind: str | None = None):
+        """Return a healthy client for ``kind`` (default: the configured broker)."""
+        kind = kind or settings.broker
+        if kind not in self.factories:
+            kind = "alpaca"
+        stale = None
+        with self._lock:
+            entry = self._entries.get(kind)
+            if entry is not None and not self._usable(entry):
+                stale = self._entries.pop(kind)
+                entry = None
+            if entry is None:
+                # Built under the lock so concurrent callers never open two connections
+                entry = self._entries[kind] = _Entry(self.factories[kind]())
+                self.created += 1
+            else:
+                self.reused += 1
+            entry.last_used = time.monotonic()
+        if stale is not None:
+            self._close(stale.client)
+        return entry.client
+
+    @contextmanager
+    def lease(self, client):
+        """Mark a client busy for the duration of a call; drop it on connection errors."""
+        # in_use is read by the idle sweep under the lock, so it is only changed under it
+        with self._lock:
+            entry = self._find(client)
+            if entry is not None:
+                entry.in_use += 1
+        try:
+            yield client
+        except CONNECTION_ERRORS:
+            self.invalidate(client)
+            raise
+        finally:
+            if entry is not None:
+                with self._lock:
+                    entry.in_use -= 1
+                    entry.last_used = time.monotonic()
+
+    def invalidate(self, client) -> None:
+        """Discard a client so the next ``get`` reconnects."""
+        with self._lock:
+            for kind, entry in list(self._entries.items()):
+                if entry.client is client:
+                    del self._entries[kind]
+                    break
+            else:
+                return
+        logger.info(f"Discarding {kind} broker client")
+        self._close(client)
+
+    def close_idle(self) -> int:
+        """Close clients idle past the timeout; return how many were closed."""
+        now = time.monotonic()
+        with self._lock:
+            idle = [
+                kind for kind, e in self._entries.items()
+                if not e.in_use and now - e.last_used > self.idle_timeout
+            ]
+            closed = [self._entries.pop(kind) for kind in idle]
+        for entry in closed:
+            self._close(entry.client)
+        return len(closed)
+
+    def close_all(self) -> None:
+        with self._lock:
+            entries, self._entries = list(self._entries.values()), {}
+        for entry in entries:
+            self._close(entry.client)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "created": self.created,
+            "reused": self.reused,
+            "clients": {
+                kind: {"age_s": round(now - e.created_at, 1), "idle_s": round(now - e.last_used, 1),
+                       "in_use": e.in_use}
+                for kind, e in self._entries.items()
+            },
+        }
+
+    def _find(self, client) -> _Entry | None:
+        for entry in self._entries.values():
+            if entry.client is client:
+                return entry
+        return None
+
+    def _usable(self, entry: _Entry) -> bool:
+        if not entry.in_use and time.monotonic() - entry.last_used > self.idle_timeout:
+            return False
+        return self._healthy(entry.client)
+
+    @staticmethod
+    def _healthy(client) -> bool:
+        for name in ("is_connected", "isConnected"):
+            try:
+                check = getattr(client, name)
+            except AttributeError:
+                continue
+            try:
+                return bool(check() if callable(check) else check)
+            except Exception:
+                return False
+        return True  # stateless (REST) clients have no connection to check
+
+    @staticmethod
+    def _close(client) -> None:
+        for name in ("disconnect", "close"):
+            try:
+                method = getattr(client, name)
+            except AttributeError:
+                continue
+            try:
+                method()
+            except Exception as e:
+                logger.debug(f"Broker client {name} failed: {e}")
+
+
+broker_pool = BrokerPool()
@@ -1,12 +1,84 @@
+import json
+import logging
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable
 
 from sqlalchemy.orm import Session
 
 from backend.core.config import settings
+from backend.models.pending_order import PendingOrder
 from backend.models.trade_history import TradeHistory
+from backend.services.broker_pool import broker_pool
+from backend.services.order_tracking_service import broker_order_id
+from backend.services.pretrade_risk_service import check_orders
 
-# Pending orders awaiting confirmation
-_pending_orders: dict[str, dict] = {}
+logger = logging.getLogger(__name__)
+
+
+class SnapshotCache:
+    """Short-TTL cache of broker snapshots (account, positions).
+
+    Concurrent callers for the same key share one broker request. Invalidation
+    bumps a generation counter, so a fetch that was already in flight when an
+    order went out does not repopulate the cache with pre-order data.
+    """
+
+    def __init__(self, ttl: float | None = None):
+        self.ttl = ttl
+        self._entries: dict[tuple, tuple[object, float]] = {}  # key -> (value, fetched_at)
+        self._locks: dict[tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _ttl(self) -> float:
+        return self.ttl if self.ttl is not None else settings.broker_snapshot_ttl
+
+    def get(self, key: tuple, fetch: Callable[[], object]) -> tuple[object, float]:
+        """Return ``(value, age_seconds)``, fetching if the entry is missing or stale."""
+        entry = self._fresh(key)
+        if entry is not None:
+            self.hits += 1
+            return entry[0], time.monotonic() - entry[1]
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        with key_lock:
+            entry = self._fresh(key)  # another caller may have fetched meanwhile
+            if entry is not None:
+                self.hits += 1
+                return entry[0], time.monotonic() - entry[1]
+            self.misses += 1
+            generation = self._generation
+            value = fetch()
+            fetched_at = time.monotonic()
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[key] = (value, fetched_at)
+            return value, 0.0
+
+    def _fresh(self, key: tuple) -> tuple[object, float] | None:
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[1] < self._ttl():
+            return entry
+        return None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+_snapshots = SnapshotCache()
+
+
+def invalidate_broker_snapshots() -> None:
+    """Drop cached account/positions, e.g. after an order or a fill."""
+    _snapshots.invalidate()
 
 
 class BrokerService:
@@ -14,30 +86,35 @@ class BrokerService:
         self.db = db
 
     def _get_broker(self):
-        if settings.broker == "ibkr":
-            from puffin.broker import IBKRBroker
-            return IBKRBroker(
-                host=settings.ibkr_host,
-                port=settings.ibkr_port,
-                client_id=settings.ibkr_client_id,
-                paper=settings.paper_trading,
-            )
-        else:
-            from puffin.broker import AlpacaBroker
-            return AlpacaBroker(
-                api_key=settings.alpaca_api_key,
-                secret_key=settings.alpaca_secret_key,
-                paper=settings.paper_trading,
-            )
+        return broker_pool.get()
 
     def get_account(self) -> dict:
+        account, age = self.get_account_snapshot()
+        return {**account, "cache_age": round(age, 3)}
+
+    def get_positions(self) -> list[dict]:
+        return self.get_positions_snapshot()[0]
+
+    def get_account_snapshot(self) -> tuple[dict, float]:
+        """Account summary and its age in seconds, served from the snapshot cache."""
+        account, age = _snapshots.get((settings.broker, "account"), self._fetch_account)
+        return dict(account), age
+
+    def get_positions_snapshot(self) -> tuple[list[dict], float]:
+        """Positions and their age in seconds, served from the snapshot cache."""
+        positions, age = _snapshots.get((settings.broker, "positions"), self._fetch_positions)
+        return [dict(p) for p in positions], age
+
+    def _fetch_account(self) -> dict:
         broker = self._get_broker()
-        info = broker.get_account()
+        with broker_pool.lease(broker):
+            info = broker.get_account()
         return {"equity": info.equity, "cash": info.cash, "buying_power": info.buying_power}
 
-    def get_positions(self) -> list[dict]:
+    def _fetch_positions(self) -> list[dict]:
         broker = self._get_broker()
-        positions = broker.get_positions()
+        with broker_pool.lease(broker):
+            positions = broker.get_positions()
         return [
             {"symbol": p.symbol, "qty": p.qty, "avg_price": p.avg_entry_price, "current_price": p.current_price}
             for p in positions
@@ -50,9 +127,9 @@ class BrokerService:
         right: str | None = None, multiplier: str | None = None,
         pair_currency: str | None = None, limit_price: float | None = None,
         stop_price: float | None = None, time_in_force: str = "DAY",
+        user_id: str | None = None,
     ) -> dict:
-        order_id = str(uuid.uuid4())
-        _pending_orders[order_id] = {
+        order = {
             "symbol": symbol, "side": side, "qty": qty, "order_type": order_type,
             "asset_type": asset_type, "exchange": exchange, "currency": currency,
             "expiry": expiry, "strike": strike, "right": right,
@@ -60,33 +137,49 @@ class BrokerService:
             "limit_price": limit_price, "stop_price": stop_price,
             "time_in_force": time_in_force,
         }
-        # Build descriptive summary
-        spec_parts = [f"{side} {qty} {symbol} ({order_type})"]
-        if asset_type != "STK":
-            spec_parts.append(f"type={asset_type}")
-        if expiry:
-            spec_parts.append(f"exp={expiry}")
-        if strike is not None:
-            spec_parts.append(f"strike={strike}")
-        if right:
-            spec_parts.append(f"right={right}")
-        if pair_currency:
-            spec_parts.append(f"pair={pair_currency}")
-        if exchange != "SMART":
-            spec_parts.append(f"exch={exchange}")
-        if currency != "USD":
-            spec_parts.append(f"ccy={currency}")
-        if limit_price is not None:
-            spec_parts.append(f"limit={limit_price}")
-        if stop_price is not None:
-            spec_parts.append(f"stop={stop_price}")
-
+        check = check_orders(self.db, user_id, [order])[0]
+        if not check["accepted"]:
+            return {"status": "rejected", "summary": self._describe(order), "reasons": check["reasons"]}
+        row = self._stage(order, user_id)
+        self.db.commit()
         return {
-            "order_id": order_id,
-            "status": "pending_confirmation",
-            "summary": " ".join(spec_parts),
+            "order_id": row.id, "status": "pending_confirmation", "summary": row.summary,
+            "warnings": check["warnings"],
         }
 
+    def _stage(self, order: dict, user_id: str | None, basket_id: str | None = None) -> PendingOrder:
+        now = datetime.utcnow()
+        row = PendingOrder(
+            id=str(uuid.uuid4()), user_id=user_id, basket_id=basket_id, status="pending",
+            order=json.dumps(order), summary=self._describe(order), created_at=now,
+            expires_at=now + timedelta(seconds=settings.pending_order_ttl),
+        )
+        self.db.add(row)
+        return row
+
+    @staticmethod
+    def _describe(order: dict) -> str:
+        spec_parts = [f"{order['side']} {order['qty']} {order['symbol']} ({order['order_type']})"]
+        if order["asset_type"] != "STK":
+            spec_parts.append(f"type={order['asset_type']}")
+        if order["expiry"]:
+            spec_parts.append(f"exp={order['expiry']}")
+        if order["strike"] is not None:
+            spec_parts.append(f"strike={order['strike']}")
+        if order["right"]:
+            spec_parts.append(f"right={order['right']}")
+        if order["pair_currency"]:
+            spec_parts.append(f"pair={order['pair_currency']}")
+        if order["exchange"] != "SMART":
+            spec_parts.append(f"exch={order['exchange']}")
+        if order["currency"] != "USD":
+            spec_parts.append(f"ccy={order['currency']}")
+        if order["limit_price"] is not None:
+            spec_parts.append(f"limit={order['limit_price']}")
+        if order["stop_price"] is not None:
+            spec_parts.append(f"stop={order['stop_price']}")
+        return " ".join(spec_parts)
+
     def _needs_contract_spec(self, order: dict) -> bool:
         return (
             order.get("asset_type", "STK") != "STK"
@@ -95,11 +188,49 @@ class BrokerService:
         )
 
     def confirm_order(self, order_id: str, user_id: str) -> dict:
-        order = _pending_orders.pop(order_id, None)
-        if not order:
+        # Claim with a conditional UPDATE so only one worker can confirm an order
+        claimed = self._claim(user_id, PendingOrder.id == order_id, PendingOrder.basket_id.is_(None))
+        if not claimed:
+            row = self.db.get(PendingOrder, order_id)
+            if row is not None and row.user_id == user_id and row.status == "pending" and row.basket_id:
+                return {"error": "Order is part of a basket; confirm the basket instead"}
             return {"error": "Order not found or already processed"}
 
-        broker = self._get_broker()
+        row = claimed[0]
+        order = json.loads(row.order)
+        if not self._reserve_trades(claimed, user_id):
+            return {"error": "Daily trade limit reached"}
+        try:
+            result = self._send(self._get_broker(), order)
+        except Exception as e:
+            row.status, row.error = "failed", str(e)
+            self.db.commit()
+            self._release_trades(user_id, 1)
+            raise
+        # Positions and buying power are about to change
+        invalidate_broker_snapshots()
+
+        row.status = "submitted"
+        self.db.add(self._trade_record(order, user_id, result))
+        self.db.commit()
+        return {"order_id": order_id, "status": "submitted", "broker_order": str(result)}
+
+    def _claim(self, user_id: str, *criteria) -> list[PendingOrder]:
+        """Atomically move a user's matching live pending orders to ``confirming``."""
+        claim_id = f"confirming:{uuid.uuid4()}"
+        count = self.db.query(PendingOrder).filter(
+            PendingOrder.user_id == user_id,
+            PendingOrder.status == "pending",
+            PendingOrder.expires_at > datetime.utcnow(),
+            *criteria,
+        ).update({PendingOrder.status: claim_id}, synchronize_session=False)
+        self.db.commit()
+        if not count:
+            return []
+        return self.db.query(PendingOrder).filter(PendingOrder.status == claim_id).all()
+
+    def _send(self, broker, order: dict):
+        """Submit one staged order to the broker and return the broker's result."""
         from puffin.broker import Order, OrderSide, OrderType, TimeInForce
 
         puffin_order = Order(
@@ -124,16 +255,34 @@ class BrokerService:
                 multiplier=order.get("multiplier"),
                 pair_currency=order.get("pair_currency"),
             )
-            result = broker.submit_order_with_spec(puffin_order, spec)
-        else:
-            result = broker.submit_order(
+            with broker_pool.lease(broker):
+                return broker.submit_order_with_spec(puffin_order, spec)
+        with broker_pool.lease(broker):
+            return broker.submit_order(
                 symbol=order["symbol"],
                 side=OrderSide(order["side"]),
                 qty=order["qty"],
                 order_type=OrderType(order["order_type"]),
             )
 
-        trade = TradeHistory(
+    def _reserve_trades(self, rows: list[PendingOrder], user_id: str) -> bool:
+        """Count claimed orders against the daily limit; put them back to pending if it is reached."""
+        from backend.services.safety_service import SafetyService
+        if SafetyService(self.db).reserve_trades(user_id, len(rows)):
+            return True
+        for row in rows:
+            row.status = "pending"
+        self.db.commit()
+        return False
+
+    def _release_trades(self, user_id: str, n: int) -> None:
+        from backend.services.safety_service import SafetyService
+        SafetyService(self.db).release_trades(user_id, n)
+
+    @staticmethod
+    def _trade_record(order: dict, user_id: str, result=None) -> TradeHistory:
+        # Price is filled in by the order tracker once the broker reports a fill
+        return TradeHistory(
             user_id=user_id, symbol=order["symbol"], side=order["side"],
             qty=order["qty"], price=0.0,
             asset_type=order.get("asset_type", "STK"),
@@ -142,12 +291,136 @@ class BrokerService:
             expiry=order.get("expiry"),
             strike=order.get("strike"),
             right=order.get("right"),
+            broker_order_id=broker_order_id(result),
+            status="submitted",
         )
-        self.db.add(trade)
-        self.db.commit()
-        return {"order_id": order_id, "status": "submitted", "broker_order": str(result)}
 
-    def cancel_order(self, order_id: str) -> dict:
-        if _pending_orders.pop(order_id, None):
+    def cancel_order(self, order_id: str, user_id: str) -> dict:
+        row = self.db.get(PendingOrder, order_id)
+        if row is not None and row.user_id == user_id and row.status == "pending" and row.basket_id:
+            return {"error": "Order is part of a basket; cancel the basket instead"}
+        count = self.db.query(PendingOrder).filter(
+            PendingOrder.id == order_id, PendingOrder.user_id == user_id, PendingOrder.status == "pending",
+        ).update({PendingOrder.status: "cancelled"}, synchronize_session=False)
+        self.db.commit()
+        if count:
             return {"order_id": order_id, "status": "cancelled"}
         return {"error": "Order not found"}
+
+    def get_pending(self, user_id: str) -> list[dict]:
+        """Unexpired orders awaiting confirmation for a user, oldest first."""
+        rows = self.db.query(PendingOrder).filter(
+            PendingOrder.user_id == user_id,
+            PendingOrder.status == "pending",
+            PendingOrder.expires_at > datetime.utcnow(),
+        ).order_by(PendingOrder.created_at).all()
+        return [
+            {"order_id": r.id, "basket_id": r.basket_id, "summary": r.summary,
+             "created_at": str(r.created_at), "expires_at": str(r.expires_at)}
+            for r in rows
+        ]
+
+    # --- Baskets ---
+
+    def submit_basket(self, orders: list[dict], user_id: str | None = None) -> dict:
+        """Stage several orders as one basket that is confirmed with a single call.
+
+        Each item takes the same fields as ``submit_order``.
+        """
+        if not orders:
+            return {"error": "Basket is empty"}
+        basket_id = str(uuid.uuid4())
+        staged = [
+            {
+                "order_type": "market", "asset_type": "STK", "exchange": "SMART",
+                "currency": "USD", "expiry": None, "strike": None, "right": None,
+                "multiplier": None, "pair_currency": None, "limit_price": None,
+                "stop_price": None, "time_in_force": "DAY", **params,
+            }
+            for params in orders
+        ]
+        # Every leg is checked together so same-symbol legs are netted
+        checks = check_orders(self.db, user_id, staged)
+        legs, rejected = [], []
+        for order, check in zip(staged, checks):
+            if not check["accepted"]:
+                rejected.append({"summary": self._describe(order), "reasons": check["reasons"]})
+                continue
+            row = self._stage(order, user_id, basket_id)
+            legs.append({"order_id": row.id, "summary": row.summary, "warnings": check["warnings"]})
+        if not legs:
+            return {"status": "rejected", "legs": [], "rejected": rejected}
+        self.db.commit()
+        return {"basket_id": basket_id, "status": "pending_confirmation", "legs": legs, "rejected": rejected}
+
+    def confirm_basket(self, basket_id: str, user_id: str) -> dict:
+        """Confirm every leg of a basket and submit them to the broker concurrently.
+
+        All legs are claimed by one UPDATE, so a basket is confirmed at most
+        once, even across workers; its legs cannot be confirmed individually.
+        All legs are reserved against the daily trade limit together.
+        Broker failures are reported per leg and do not stop the other legs.
+        """
+        rows = self._claim(user_id, PendingOrder.basket_id == basket_id)
+        if not rows:
+            return {"error": "Basket not found or already processed"}
+        if not self._reserve_trades(rows, user_id):
+            return {"error": "Daily trade limit reached"}
+        legs = [(row, json.loads(row.order)) for row in rows]
+
+        broker = self._get_broker()
+        workers = max(1, min(settings.broker_batch_workers, len(legs)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="basket") as pool:
+            futures = [pool.submit(self._send, broker, order) for _, order in legs]
+
+        results = []
+        for (row, order), future in zip(legs, futures):
+            leg = {"order_id": row.id, "symbol": order["symbol"], "side": order["side"], "qty": order["qty"]}
+            try:
+                result = future.result()
+                leg.update(status="submitted", broker_order=str(result))
+                row.status = "submitted"
+                self.db.add(self._trade_record(order, user_id, result))
+            except Exception as e:
+                logger.warning(f"Basket {basket_id} leg {order['symbol']} failed: {e}")
+                leg.update(status="failed", error=str(e))
+                row.status, row.error = "failed", str(e)
+            results.append(leg)
+        invalidate_broker_snapshots()
+        self.db.commit()
+
+        submitted = sum(1 for leg in results if leg["status"] == "submitted")
+        self._release_trades(user_id, len(results) - submitted)
+        if submitted == len(results):
+            status = "submitted"
+        elif submitted:
+            status = "partial"
+        else:
+            status = "failed"
+        return {
+            "basket_id": basket_id, "status": status,
+            "submitted": submitted, "failed": len(results) - submitted, "legs": results,
+        }
+
+    def cancel_basket(self, basket_id: str, user_id: str) -> dict:
+        count = self.db.query(PendingOrder).filter(
+            PendingOrder.basket_id == basket_id, PendingOrder.user_id == user_id, PendingOrder.status == "pending",
+        ).update({PendingOrder.status: "cancelled"}, synchronize_session=False)
+        self.db.commit()
+        if not count:
+            return {"error": "Basket not found"}
+        return {"basket_id": basket_id, "status": "cancelled"}
+
+
+def expire_pending_orders(db: Session) -> int:
+    """Mark stale pending orders expired and purge old finished rows; return the expired count."""
+    now = datetime.utcnow()
+    expired = db.query(PendingOrder).filter(
+        PendingOrder.status == "pending", PendingOrder.expires_at <= now,
+    ).update({PendingOrder.status: "expired"}, synchronize_session=False)
+    cutoff = now - timedelta(seconds=settings.pending_order_retention)
+    db.query(PendingOrder).filter(
+        PendingOrder.status != "pending", PendingOrder.expires_at <= cutoff,
+    ).delete(synchronize_session=False)
+    db.commit()
+    return expired
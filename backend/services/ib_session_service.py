@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PriceListener = Callable[[str, float, float], None]
+
+MAX_RECONNECT_BACKOFF = 60.0
+
+
+class ThreadAffineProxy:
+    """Forward method calls to an object on the single thread that owns it.
+
+    ib_insync clients are bound to the event loop of the thread that created
+    them, so a shared client must only ever be touched from that thread.
+    """
+
+    def __init__(self, factory: Callable[[], object], name: str = "ib-broker"):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self._target = self._executor.submit(factory).result()
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            return self._executor.submit(attr, *args, **kwargs).result()
+        return call
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+class IBSession:
+    """Process-wide IB Gateway / TWS market-data session.
+
+    Owns one ``ib_insync.IB`` connection running on a dedicated event-loop
+    thread. Qualified contracts are cached for the life of the process,
+    ``reqMktData`` subscriptions stay open between polls and are restored
+    after a reconnect, and reconnects back off exponentially.
+    """
+
+    def __init__(self, host: str | None = None, port: int | None = None, client_id: int | None = None):
+        self.host = host or settings.ibkr_host
+        self.port = port or settings.ibkr_port
+        if client_id is None:
+            client_id = settings.ibkr_data_client_id
+        # Market data gets its own client id so it never collides with order routing
+        self.client_id = client_id if client_id is not None else settings.ibkr_client_id + 1
+        self.ib = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._started = threading.Event()
+        self._lock = threading.Lock()
+        self._connect_lock: asyncio.Lock | None = None
+        self._contracts: dict[str, object] = {}
+        self._tickers: dict[str, object] = {}
+        self._wanted: set[str] = set()
+        self._listeners: list[PriceListener] = []
+        self._backoff = 1.0
+        self._next_attempt = 0.0
+        self._reconnect_task: asyncio.Task | None = None
+
+    # --- Lifecycle ---
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._started.clear()
+            self._thread = threading.Thread(target=self._run_loop, name="ib-session", daemon=True)
+            self._thread.start()
+        self._started.wait()
+
+    def _run_loop(self) -> None:
+        from ib_insync import IB
+
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._connect_lock = asyncio.Lock()
+        self.ib = IB()
+        self.ib.pendingTickersEvent += self._on_tickers
+        self.ib.disconnectedEvent += self._on_disconnected
+        self._started.set()
+        self._loop.run_forever()
+
+    def stop(self) -> None:
+        loop = self._loop
+        if loop is None or not loop.is_running():
+            return
+
+        def _shutdown():
+            self.ib.disconnect()
+            loop.stop()
+        loop.call_soon_threadsafe(_shutdown)
+
+    @property
+    def connected(self) -> bool:
+        return self.ib is not None and self.ib.isConnected()
+
+    def run(self, coro_factory: Callable[[], object], timeout: float | None = None):
+        """Run a coroutine on the session loop and wait for its result."""
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(coro_factory(), self._loop)
+        return future.result(timeout)
+
+    def connect(self, timeout: float | None = None) -> None:
+        self.run(self._ensure_connected, timeout)
+
+    async def _ensure_connected(self) -> None:
+        if self.ib.isConnected():
+            return
+        async with self._connect_lock:
+            if self.ib.isConnected():
+                return
+            now = time.monotonic()
+            if now < self._next_attempt:
+                raise ConnectionError(
+                    f"IBKR reconnect backoff, retry in {self._next_attempt - now:.1f}s"
+                )
+            try:
+                await self.ib.connectAsync(self.host, self.port, clientId=self.client_id)
+            except Exception:
+                self._next_attempt = time.monotonic() + self._backoff
+                self._backoff = min(self._backoff * 2, MAX_RECONNECT_BACKOFF)
+                raise
+            self._backoff = 1.0
+            self._next_attempt = 0.0
+            logger.info(f"IBKR session connected (client id {self.client_id})")
+            # Tickers do not survive a disconnect; re-request everything still wanted
+            self._tickers.clear()
+            await self._sync_market_data()
+
+    def _on_disconnected(self) -> None:
+        if self._wanted and (self._reconnect_task is None or self._reconnect_task.done()):
+            self._reconnect_task = self._loop.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        while not self.ib.isConnected() and self._wanted:
+            await asyncio.sleep(max(self._next_attempt - time.monotonic(), self._backoff))
+            try:
+                await self._ensure_connected()
+            except Exception as e:
+                logger.warning(f"IBKR reconnect failed: {e}")
+
+    # --- Contracts ---
+
+    async def qualify_stocks(self, symbols: list[str]) -> dict[str, object]:
+        """Qualified SMART/USD stock contracts, from cache where possible."""
+        from ib_insync import Stock
+
+        missing = [s for s in symbols if s not in self._contracts]
+        if missing:
+            await self._ensure_connected()
+            qualified = await self.ib.qualifyContractsAsync(*[Stock(s, "SMART", "USD") for s in missing])
+            for contract in qualified:
+                if getattr(contract, "conId", 0):
+                    self._contracts[contract.symbol] = contract
+        return {s: self._contracts[s] for s in symbols if s in self._contracts}
+
+    # --- Market data ---
+
+    def add_listener(self, listener: PriceListener) -> None:
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: PriceListener) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def subscribe(self, symbols: set[str]) -> None:
+        """Open streaming subscriptions (non-blocking)."""
+        # Rebind rather than mutate: the session thread may be iterating
+        self._wanted = self._wanted | set(symbols)
+        self._schedule_sync()
+
+    def unsubscribe(self, symbols: set[str]) -> None:
+        self._wanted = self._wanted - set(symbols)
+        self._schedule_sync()
+
+    def _schedule_sync(self) -> None:
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(self._sync_market_data(), self._loop)
+        future.add_done_callback(self._log_sync_error)
+
+    @staticmethod
+    def _log_sync_error(future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(f"IBKR market-data sync failed: {future.exception()}")
+
+    async def _sync_market_data(self) -> None:
+        if not self.ib.isConnected():
+            if not self._wanted:
+                return
+            await self._ensure_connected()  # syncs subscriptions once connected
+            return
+        for sym in list(self._tickers):
+            if sym not in self._wanted:
+                self.ib.cancelMktData(self._tickers.pop(sym).contract)
+        new = [s for s in self._wanted if s not in self._tickers]
+        if new:
+            for sym, contract in (await self.qualify_stocks(new)).items():
+                self._tickers[sym] = self.ib.reqMktData(contract)
+
+    def _on_tickers(self, tickers) -> None:
+        ts = time.time()
+        for ticker in tickers:
+            price = ticker.marketPrice()
+            if price == price:  # not NaN
+                for listener in list(self._listeners):
+                    listener(ticker.contract.symbol, float(price), ts)
+
+    def last_prices(self, symbols: list[str], wait: float = 2.0) -> dict[str, float]:
+        """Current prices from the streaming tickers, subscribing any new symbols."""
+        async def _collect():
+            self._wanted = self._wanted | set(symbols)
+            await self._sync_market_data()
+            deadline = time.monotonic() + wait
+            while True:
+                prices = {}
+                for sym in symbols:
+                    ticker = self._tickers.get(sym)
+                    price = ticker.marketPrice() if ticker is not None else float("nan")
+                    if price == price:
+                        prices[sym] = float(price)
+                if len(prices) == len(symbols) or time.monotonic() >= deadline:
+                    return prices
+                await asyncio.sleep(0.05)
+
+        return self.run(_collect, timeout=wait + settings.ibkr_connect_timeout)
+
+
+_session: IBSession | None = None
+_session_lock = threading.Lock()
+
+
+def get_ib_session() -> IBSession:
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = IBSession()
+        return _session
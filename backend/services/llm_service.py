@@ -0,0 +1,298 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import AsyncIterator, Callable, Iterator
+
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class StubProvider:
+    """Offline provider that answers deterministically; for tests and local development."""
+
+    model = "stub"
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        self.calls += 1
+        digest = hashlib.sha256(prompt.encode()).hexdigest()[:12]
+        return f"[stub:{digest}] {normalize_prompt(prompt)[:200]}"
+
+    def stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        words = self.generate(prompt, **kwargs).split(" ")
+        for i, word in enumerate(words):
+            yield word if i == 0 else " " + word
+
+
+class ClaudeStreamingProvider:
+    """``puffin.ai.ClaudeProvider`` with token streaming through the Anthropic SDK.
+
+    ``generate`` and every other attribute are the wrapped provider's.
+    ``stream`` calls ``messages.stream`` on the provider's Anthropic client
+    (or a new one reading ``ANTHROPIC_API_KEY``), so chunks arrive as the
+    model writes them. Without the ``anthropic`` package or a known model it
+    yields the whole ``generate`` answer as one chunk.
+    """
+
+    def __init__(self, provider):
+        self._provider = provider
+        self._client = None
+
+    def __getattr__(self, name):
+        return getattr(self._provider, name)
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        return self._provider.generate(prompt, **kwargs)
+
+    def _anthropic(self):
+        if self._client is None:
+            client = getattr(self._provider, "client", None)
+            if not callable(getattr(getattr(client, "messages", None), "stream", None)):
+                import anthropic
+                client = anthropic.Anthropic()
+            self._client = client
+        return self._client
+
+    def stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        model = settings.llm_model or getattr(self._provider, "model", None)
+        try:
+            client = self._anthropic() if model else None
+        except ImportError:
+            client = None
+        if client is None:
+            yield self.generate(prompt, **kwargs)
+            return
+        params = {"max_tokens": kwargs.get("max_tokens", 4096)}
+        for name in ("system", "temperature"):
+            if kwargs.get(name) is not None:
+                params[name] = kwargs[name]
+        with client.messages.stream(model=model, messages=[{"role": "user", "content": prompt}], **params) as stream:
+            yield from stream.text_stream
+
+
+def _claude_factory():
+    from puffin.ai import ClaudeProvider
+    return ClaudeStreamingProvider(ClaudeProvider())
+
+
+PROVIDER_FACTORIES: dict[str, Callable[[], object]] = {
+    "claude": _claude_factory,
+    "stub": StubProvider,
+}
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so formatting-only differences share a cache entry."""
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+def fingerprint(prompt: str, model: str, **params) -> str:
+    payload = json.dumps(
+        {"model": model, "prompt": normalize_prompt(prompt), "params": params},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """LLM responses on disk, one JSON file per fingerprint.
+
+    Files are written atomically (temp file + rename), so concurrent workers
+    and processes sharing the directory never read a partial entry.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str, ttl: float) -> str | None:
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get("created_at", 0) > ttl:
+            return None
+        return entry.get("response")
+
+    def set(self, key: str, response: str) -> None:
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump({"created_at": time.time(), "response": response}, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"LLM cache write failed: {e}")
+
+    def clear(self) -> int:
+        removed = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    os.remove(os.path.join(root, name))
+                    removed += 1
+        return removed
+
+
+class LLMClient:
+    """Shared LLM provider with an on-disk response cache.
+
+    The provider client is built once and reused by every caller. Responses
+    are cached under a fingerprint of the normalized prompt, the model and
+    any generation parameters, for ``llm_cache_ttl`` seconds. The cache is
+    skipped when ``llm_cache_enabled`` is off or a call passes
+    ``use_cache=False``. ``llm_provider = "stub"`` swaps in ``StubProvider``.
+    """
+
+    def __init__(
+        self, provider: str | None = None, cache: ResponseCache | None = None,
+        ttl: float | None = None, enabled: bool | None = None,
+    ):
+        self.provider_name = provider or settings.llm_provider
+        self.cache = cache or ResponseCache(settings.llm_cache_dir)
+        self.ttl = ttl if ttl is not None else settings.llm_cache_ttl
+        self.enabled = enabled if enabled is not None else settings.llm_cache_enabled
+        self._provider = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def provider(self):
+        with self._lock:
+            if self._provider is None:
+                factory = PROVIDER_FACTORIES.get(self.provider_name)
+                if factory is None:
+                    raise ValueError(f"Unknown LLM provider: {self.provider_name}")
+                self._provider = factory()
+            return self._provider
+
+    @property
+    def model(self) -> str:
+        return settings.llm_model or getattr(self.provider, "model", None) or self.provider_name
+
+    def generate(self, prompt: str, use_cache: bool = True, ttl: float | None = None, **kwargs) -> str:
+        ttl = self.ttl if ttl is None else ttl
+        if not (self.enabled and use_cache and ttl > 0):
+            return self.provider.generate(prompt, **kwargs)
+        key = fingerprint(prompt, self.model, **kwargs)
+        cached = self.cache.get(key, ttl)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+        response = self.provider.generate(prompt, **kwargs)
+        if isinstance(response, str):
+            self.cache.set(key, response)
+        return response
+
+    def stream(self, prompt: str, use_cache: bool = True, ttl: float | None = None, **kwargs) -> Iterator[str]:
+        """Yield the response in chunks as the provider produces them.
+
+        Providers without a streaming method yield their whole answer as one
+        chunk. A cache hit is replayed as one chunk; a completed stream is
+        cached like ``generate``.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        cached_ok = self.enabled and use_cache and ttl > 0
+        key = fingerprint(prompt, self.model, **kwargs) if cached_ok else None
+        if key is not None:
+            cached = self.cache.get(key, ttl)
+            if cached is not None:
+                self.hits += 1
+                yield cached
+                return
+            self.misses += 1
+        provider = self.provider
+        stream = getattr(provider, "stream", None) or getattr(provider, "generate_stream", None)
+        if not callable(stream):
+            chunks = [provider.generate(prompt, **kwargs)]
+            yield chunks[0]
+        else:
+            chunks = []
+            for chunk in stream(prompt, **kwargs):
+                chunks.append(chunk)
+                yield chunk
+        if key is not None:
+            self.cache.set(key, "".join(chunks))
+
+    def stats(self) -> dict:
+        return {
+            "provider": self.provider_name,
+            "cache_enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+_DONE = object()
+
+
+async def astream(chunks: Iterator[str]) -> AsyncIterator[str]:
+    """Consume a blocking chunk iterator on a worker thread, yielding on the event loop.
+
+    Chunks are handed over through a queue as they arrive, so the loop stays
+    free for other connections. If the consumer stops early the worker stops
+    pulling from the provider at the next chunk.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    cancelled = threading.Event()
+
+    def put(item) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:  # loop already closed
+            cancelled.set()
+
+    def produce():
+        try:
+            for chunk in chunks:
+                if cancelled.is_set():
+                    break
+                put(chunk)
+        except Exception as e:
+            put(e)
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+            put(_DONE)
+
+    loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
+
+
+_client: LLMClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_llm() -> LLMClient:
+    """The process-wide LLM client."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient()
+        return _client
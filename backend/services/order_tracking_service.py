@@ -0,0 +1,162 @@
+import json
+import logging
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from backend.core.broadcast import Broadcaster
+from backend.models.trade_history import TradeHistory
+from backend.services.broker_pool import broker_pool
+
+logger = logging.getLogger(__name__)
+
+# Connected WebSocket clients for order status and fill events
+trade_connections = Broadcaster("trades")
+
+OPEN_STATUSES = ("submitted", "partially_filled")
+FINAL_STATUSES = ("filled", "cancelled", "rejected", "expired")
+
+# Broker-specific status names -> the statuses stored on TradeHistory
+_STATUS_ALIASES = {
+    "new": "submitted", "accepted": "submitted", "pending_new": "submitted",
+    "presubmitted": "submitted", "pendingsubmit": "submitted", "apipending": "submitted",
+    "partial": "partially_filled", "partially_filled": "partially_filled",
+    "filled": "filled",
+    "canceled": "cancelled", "cancelled": "cancelled", "apicancelled": "cancelled",
+    "pendingcancel": "submitted", "pending_cancel": "submitted",
+    "rejected": "rejected", "inactive": "rejected",
+    "expired": "expired", "done_for_day": "expired",
+}
+
+
+def broker_order_id(result) -> str | None:
+    """The broker's id for a submitted order, whatever shape the result has."""
+    for attr in ("id", "order_id", "orderId"):
+        value = getattr(result, attr, None)
+        if value:
+            return str(value)
+    if isinstance(result, dict):
+        value = result.get("id") or result.get("order_id")
+        return str(value) if value else None
+    return str(result) if isinstance(result, (str, int)) and result else None
+
+
+def normalize_status(status) -> str:
+    raw = str(getattr(status, "value", status) or "").lower().rsplit(".", 1)[-1]
+    return _STATUS_ALIASES.get(raw, raw or "submitted")
+
+
+def _field(obj, *names):
+    for name in names:
+        value = obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+        if value is not None:
+            return value
+    return None
+
+
+def _as_update(obj) -> dict:
+    price = _field(obj, "filled_avg_price", "avg_fill_price", "avgFillPrice", "fill_price")
+    qty = _field(obj, "filled_qty", "filled_quantity", "filled")
+    return {
+        "status": normalize_status(_field(obj, "status")),
+        "filled_qty": float(qty) if qty is not None else None,
+        "fill_price": float(price) if price else None,
+    }
+
+
+def fetch_order_updates(broker, order_ids: list[str]) -> dict[str, dict]:
+    """Current status of the given broker orders, in as few broker calls as possible.
+
+    Uses the broker's bulk ``get_orders`` when it has one and only looks up
+    individually the orders missing from that list (typically the ones that
+    just completed); otherwise falls back to ``get_order`` per id.
+    """
+    wanted = set(order_ids)
+    updates: dict[str, dict] = {}
+    with broker_pool.lease(broker):
+        if hasattr(broker, "get_orders"):
+            for obj in broker.get_orders() or []:
+                oid = broker_order_id(obj)
+                if oid in wanted:
+                    updates[oid] = _as_update(obj)
+        missing = [oid for oid in order_ids if oid not in updates]
+        if missing and hasattr(broker, "get_order"):
+            for oid in missing:
+                try:
+                    updates[oid] = _as_update(broker.get_order(oid))
+                except Exception as e:
+                    logger.debug(f"Order {oid} status lookup failed: {e}")
+    return updates
+
+
+class OrderTracker:
+    """Keeps TradeHistory rows in step with the broker's view of each order.
+
+    Each poll looks up every open order in one batch, records status changes
+    and fill prices, and pushes the changes to ``/ws/trades``.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def open_trades(self) -> list[TradeHistory]:
+        return self.db.query(TradeHistory).filter(
+            TradeHistory.status.in_(OPEN_STATUSES),
+            TradeHistory.broker_order_id.isnot(None),
+        ).all()
+
+    def poll_once(self, broker=None) -> list[dict]:
+        """Refresh every open order; return the events that were published."""
+        trades = self.open_trades()
+        if not trades:
+            return []
+        broker = broker or broker_pool.get()
+        updates = fetch_order_updates(broker, [t.broker_order_id for t in trades])
+        events = [e for t in trades if (e := self._apply(t, updates.get(t.broker_order_id)))]
+        if not events:
+            return []
+        self.db.commit()
+        if any(e["type"] == "fill" for e in events):
+            on_fill(self.db)
+        for event in events:
+            trade_connections.publish(json.dumps(event))
+        return events
+
+    def _apply(self, trade: TradeHistory, update: dict | None) -> dict | None:
+        if update is None:
+            return None
+        status = update["status"]
+        filled_qty = update["filled_qty"]
+        fill_changed = filled_qty is not None and filled_qty != (trade.filled_qty or 0.0)
+        if status == trade.status and not fill_changed:
+            return None
+        trade.status = status
+        if filled_qty is not None:
+            trade.filled_qty = filled_qty
+        if update["fill_price"]:
+            trade.price = update["fill_price"]
+        if status == "filled" and trade.filled_at is None:
+            trade.filled_at = datetime.utcnow()
+        return {
+            "type": "fill" if fill_changed else "order_status",
+            "trade_id": trade.id,
+            "broker_order_id": trade.broker_order_id,
+            "user_id": trade.user_id,
+            "symbol": trade.symbol,
+            "side": trade.side,
+            "qty": trade.qty,
+            "status": status,
+            "filled_qty": trade.filled_qty,
+            "price": trade.price,
+        }
+
+
+def on_fill(db=None) -> None:
+    """Drop state derived from positions once an order fills."""
+    from backend.services.broker_service import invalidate_broker_snapshots
+    from backend.services.portfolio_snapshot_service import invalidate_portfolio_snapshots
+    invalidate_broker_snapshots()
+    invalidate_portfolio_snapshots()
+    if db is not None:
+        from backend.services.risk_state_service import sync_risk_positions
+        sync_risk_positions(db)
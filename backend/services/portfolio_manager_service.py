@@ -59,22 +59,13 @@ class PortfolioManagerService:
 
         targets = json.loads(goal.target_weights)
 
-        # Get current positions from broker
+        # Current weights from the shared portfolio snapshot
         try:
-            from backend.services.broker_service import BrokerService
-            broker = BrokerService(self.db)
-            positions = broker.get_positions()
+            from backend.services.portfolio_snapshot_service import PortfolioSnapshotService
+            snapshot = PortfolioSnapshotService(self.db).get(analytics=False)
         except Exception:
-            positions = []
-
-        # Calculate current weights
-        total_value = sum(float(p.get("current_price", 0)) * float(p.get("qty", 0)) for p in positions)
-        current_weights = {}
-        if total_value > 0:
-            for p in positions:
-                symbol = p["symbol"]
-                value = float(p.get("current_price", 0)) * float(p.get("qty", 0))
-                current_weights[symbol] = value / total_value
+            snapshot = {}
+        current_weights = snapshot.get("weights", {})
 
         # Calculate drift
         drift = {}
@@ -93,6 +84,8 @@ class PortfolioManagerService:
             "needs_rebalance": needs_rebalance,
             "threshold": goal.drift_threshold,
             "rebalance_mode": goal.rebalance_mode,
+            "snapshot_version": snapshot.get("version"),
+            "snapshot_age": snapshot.get("age"),
         }
 
     def rebalance(self, goal_id: int, user_id: str) -> dict:
@@ -113,9 +106,13 @@ class PortfolioManagerService:
             if goal.rebalance_mode == "auto":
                 from backend.services.broker_service import BrokerService
                 broker = BrokerService(self.db)
-                for trade in trades:
-                    broker.submit_order(trade.symbol, trade.side, trade.qty)
-                return {"status": "rebalance executed", "trades": len(trades)}
+                basket = broker.submit_basket([
+                    {"symbol": t.symbol, "side": t.side, "qty": t.qty} for t in trades
+                ], user_id=user_id)
+                return {
+                    "status": "rebalance executed", "trades": len(trades),
+                    "basket_id": basket.get("basket_id"), "rejected": basket.get("rejected", []),
+                }
             else:
                 return {"status": "rebalance suggested", "trades": [t.__dict__ for t in trades]}
         except Exception as e:
@@ -0,0 +1,273 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _Part:
+    __slots__ = ("key", "value", "updated_at", "version")
+
+    def __init__(self, key, value, version: int):
+        self.key = key
+        self.value = value
+        self.updated_at = time.time()
+        self.version = version
+
+
+class _SnapshotStore:
+    """Process-wide portfolio parts, each remembered with the inputs it was built from."""
+
+    def __init__(self):
+        self.parts: dict[str, _Part] = {}
+        self.version = 0
+        self.stale = True
+        self.generation = 0  # bumped by invalidation, so a fetch racing it stays stale
+        self.requested = False
+        self.lock = threading.Lock()  # guards the fields above; never held while fetching
+        self.flight: _Flight | None = None  # the refresh in progress, if any
+
+    def set(self, name: str, key, value) -> None:
+        """Store a part; unkeyed parts keep their version when the value is unchanged."""
+        part = self.parts.get(name)
+        if part is not None and key is None and part.value == value:
+            part.updated_at = time.time()
+            return
+        self.version += 1
+        self.parts[name] = _Part(key, value, self.version)
+
+    def key(self, name: str):
+        part = self.parts.get(name)
+        return part.key if part is not None else None
+
+    def value(self, name: str, default=None):
+        part = self.parts.get(name)
+        return part.value if part is not None else default
+
+    def age(self, name: str) -> float | None:
+        """Seconds since the part was refreshed, or None if it was never fetched."""
+        part = self.parts.get(name)
+        return round(time.time() - part.updated_at, 3) if part is not None else None
+
+
+class _Flight:
+    """One refresh in progress; concurrent readers wait on it instead of fetching again."""
+
+    def __init__(self, analytics: bool):
+        self.analytics = analytics
+        self.done = threading.Event()
+
+
+_store = _SnapshotStore()
+
+
+def invalidate_portfolio_snapshots() -> None:
+    """Force the next snapshot read to refetch positions and account (e.g. after a fill)."""
+    with _store.lock:
+        _store.stale = True
+        _store.generation += 1
+
+
+class PortfolioSnapshotService:
+    """Materialized portfolio view shared by the agent, drift checks and dashboards.
+
+    A snapshot is assembled from parts: positions and account (from the
+    broker snapshot cache), market-value weights, the one-year returns
+    matrix, risk metrics and factor exposures. Each analytic part remembers
+    the inputs it was built from and is recomputed only when they change:
+    returns and factors when the held symbols or the date change, risk when
+    the returns or the weights (to two decimals) change. Broker parts are
+    refreshed when older than ``portfolio_snapshot_ttl`` or after a fill.
+
+    The snapshot describes the one broker account, so every user reads the
+    same parts. Concurrent readers share a single refresh, and sources are
+    fetched outside the store lock, so a slow broker only delays readers
+    that need fresh data. Sources run concurrently with a
+    ``portfolio_snapshot_timeout`` each, analytics starting as soon as
+    positions arrive; one that fails keeps its previous value, so readers
+    get stale data with its age rather than none.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get(self, analytics: bool = True, max_age: float | None = None) -> dict:
+        max_age = settings.portfolio_snapshot_ttl if max_age is None else max_age
+        _store.requested = True
+        self._refresh(analytics, max_age)
+        with _store.lock:
+            return _assemble(analytics)
+
+    def refresh(self) -> None:
+        """Rebuild every part whose inputs changed, if anyone has asked for a snapshot."""
+        if _store.requested:
+            self.get(max_age=0)
+
+    def _refresh(self, analytics: bool, max_age: float) -> None:
+        """Bring stale parts up to date, or wait for the refresh already running."""
+        while True:
+            with _store.lock:
+                age = _store.age("positions")
+                broker = _store.stale or age is None or age > max_age
+                if not broker and not (analytics and _analytics_plan()):
+                    return
+                flight = _store.flight
+                if flight is None:
+                    flight = _store.flight = _Flight(analytics)
+                    generation = _store.generation
+                    break
+            flight.done.wait()
+            if flight.analytics or not analytics:
+                return
+        pool = ThreadPoolExecutor(max_workers=3, thread_name_prefix="portfolio-snapshot")
+        try:
+            account_f = self._refresh_positions(pool, generation) if broker else None
+            # Analytics need only the weights; they overlap the account call
+            plan = analytics_f = None
+            if analytics:
+                with _store.lock:
+                    plan = _analytics_plan()
+                if plan:
+                    analytics_f = _start_analytics(pool, plan)
+            if account_f is not None:
+                account = _result(account_f, "account")
+                if account is not None:
+                    with _store.lock:
+                        _store.set("account", None, account[0])
+            if analytics_f is not None:
+                _finish_analytics(plan, analytics_f)
+        finally:
+            # Timed-out calls cannot be interrupted; let them finish in the background
+            pool.shutdown(wait=False)
+            with _store.lock:
+                _store.flight = None
+            flight.done.set()
+
+    def _refresh_positions(self, pool: ThreadPoolExecutor, generation: int) -> tuple[Future, float]:
+        """Fetch positions and account together; publish positions and return the pending account."""
+        from backend.services.broker_service import BrokerService
+
+        broker = BrokerService(self.db)
+        positions_f = _submit(pool, broker.get_positions)
+        account_f = _submit(pool, broker.get_account_snapshot)
+        positions = _result(positions_f, "positions")
+        if positions is not None:
+            with _store.lock:
+                _store.set("positions", None, positions)
+                _store.set("weights", None, _weights(positions))
+                # An invalidation during the fetch means these positions may predate a fill
+                _store.stale = _store.generation != generation
+        return account_f
+
+
+def _analytics_plan() -> dict | None:
+    """Analytic parts whose inputs changed, with what is needed to rebuild them. Call under the lock."""
+    weights = _store.value("weights", {})
+    symbols = tuple(sorted(weights))
+    if not symbols:
+        return None
+    end = datetime.utcnow().date()
+    start = end - timedelta(days=365)
+    window = (start.isoformat(), end.isoformat())
+
+    returns_key = (symbols, window)
+    risk_key = (returns_key, tuple(round(weights[s], 2) for s in symbols))
+    top = tuple(sorted(symbols, key=lambda s: -abs(weights[s]))[:5])
+    factors_key = (top, window)
+
+    plan = {}
+    if _store.key("portfolio_risk") != risk_key:
+        # Only changed holdings or a new day refetch a year of prices
+        cached = _store.value("returns") if _store.key("returns") == returns_key else None
+        plan["risk"] = (returns_key, risk_key, (list(symbols), [weights[s] for s in symbols], window, cached))
+    if _store.key("factor_exposure") != factors_key:
+        plan["factors"] = (factors_key, (list(top), *window))
+    return plan or None
+
+
+def _start_analytics(pool: ThreadPoolExecutor, plan: dict) -> dict:
+    pending = {}
+    if "risk" in plan:
+        pending["risk"] = _submit(pool, _portfolio_risk, *plan["risk"][2])
+    if "factors" in plan:
+        pending["factors"] = _submit(pool, _factor_exposure, *plan["factors"][1])
+    return pending
+
+
+def _finish_analytics(plan: dict, pending: dict) -> None:
+    result = _result(pending["risk"], "portfolio risk") if "risk" in pending else None
+    factors = _result(pending["factors"], "factor exposure") if "factors" in pending else None
+    with _store.lock:
+        if result is not None:
+            returns_key, risk_key, _ = plan["risk"]
+            returns, risk = result
+            if _store.key("returns") != returns_key:
+                _store.set("returns", returns_key, returns)
+            _store.set("portfolio_risk", risk_key, risk)
+        if factors is not None:
+            _store.set("factor_exposure", plan["factors"][0], factors)
+
+
+def _assemble(analytics: bool) -> dict:
+    names = ["positions", "account", "weights"]
+    if analytics:
+        names += ["portfolio_risk", "factor_exposure"]
+    snapshot = {
+        "version": _store.version,
+        "age": _store.age("positions"),  # None until positions were fetched once
+        "parts": {},
+    }
+    for name in names:
+        default = [] if name == "positions" else {}
+        snapshot[name] = _store.value(name, default)
+        part = _store.parts.get(name)
+        snapshot["parts"][name] = {"version": part.version, "age": _store.age(name)} if part is not None else None
+    return snapshot
+
+
+def _weights(positions: list[dict]) -> dict[str, float]:
+    values = {
+        p["symbol"]: float(p.get("current_price") or 0) * float(p.get("qty") or 0)
+        for p in positions if p.get("symbol")
+    }
+    total = sum(values.values())
+    return {s: v / total for s, v in values.items()} if total > 0 else {}
+
+
+def _portfolio_risk(symbols: list[str], weights: list[float], window: tuple[str, str], returns=None):
+    """Risk metrics for the holdings, reusing ``returns`` when the matrix is already known."""
+    from backend.services.risk_service import RiskService
+
+    service = RiskService()
+    if returns is None:
+        returns = service.returns_matrix(symbols, *window)
+    return returns, service.assess(returns, weights)
+
+
+def _factor_exposure(symbols: list[str], start: str, end: str) -> dict:
+    from backend.services.factors_service import FactorsService
+    return FactorsService().compute(symbols, start, end)
+
+
+def _submit(pool: ThreadPoolExecutor, fn, *args) -> tuple[Future, float]:
+    """Start a source; its deadline runs from now."""
+    return pool.submit(fn, *args), time.monotonic() + settings.portfolio_snapshot_timeout
+
+
+def _result(pending: tuple[Future, float], name: str):
+    """The source's value, or None if it failed or missed its deadline."""
+    future, deadline = pending
+    try:
+        return future.result(timeout=max(deadline - time.monotonic(), 0.0))
+    except FutureTimeoutError:
+        logger.warning(f"Portfolio snapshot: {name} timed out after {settings.portfolio_snapshot_timeout}s")
+    except Exception as e:
+        logger.debug(f"Portfolio snapshot: {name} failed: {e}")
+    return None
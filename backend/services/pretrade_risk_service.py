@@ -0,0 +1,119 @@
+import logging
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class PreTradeRiskEngine:
+    """Checks a basket of proposed orders against position and size limits in one pass.
+
+    ``max_position_pct`` rejects any order that grows a position beyond that
+    share of account equity; legs on the same symbol are netted first, so a
+    basket cannot slip past the limit in several small pieces. Orders whose
+    notional exceeds ``large_order_threshold`` are accepted but flagged as
+    large so the confirmation step can call them out.
+
+    Orders without a usable price (market orders on symbols with no cached
+    quote) or an account without known equity are accepted with a warning
+    rather than blocked.
+    """
+
+    def __init__(self, max_position_pct: float, large_order_threshold: float):
+        self.max_position_pct = float(max_position_pct)
+        self.large_order_threshold = float(large_order_threshold)
+
+    def check(
+        self, orders: list[dict], positions: dict[str, float], prices: dict[str, float],
+        equity: float | None,
+    ) -> list[dict]:
+        """Return one ``{"accepted", "reasons", "warnings", "notional", "large"}`` per order."""
+        n = len(orders)
+        if not n:
+            return []
+        symbols = [o["symbol"] for o in orders]
+        qty = np.array([float(o["qty"]) for o in orders])
+        sign = np.array([1.0 if o["side"] == "buy" else -1.0 for o in orders])
+        mult = np.array([float(o.get("multiplier") or 1.0) for o in orders])
+        price = np.array([
+            float(o.get("limit_price") or o.get("stop_price") or prices.get(o["symbol"]) or np.nan)
+            for o in orders
+        ])
+        notional = qty * price * mult
+        priced = ~np.isnan(price)
+        large = priced & (notional > self.large_order_threshold)
+
+        # Net every leg per symbol, then compare pre- and post-trade exposure
+        uniq, idx = np.unique(symbols, return_inverse=True)
+        net = np.zeros(len(uniq))
+        np.add.at(net, idx, sign * qty)
+        current = np.array([float(positions.get(s, 0.0)) for s in uniq])
+        post = current + net
+        sym_price = np.full(len(uniq), np.nan)
+        np.fmax.at(sym_price, idx, price * mult)  # any priced leg prices the symbol
+        grows = np.abs(post) > np.abs(current)
+        if equity and equity > 0:
+            post_pct = np.abs(post) * sym_price / equity
+            breach_sym = grows & (post_pct > self.max_position_pct)
+        else:
+            post_pct = np.full(len(uniq), np.nan)
+            breach_sym = np.zeros(len(uniq), dtype=bool)
+        breach = breach_sym[idx] & (sign * net[idx] > 0)  # only legs adding to the move
+
+        results = []
+        for i in range(n):
+            reasons, warnings = [], []
+            if breach[i]:
+                reasons.append(
+                    f"position in {symbols[i]} would be {post_pct[idx[i]]:.1%} of equity "
+                    f"(max {self.max_position_pct:.1%})"
+                )
+            if large[i]:
+                warnings.append(
+                    f"large order: notional {notional[i]:,.2f} exceeds {self.large_order_threshold:,.2f}"
+                )
+            if not priced[i]:
+                warnings.append("no price available; size limits not checked")
+            elif not equity:
+                warnings.append("account equity unavailable; position limit not checked")
+            results.append({
+                "accepted": not reasons,
+                "reasons": reasons,
+                "warnings": warnings,
+                "notional": round(float(notional[i]), 2) if priced[i] else None,
+                "large": bool(large[i]),
+            })
+        return results
+
+
+def check_orders(db, user_id: str | None, orders: list[dict]) -> list[dict]:
+    """Run the pre-trade checks for a user against cached account, positions and quotes."""
+    from backend.core.config import settings
+    from backend.services.broker_service import BrokerService
+    from backend.services.price_hub import price_hub
+    from backend.services.safety_service import SafetyService
+
+    limits = SafetyService(db).get_settings(user_id or settings.default_user_id)
+    engine = PreTradeRiskEngine(limits["max_position_pct"], limits["large_order_threshold"])
+
+    broker = BrokerService(db)
+    positions: dict[str, float] = {}
+    now = time.time()
+    # symbol -> (price, quote time); the fresher of the live stream and the broker wins
+    quotes = {
+        s: (p, ts) for s, (p, ts) in price_hub.last_prices(o["symbol"] for o in orders).items()
+        if now - ts <= settings.pretrade_quote_max_age
+    }
+    equity = None
+    try:
+        held, age = broker.get_positions_snapshot()
+        for p in held:
+            positions[p["symbol"]] = float(p["qty"])
+            if p.get("current_price") and now - age > quotes.get(p["symbol"], (0.0, 0.0))[1]:
+                quotes[p["symbol"]] = (float(p["current_price"]), now - age)
+        equity = float(broker.get_account_snapshot()[0]["equity"])
+    except Exception as e:
+        logger.debug(f"Pre-trade check running without broker state: {e}")
+    prices = {s: p for s, (p, _) in quotes.items()}
+    return engine.check(orders, positions, prices, equity)
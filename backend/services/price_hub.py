@@ -0,0 +1,284 @@
+import asyncio
+import json
+import logging
+import threading
+
+from backend.core.broadcast import Broadcaster
+from backend.core.config import settings
+from backend.services.price_stream_service import PriceStreamEngine
+
+logger = logging.getLogger(__name__)
+
+
+class SubscriptionIndex:
+    """Bidirectional symbol <-> connection index for price fan-out."""
+
+    def __init__(self):
+        self._by_symbol: dict[str, set] = {}
+        self._by_conn: dict[object, set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_conn)
+
+    def __contains__(self, conn) -> bool:
+        return conn in self._by_conn
+
+    def add_connection(self, conn) -> None:
+        self._by_conn.setdefault(conn, set())
+
+    def remove_connection(self, conn) -> set[str]:
+        """Drop a connection; return the symbols left with no subscribers."""
+        orphaned = set()
+        for symbol in self._by_conn.pop(conn, set()):
+            if self._discard(symbol, conn):
+                orphaned.add(symbol)
+        return orphaned
+
+    def subscribe(self, conn, symbol: str) -> bool:
+        """Subscribe a connection; return True if it is the symbol's first subscriber."""
+        symbols = self._by_conn.setdefault(conn, set())
+        if symbol in symbols:
+            return False
+        symbols.add(symbol)
+        subscribers = self._by_symbol.setdefault(symbol, set())
+        subscribers.add(conn)
+        return len(subscribers) == 1
+
+    def unsubscribe(self, conn, symbol: str) -> bool:
+        """Unsubscribe a connection; return True if the symbol has no subscribers left."""
+        symbols = self._by_conn.get(conn)
+        if not symbols or symbol not in symbols:
+            return False
+        symbols.discard(symbol)
+        return self._discard(symbol, conn)
+
+    def _discard(self, symbol: str, conn) -> bool:
+        subscribers = self._by_symbol.get(symbol)
+        if subscribers is None:
+            return False
+        subscribers.discard(conn)
+        if not subscribers:
+            del self._by_symbol[symbol]
+            return True
+        return False
+
+    def subscribers(self, symbol: str) -> set:
+        return self._by_symbol.get(symbol, set())
+
+    def symbols_for(self, conn) -> set[str]:
+        return self._by_conn.get(conn, set())
+
+    def symbols(self) -> set[str]:
+        return set(self._by_symbol)
+
+
+PRICE_ENCODINGS = ("json", "compact", "msgpack")
+
+
+def negotiate_encoding(requested: str | None) -> str:
+    """Resolve a client's requested frame encoding to one the server supports."""
+    encoding = (requested or "json").lower()
+    if encoding not in PRICE_ENCODINGS:
+        return "json"
+    if encoding == "msgpack":
+        try:
+            import msgpack  # noqa: F401
+        except ImportError:
+            return "json"
+    return encoding
+
+
+def encode_price_frame(updates: list[tuple[str, float, float]], encoding: str = "json") -> str | bytes:
+    """Serialize one tick's ``(symbol, price, timestamp)`` updates as a single frame."""
+    if encoding == "compact":
+        return json.dumps({"type": "prices", "data": [list(u) for u in updates]}, separators=(",", ":"))
+    if encoding == "msgpack":
+        import msgpack
+        return msgpack.packb({"type": "prices", "data": [list(u) for u in updates]})
+    return json.dumps({
+        "type": "prices",
+        "data": [{"symbol": s, "price": p, "timestamp": t} for s, p, t in updates],
+    })
+
+
+class PriceHub:
+    """Owns the price stream and fans ticks out to subscribed WebSocket clients.
+
+    Ticks are buffered for ``price_batch_interval`` seconds, then each client
+    gets one frame holding all of its updated symbols. Clients that share an
+    encoding and symbol set share a single serialized frame.
+
+    A last-value cache suppresses ticks that moved less than ``price_min_tick``
+    and gives new subscribers an immediate snapshot.
+
+    Server-side consumers (e.g. the alert engine) register a tick listener and
+    ``pin`` the symbols they need, which keeps those symbols streaming with no
+    WebSocket client connected.
+    """
+
+    def __init__(
+        self, feed=None, batch_interval: float | None = None, min_tick: float | None = None,
+    ):
+        self.index = SubscriptionIndex()
+        # Prices conflate per symbol so a slow client only ever gets the latest quote
+        self.clients = Broadcaster(
+            "prices", policy=settings.price_overflow_policy, on_disconnect=self.disconnect
+        )
+        self.batch_interval = (
+            batch_interval if batch_interval is not None else settings.price_batch_interval
+        )
+        self.min_tick = min_tick if min_tick is not None else settings.price_min_tick
+        self.last: dict[str, tuple[float, float]] = {}  # symbol -> last published (price, ts)
+        self._last_lock = threading.Lock()  # writes happen on the loop; readers may be threads
+        self._encodings: dict[object, str] = {}
+        self._pending: dict[str, tuple[float, float]] = {}
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._feed = feed
+        self._engine: PriceStreamEngine | None = None
+        self._listeners: list = []
+        self._pins: dict[str, set[str]] = {}  # owner -> pinned symbols
+
+    def _ensure_engine(self) -> None:
+        if self._engine is None:
+            self._engine = PriceStreamEngine(self._on_tick, feed=self._feed)
+            self._engine.start()
+            self._engine.subscribe(self.index.symbols() | self.pinned())
+
+    def _maybe_stop(self) -> None:
+        # Stop streaming once no client or server-side consumer needs prices
+        if self._engine is not None and not len(self.index) and not self.pinned():
+            self._engine.stop()
+            self._engine = None
+            self._pending.clear()
+
+    def _release(self, symbols: set[str]) -> None:
+        """Stop streaming symbols that no client or pin still wants."""
+        unused = symbols - self.index.symbols() - self.pinned()
+        if unused and self._engine is not None:
+            self._engine.unsubscribe(unused)
+
+    def last_prices(self, symbols=None) -> dict[str, tuple[float, float]]:
+        """Copy of the last-value cache, optionally for ``symbols`` only; safe from any thread."""
+        with self._last_lock:
+            if symbols is None:
+                return dict(self.last)
+            return {s: self.last[s] for s in symbols if s in self.last}
+
+    def add_listener(self, listener) -> None:
+        """Call ``listener(symbol, price, timestamp)`` on the event loop for every tick."""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def pinned(self) -> set[str]:
+        return set().union(*self._pins.values())
+
+    def pin(self, owner: str, symbols: set[str]) -> None:
+        """Replace ``owner``'s set of always-streamed symbols. Call on the event loop."""
+        old = self._pins.get(owner, set())
+        symbols = set(symbols)
+        if symbols:
+            self._pins[owner] = symbols
+        else:
+            self._pins.pop(owner, None)
+        added = symbols - old - self.index.symbols()
+        if symbols:
+            self._ensure_engine()
+        if added and self._engine is not None:
+            self._engine.subscribe(added)
+        self._release(old - symbols)
+        self._maybe_stop()
+
+    def connect(self, ws, encoding: str | None = None) -> str:
+        """Register a client; return the negotiated frame encoding."""
+        encoding = negotiate_encoding(encoding)
+        self.index.add_connection(ws)
+        self._encodings[ws] = encoding
+        self.clients.add(ws)
+        self._ensure_engine()
+        return encoding
+
+    def disconnect(self, ws) -> None:
+        if ws not in self.index:
+            return
+        orphaned = self.index.remove_connection(ws)
+        self._encodings.pop(ws, None)
+        self.clients.remove(ws)
+        self._release(orphaned)
+        self._maybe_stop()
+
+    def subscribe(self, ws, *symbols: str) -> None:
+        new = {s for s in symbols if self.index.subscribe(ws, s)} - self.pinned()
+        if new and self._engine is not None:
+            self._engine.subscribe(new)
+        # Snapshot from the last-value cache so the client needn't wait for a tick
+        cached = [(s, *self.last[s]) for s in symbols if s in self.last]
+        if cached:
+            frame = encode_price_frame(cached, self._encodings.get(ws, "json"))
+            self.clients.send(ws, frame)
+
+    def unsubscribe(self, ws, symbol: str) -> None:
+        if self.index.unsubscribe(ws, symbol):
+            self._release({symbol})
+
+    def send(self, ws, message: str) -> None:
+        self.clients.send(ws, message)
+
+    def _on_tick(self, symbol: str, price: float, timestamp: float) -> None:
+        for listener in list(self._listeners):
+            try:
+                listener(symbol, price, timestamp)
+            except Exception as e:
+                logger.warning(f"Price listener failed on {symbol}: {e}")
+        subscribed = self.index.subscribers(symbol)
+        last = self.last.get(symbol)
+        if subscribed and last is not None:
+            change = abs(price - last[0])
+            if change == 0 or change < self.min_tick:
+                # Too small to push: keep the price clients have, but record that it is current
+                with self._last_lock:
+                    self.last[symbol] = (last[0], timestamp)
+                return
+        # Cache every tick, subscribed or not, so server-side readers see fresh quotes
+        with self._last_lock:
+            self.last[symbol] = (price, timestamp)
+        if not subscribed:
+            return
+        self._pending[symbol] = (price, timestamp)
+        if self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self.batch_interval, self.flush)
+
+    def flush(self) -> None:
+        """Send one frame per client covering every symbol updated since the last flush."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        per_client: dict[object, list[str]] = {}
+        for symbol in pending:
+            for ws in self.index.subscribers(symbol):
+                per_client.setdefault(ws, []).append(symbol)
+
+        frames: dict[tuple, str | bytes] = {}
+        for ws, symbols in per_client.items():
+            # Symbols are appended in ``pending`` order, so equal sets give equal keys
+            key = (self._encodings.get(ws, "json"), tuple(symbols))
+            frame = frames.get(key)
+            if frame is None:
+                updates = [(s, *pending[s]) for s in symbols]
+                frame = frames[key] = encode_price_frame(updates, key[0])
+            self.clients.send(ws, frame, key=key[1])
+
+    async def broadcast(self, symbol: str, price: float, timestamp: float) -> None:
+        self._on_tick(symbol, price, timestamp)
+        self.flush()
+
+
+price_hub = PriceHub()
@@ -0,0 +1,519 @@
+import asyncio
+import logging
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable
+
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# (symbol, price, timestamp) — may be called from any thread
+TickCallback = Callable[[str, float, float], None]
+
+
+# --- Snapshot fetchers (used by the polling feed) ---
+
+class CircuitBreaker:
+    """Per-key breaker: after ``threshold`` consecutive failures a key is
+    skipped for ``cooldown`` seconds, then allowed one trial request."""
+
+    def __init__(self, threshold: int = 3, cooldown: float = 300.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures: dict[str, int] = {}
+        self._opened_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, key: str) -> bool:
+        with self._lock:
+            opened = self._opened_at.get(key)
+            if opened is None:
+                return True
+            if time.monotonic() - opened >= self.cooldown:
+                # Half-open: let one request through; a failure re-opens immediately
+                del self._opened_at[key]
+                self._failures[key] = self.threshold - 1
+                return True
+            return False
+
+    def success(self, key: str) -> None:
+        with self._lock:
+            self._failures.pop(key, None)
+            self._opened_at.pop(key, None)
+
+    def failure(self, key: str) -> None:
+        with self._lock:
+            count = self._failures.get(key, 0) + 1
+            self._failures[key] = count
+            if count >= self.threshold:
+                self._opened_at[key] = time.monotonic()
+
+    def open_keys(self) -> list[str]:
+        with self._lock:
+            return sorted(self._opened_at)
+
+
+_yf_executor = ThreadPoolExecutor(max_workers=settings.yfinance_max_workers, thread_name_prefix="yfinance")
+_yf_breaker = CircuitBreaker(settings.yfinance_breaker_threshold, settings.yfinance_breaker_cooldown)
+_yf_stats = {"timeouts": 0}
+
+
+def _yf_download_batch(symbols: list[str]) -> dict[str, float]:
+    """Last 1-minute close for a batch of symbols in one yfinance request."""
+    import yfinance as yf
+
+    data = yf.download(
+        symbols, period="1d", interval="1m", progress=False, threads=False, auto_adjust=False,
+    )
+    if data is None or data.empty:
+        return {}
+    closes = data["Close"]
+    if not hasattr(closes, "columns"):  # single-ticker Series
+        closes = closes.to_frame(symbols[0])
+    results = {}
+    for sym in symbols:
+        if sym in closes.columns:
+            series = closes[sym].dropna()
+            if len(series):
+                results[sym] = float(series.iloc[-1])
+    return results
+
+
+def _yf_fast_info(symbol: str) -> float:
+    import yfinance as yf
+
+    return float(yf.Ticker(symbol).fast_info["last_price"])
+
+
+def _collect(futures: dict, timeout: float) -> dict:
+    """Results of the futures that finish within ``timeout``; the rest are cancelled."""
+    done, pending = wait(futures, timeout=timeout)
+    if pending:
+        # Queued calls are dropped; ones already running cannot be interrupted
+        for future in pending:
+            future.cancel()
+        _yf_stats["timeouts"] += len(pending)
+        logger.warning(
+            f"yfinance: {len(pending)} of {len(futures)} requests timed out after {timeout}s "
+            f"({_yf_stats['timeouts']} total)"
+        )
+    results = {}
+    for future in done:
+        try:
+            results[futures[future]] = future.result()
+        except Exception:
+            pass
+    return results
+
+
+def _fetch_yfinance(symbols: list[str]) -> dict[str, float]:
+    """Fetch last prices via yfinance (runs in thread).
+
+    Symbols are downloaded in bulk batches in parallel; any a batch misses are
+    retried one by one. Every request is bounded by ``yfinance_timeout`` and
+    symbols that keep failing are skipped by a circuit breaker.
+    """
+    allowed = [s for s in symbols if _yf_breaker.allow(s)]
+    if not allowed:
+        return {}
+    size = settings.yfinance_batch_size
+    batches = [allowed[i:i + size] for i in range(0, len(allowed), size)]
+
+    results: dict[str, float] = {}
+    futures = {_yf_executor.submit(_yf_download_batch, batch): i for i, batch in enumerate(batches)}
+    for batch_prices in _collect(futures, settings.yfinance_timeout).values():
+        results.update(batch_prices)
+
+    missing = [s for s in allowed if s not in results]
+    if missing:
+        futures = {_yf_executor.submit(_yf_fast_info, sym): sym for sym in missing}
+        results.update(_collect(futures, settings.yfinance_timeout))
+
+    for sym in allowed:
+        if sym in results:
+            _yf_breaker.success(sym)
+        else:
+            _yf_breaker.failure(sym)
+    return results
+
+
+def _fetch_alpaca(symbols: list[str]) -> dict[str, float]:
+    """Fetch last prices via Alpaca market data API."""
+    from alpaca.data.historical import StockHistoricalDataClient
+    from alpaca.data.requests import StockLatestTradeRequest
+
+    client = StockHistoricalDataClient(
+        settings.alpaca_api_key, settings.alpaca_secret_key
+    )
+    trades = client.get_stock_latest_trade(
+        StockLatestTradeRequest(symbol_or_symbols=symbols)
+    )
+    return {sym: float(trade.price) for sym, trade in trades.items()}
+
+
+def _fetch_ibkr(symbols: list[str]) -> dict[str, float]:
+    """Fetch last prices from the shared IB session's streaming tickers."""
+    from backend.services.ib_session_service import get_ib_session
+
+    return get_ib_session().last_prices(symbols)
+
+
+def _resolve_fetcher():
+    """Pick the best available snapshot price provider."""
+    if settings.alpaca_api_key and settings.alpaca_secret_key:
+        return _fetch_alpaca
+    if settings.broker == "ibkr":
+        return _fetch_ibkr
+    return _fetch_yfinance
+
+
+def fetch_quotes(symbols: list[str]) -> dict[str, float]:
+    """One snapshot price per symbol in a single batched request where possible."""
+    if not symbols:
+        return {}
+    fetcher = _resolve_fetcher()
+    try:
+        return fetcher(symbols)
+    except Exception:
+        if fetcher is _fetch_yfinance:
+            raise
+        logger.warning("Primary provider failed, falling back to yfinance", exc_info=True)
+        return _fetch_yfinance(symbols)
+
+
+# --- Feed adapters ---
+
+class PriceFeed:
+    """Adapter interface for market-data sources.
+
+    A feed pushes ``(symbol, price, timestamp)`` ticks for its subscribed
+    symbols through the ``emit`` callback given to ``start``. Feeds run on
+    their own thread, so ``emit`` must be thread-safe.
+    """
+
+    name = "base"
+    streaming = True
+
+    def __init__(self):
+        self.symbols: set[str] = set()
+        self._emit: TickCallback | None = None
+        self._on_failure: Callable[[Exception], None] | None = None
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self, emit: TickCallback, on_failure: Callable[[Exception], None] | None = None) -> None:
+        self._emit = emit
+        self._on_failure = on_failure
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run_guarded, name=f"price-feed-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # Rebind rather than mutate so the feed thread can iterate safely
+    def subscribe(self, symbols: set[str]) -> None:
+        self.symbols = self.symbols | symbols
+
+    def unsubscribe(self, symbols: set[str]) -> None:
+        self.symbols = self.symbols - symbols
+
+    def _run_guarded(self) -> None:
+        try:
+            self._run()
+        except Exception as e:
+            if self._stop_event.is_set():
+                return
+            logger.warning(f"Price feed '{self.name}' failed: {e}", exc_info=True)
+            if self._on_failure:
+                self._on_failure(e)
+
+    def _run(self) -> None:
+        raise NotImplementedError
+
+
+class PollingFeed(PriceFeed):
+    """Snapshot polling — the fallback when no streaming feed is available."""
+
+    name = "poll"
+    streaming = False
+
+    def __init__(self, fetcher: Callable[[list[str]], dict[str, float]] | None = None, interval: float | None = None):
+        super().__init__()
+        self.fetcher = fetcher or _resolve_fetcher()
+        self.interval = interval if interval is not None else settings.price_poll_interval
+        self._wake = threading.Event()
+
+    def subscribe(self, symbols: set[str]) -> None:
+        new = symbols - self.symbols
+        super().subscribe(symbols)
+        if new:
+            self._wake.set()  # quote new symbols right away
+
+    def stop(self) -> None:
+        super().stop()
+        self._wake.set()
+
+    def poll_once(self) -> dict[str, float]:
+        symbols = sorted(self.symbols)
+        if not symbols:
+            return {}
+        try:
+            return self.fetcher(symbols)
+        except Exception:
+            if self.fetcher is _fetch_yfinance:
+                raise
+            logger.warning("Primary provider failed, falling back to yfinance", exc_info=True)
+            return _fetch_yfinance(symbols)
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            self._wake.clear()
+            try:
+                prices = self.poll_once()
+            except Exception:
+                logger.warning("Price poll failed", exc_info=True)
+                prices = {}
+            ts = time.time()
+            for sym, price in prices.items():
+                self._emit(sym, price, ts)
+            self._wake.wait(self.interval)
+
+
+class SimulatedFeed(PriceFeed):
+    """Deterministic geometric-Brownian-motion ticks for tests and offline use.
+
+    Every subscribed symbol ticks ``rate`` times per second. ``n_symbols``
+    adds a synthetic universe (``SIM0000``, ``SIM0001``, ...) that ticks
+    whether or not anyone subscribes, for load testing the fan-out path.
+    """
+
+    name = "simulated"
+
+    def __init__(
+        self, rate: float = 1.0, seed: int = 0, mu: float = 0.0,
+        sigma: float = 0.2, start_price: float | None = 100.0, n_symbols: int = 0,
+    ):
+        super().__init__()
+        self.rate = rate
+        self.seed = seed
+        self.mu = mu
+        self.sigma = sigma
+        self.start_price = start_price
+        self.universe = {f"SIM{i:04d}" for i in range(n_symbols)}
+        self._rng = random.Random(seed)
+        self._prices: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _initial_price(self, symbol: str) -> float:
+        if self.start_price is not None:
+            return self.start_price
+        # Seeded per symbol so the path does not depend on subscription order
+        return round(random.Random(f"{self.seed}:{symbol}").uniform(10.0, 500.0), 2)
+
+    def step(self, dt: float | None = None) -> dict[str, float]:
+        """Advance every active symbol by one GBM step and return the new prices."""
+        # dt is expressed in years of 252 trading days of 6.5 hours
+        dt = dt if dt is not None else (1.0 / self.rate) / (252 * 6.5 * 3600)
+        drift = (self.mu - 0.5 * self.sigma ** 2) * dt
+        shock = self.sigma * math.sqrt(dt)
+        out = {}
+        with self._lock:
+            for sym in sorted(self.symbols | self.universe):
+                price = self._prices.get(sym)
+                if price is None:
+                    price = self._initial_price(sym)
+                price *= math.exp(drift + shock * self._rng.gauss(0.0, 1.0))
+                self._prices[sym] = price
+                out[sym] = price
+        return out
+
+    def _run(self) -> None:
+        interval = 1.0 / self.rate
+        next_at = time.monotonic() + interval
+        while not self._stop_event.wait(max(next_at - time.monotonic(), 0.0)):
+            next_at += interval  # fixed cadence regardless of emit cost
+            ts = time.time()
+            for sym, price in self.step().items():
+                self._emit(sym, price, ts)
+
+
+class AlpacaStreamFeed(PriceFeed):
+    """Trade stream from Alpaca's market-data WebSocket."""
+
+    name = "alpaca"
+
+    def __init__(self):
+        super().__init__()
+        self._stream = None
+
+    def _run(self) -> None:
+        from alpaca.data.enums import DataFeed
+        from alpaca.data.live import StockDataStream
+
+        self._stream = StockDataStream(
+            settings.alpaca_api_key, settings.alpaca_secret_key,
+            feed=DataFeed(settings.alpaca_data_feed),
+        )
+        if self.symbols:
+            self._stream.subscribe_trades(self._on_trade, *self.symbols)
+        self._stream.run()
+        if not self._stop_event.is_set():
+            raise ConnectionError("Alpaca stream closed")
+
+    async def _on_trade(self, trade) -> None:
+        self._emit(trade.symbol, float(trade.price), trade.timestamp.timestamp())
+
+    def subscribe(self, symbols: set[str]) -> None:
+        new = symbols - self.symbols
+        super().subscribe(symbols)
+        if new and self._stream is not None:
+            self._stream.subscribe_trades(self._on_trade, *new)
+
+    def unsubscribe(self, symbols: set[str]) -> None:
+        gone = symbols & self.symbols
+        super().unsubscribe(symbols)
+        if gone and self._stream is not None:
+            self._stream.unsubscribe_trades(*gone)
+
+    def stop(self) -> None:
+        super().stop()
+        if self._stream is not None:
+            try:
+                self._stream.stop()
+            except Exception:
+                pass
+
+
+class IBKRStreamFeed(PriceFeed):
+    """Streaming ``reqMktData`` subscriptions through the shared IB session."""
+
+    name = "ibkr"
+
+    def __init__(self, session=None):
+        super().__init__()
+        self._session = session
+
+    def _run(self) -> None:
+        from backend.services.ib_session_service import get_ib_session
+
+        # Only the initial connect runs here; the session owns reconnects after that
+        self._session = self._session or get_ib_session()
+        self._session.add_listener(self._on_price)
+        self._session.connect(timeout=settings.ibkr_connect_timeout)
+        self._session.subscribe(self.symbols)
+
+    def _on_price(self, symbol: str, price: float, timestamp: float) -> None:
+        if symbol in self.symbols:
+            self._emit(symbol, price, timestamp)
+
+    def subscribe(self, symbols: set[str]) -> None:
+        super().subscribe(symbols)
+        if self._session is not None:
+            self._session.subscribe(symbols)
+
+    def unsubscribe(self, symbols: set[str]) -> None:
+        super().unsubscribe(symbols)
+        if self._session is not None:
+            self._session.unsubscribe(symbols)
+
+    def stop(self) -> None:
+        super().stop()
+        if self._session is not None:
+            self._session.remove_listener(self._on_price)
+            self._session.unsubscribe(self.symbols)
+
+
+def create_feed(kind: str | None = None) -> PriceFeed:
+    """Build the feed selected by ``settings.price_feed``."""
+    kind = kind or settings.price_feed
+    if kind == "auto":
+        if settings.alpaca_api_key and settings.alpaca_secret_key:
+            kind = "alpaca"
+        elif settings.broker == "ibkr":
+            kind = "ibkr"
+        else:
+            kind = "poll"
+    if kind == "alpaca":
+        return AlpacaStreamFeed()
+    if kind == "ibkr":
+        return IBKRStreamFeed()
+    if kind == "simulated":
+        return SimulatedFeed(
+            rate=settings.sim_feed_rate, seed=settings.sim_feed_seed,
+            start_price=None, n_symbols=settings.sim_feed_symbols,
+        )
+    if kind == "poll":
+        return PollingFeed()
+    raise ValueError(f"Unknown price feed: {kind}")
+
+
+# --- Engine ---
+
+class PriceStreamEngine:
+    """Runs one price feed and delivers its ticks on the event loop.
+
+    Streaming feeds push ticks as they arrive. If a streaming feed fails, the
+    engine falls back to snapshot polling for the same symbols.
+    """
+
+    def __init__(self, on_tick: TickCallback, feed: PriceFeed | None = None):
+        self.on_tick = on_tick
+        self.feed = feed
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def start(self) -> None:
+        """Start the feed. Must be called from the event loop thread."""
+        self._loop = asyncio.get_running_loop()
+        if self.feed is None:
+            self.feed = create_feed()
+        logger.info(f"Price feed: {self.feed.name}")
+        self.feed.start(self._emit, self._on_feed_failure)
+
+    def stop(self) -> None:
+        if self.feed is not None:
+            self.feed.stop()
+
+    @property
+    def symbols(self) -> set[str]:
+        return set(self.feed.symbols) if self.feed else set()
+
+    def subscribe(self, symbols: set[str]) -> None:
+        if self.feed is not None and symbols:
+            self.feed.subscribe(symbols)
+
+    def unsubscribe(self, symbols: set[str]) -> None:
+        if self.feed is not None and symbols:
+            self.feed.unsubscribe(symbols)
+
+    def _emit(self, symbol: str, price: float, timestamp: float) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self.on_tick, symbol, price, timestamp)
+
+    def _on_feed_failure(self, exc: Exception) -> None:
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._fall_back)
+
+    def _fall_back(self) -> None:
+        failed = self.feed
+        if failed is None or not failed.streaming:
+            return
+        logger.warning(f"Streaming feed '{failed.name}' unavailable, falling back to polling")
+        try:
+            # Detach it (e.g. from the shared IB session) so it cannot tick alongside the poller
+            failed.stop()
+        except Exception as e:
+            logger.debug(f"Stopping failed feed '{failed.name}' raised: {e}")
+        self.feed = PollingFeed()
+        self.feed.subscribe(set(failed.symbols))
+        self.feed.start(self._emit, self._on_feed_failure)
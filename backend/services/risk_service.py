@@ -2,6 +2,9 @@ from puffin.risk import fixed_fractional, kelly_criterion, volatility_based
 
 
 class RiskService:
+    def __init__(self, provider=None):
+        self.provider = provider
+
     def position_size(self, method: str, **kwargs) -> dict:
         if method == "fixed_fractional":
             size = fixed_fractional(**kwargs)
@@ -14,11 +17,18 @@ class RiskService:
         return {"method": method, "position_size": float(size)}
 
     def portfolio_risk(self, symbols: list[str], weights: list[float], start: str, end: str) -> dict:
-        from puffin.data import YFinanceProvider
-        from puffin.risk import PortfolioRiskManager
-        provider = YFinanceProvider()
+        return self.assess(self.returns_matrix(symbols, start, end), weights)
+
+    def returns_matrix(self, symbols: list[str], start: str, end: str):
+        provider = self.provider
+        if provider is None:
+            from puffin.data import YFinanceProvider
+            provider = YFinanceProvider()
         data = provider.get_data(symbols, start=start, end=end)
-        returns = data["Close"].pct_change().dropna()
+        return data["Close"].pct_change().dropna()
+
+    def assess(self, returns, weights: list[float]) -> dict:
+        from puffin.risk import PortfolioRiskManager
         manager = PortfolioRiskManager()
         risk = manager.assess(returns, weights)
         return {"risk": risk}
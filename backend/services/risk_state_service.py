@@ -0,0 +1,188 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from statistics import NormalDist
+
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+RISK_METRICS = ("var", "drawdown", "volatility", "concentration")
+
+# Sampling is defined in trading time: 252 days of 6.5 hours
+_TRADING_SECONDS_PER_DAY = 6.5 * 3600
+_TRADING_DAYS_PER_YEAR = 252
+
+
+class PortfolioRiskState:
+    """Incrementally maintained risk metrics for the broker account.
+
+    Portfolio value is updated in O(1) per price tick for held symbols, and
+    sampled every ``risk_sample_interval`` seconds into a rolling window of
+    returns whose mean and variance are kept as running sums. Metrics are
+    therefore always current without refetching price history:
+
+        var: one-day parametric VaR as a fraction of portfolio value
+        drawdown: decline from the session's high-water mark
+        volatility: annualized volatility of the sampled returns
+        concentration: largest single position's share of gross exposure
+
+    ``var`` and ``volatility`` are ``None`` until enough samples exist.
+    """
+
+    MIN_SAMPLES = 10
+
+    def __init__(
+        self, window: int | None = None, sample_interval: float | None = None,
+        confidence: float | None = None,
+    ):
+        self.sample_interval = sample_interval or settings.risk_sample_interval
+        self.confidence = confidence or settings.risk_var_confidence
+        self._returns: deque[float] = deque(maxlen=window or settings.risk_window)
+        self._sum = 0.0
+        self._sumsq = 0.0
+        self._lock = threading.Lock()
+        self.qty: dict[str, float] = {}
+        self.prices: dict[str, float] = {}
+        self._priced_at: dict[str, float] = {}  # symbol -> time of its price
+        self.value = 0.0
+        self.peak = 0.0
+        self._last_sample: tuple[float, float] | None = None  # (at, value)
+        self.updated_at = 0.0
+
+    def symbols(self) -> set[str]:
+        return set(self.qty)
+
+    def set_positions(
+        self, positions: list[dict], now: float | None = None, quoted_at: float | None = None,
+    ) -> None:
+        """Replace holdings from a broker positions snapshot quoted at ``quoted_at``.
+
+        The snapshot's ``current_price`` replaces any older price first, so a
+        price move between refreshes counts as a return (the only price
+        source when alerts are not streaming). A change in holdings (a fill,
+        a deposit) is not a return: the high-water mark and the open sample
+        are rescaled to the new value, so drawdown and the return series only
+        reflect price moves.
+        """
+        with self._lock:
+            now = now if now is not None else time.time()
+            quoted_at = quoted_at if quoted_at is not None else now
+            for p in positions:
+                symbol = p["symbol"]
+                if p.get("current_price") and self._priced_at.get(symbol, -math.inf) < quoted_at:
+                    self.prices[symbol] = float(p["current_price"])
+                    self._priced_at[symbol] = quoted_at
+            moved = sum(q * self.prices.get(s, 0.0) for s, q in self.qty.items())
+            if self.qty and moved != self.value:
+                self.value = moved
+                self._after_update(now)
+
+            old = self.value
+            self.qty = {p["symbol"]: float(p["qty"]) for p in positions if float(p.get("qty") or 0)}
+            self.value = sum(q * self.prices.get(s, 0.0) for s, q in self.qty.items())
+            if old > 0 and self.value > 0 and self._last_sample is not None:
+                scale = self.value / old
+                self.peak *= scale
+                self._last_sample = (self._last_sample[0], self._last_sample[1] * scale)
+            else:
+                self.peak = self.value
+                self._last_sample = (now, self.value)
+            self.updated_at = now
+
+    def on_price(self, symbol: str, price: float, now: float | None = None) -> bool:
+        """Apply a tick; return True if it moved the portfolio."""
+        with self._lock:
+            now = now if now is not None else time.time()
+            qty = self.qty.get(symbol)
+            old = self.prices.get(symbol)
+            self.prices[symbol] = price
+            self._priced_at[symbol] = now
+            if not qty or old == price:
+                return False
+            self.value += qty * (price - (old or 0.0))
+            self._after_update(now)
+            return True
+
+    def _after_update(self, now: float) -> None:
+        self.peak = max(self.peak, self.value)
+        self.updated_at = now
+        if self._last_sample is None:
+            self._last_sample = (now, self.value)
+            return
+        at, value = self._last_sample
+        if now - at < self.sample_interval:
+            return
+        if value > 0 and self.value > 0:
+            r = self.value / value - 1.0
+            if len(self._returns) == self._returns.maxlen:
+                old = self._returns[0]
+                self._sum -= old
+                self._sumsq -= old * old
+            self._returns.append(r)
+            self._sum += r
+            self._sumsq += r * r
+        self._last_sample = (now, self.value)
+
+    def _period_std(self) -> float | None:
+        n = len(self._returns)
+        if n < self.MIN_SAMPLES:
+            return None
+        mean = self._sum / n
+        var = max(self._sumsq / n - mean * mean, 0.0) * n / (n - 1)
+        return math.sqrt(var)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            std = self._period_std()
+            periods_per_day = _TRADING_SECONDS_PER_DAY / self.sample_interval
+            gross = sum(abs(q * self.prices.get(s, 0.0)) for s, q in self.qty.items())
+            largest = max((abs(q * self.prices.get(s, 0.0)) for s, q in self.qty.items()), default=0.0)
+            z = NormalDist().inv_cdf(self.confidence)
+            return {
+                "value": self.value,
+                "drawdown": 1.0 - self.value / self.peak if self.peak > 0 else 0.0,
+                "volatility": std * math.sqrt(periods_per_day * _TRADING_DAYS_PER_YEAR) if std is not None else None,
+                "var": z * std * math.sqrt(periods_per_day) if std is not None else None,
+                "concentration": largest / gross if gross > 0 else 0.0,
+                "samples": len(self._returns),
+                "updated_at": self.updated_at,
+            }
+
+
+def risk_breach(metrics: dict, condition: dict) -> str | None:
+    """Message if ``condition`` ({"metric": "drawdown", "above": 0.05}) is breached, else None."""
+    metric = condition.get("metric")
+    value = metrics.get(metric)
+    if metric not in RISK_METRICS or value is None:
+        return None
+    if "above" in condition and value > float(condition["above"]):
+        return f"Portfolio {metric} is {value:.2%}, above {float(condition['above']):.2%}"
+    if "below" in condition and value < float(condition["below"]):
+        return f"Portfolio {metric} is {value:.2%}, below {float(condition['below']):.2%}"
+    return None
+
+
+def refresh_positions(db) -> None:
+    """Load holdings into the risk state from the (cached) broker positions snapshot."""
+    from backend.services.broker_service import BrokerService
+    try:
+        positions, age = BrokerService(db).get_positions_snapshot()
+    except Exception as e:
+        logger.debug(f"Risk state position refresh failed: {e}")
+        return
+    portfolio_risk_state.set_positions(positions, quoted_at=time.time() - age)
+
+
+def sync_risk_positions(db) -> None:
+    """Refresh holdings while streaming risk alerts exist, and re-pin their symbols."""
+    from backend.services.alert_engine import alert_engine
+    if not alert_engine.risk_alerts:
+        return
+    refresh_positions(db)
+    alert_engine.request_repin_risk()
+
+
+portfolio_risk_state = PortfolioRiskState()
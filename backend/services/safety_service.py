@@ -1,9 +1,16 @@
 import json
 import logging
+import threading
+import time
+import weakref
 from datetime import date
 
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.orm import Session
 
+from backend.core.config import settings as app_settings
+from backend.models.daily_trade_count import DailyTradeCount
 from backend.models.settings import Settings
 from backend.models.trade_history import TradeHistory
 
@@ -18,20 +25,60 @@ DEFAULT_SAFETY = {
 }
 
 
+class _SafetyState:
+    """Cached safety settings for one database."""
+
+    def __init__(self):
+        self.settings: dict[str, tuple[dict, int | None, float]] = {}  # user -> (settings, version, loaded_at)
+
+
+# Keyed by engine so separate databases (e.g. per-test engines) never share state
+_states: "weakref.WeakKeyDictionary[object, _SafetyState]" = weakref.WeakKeyDictionary()
+_states_lock = threading.Lock()
+
+
+def _state_for(db: Session) -> _SafetyState:
+    bind = db.get_bind()
+    with _states_lock:
+        state = _states.get(bind)
+        if state is None:
+            state = _states[bind] = _SafetyState()
+        return state
+
+
 class SafetyService:
+    """Pre-trade safety checks.
+
+    Limits read by ``get_settings`` are cached in memory for
+    ``safety_cache_ttl`` seconds. ``can_trade`` checks the settings row's
+    ``version`` (bumped on every write) in the same query that reads today's
+    count, so the kill switch applies at once in every worker without
+    reloading the settings. Today's trades are counted in
+    ``daily_trade_counts``: confirmations reserve their trades with a
+    conditional UPDATE, so concurrent confirms cannot together exceed
+    ``max_daily_trades``.
+    """
+
     def __init__(self, db: Session):
         self.db = db
+        self._state = _state_for(db)
 
     def get_settings(self, user_id: str) -> dict:
-        row = self.db.query(Settings).filter(
+        cached = self._state.settings.get(user_id)
+        if cached is not None and time.monotonic() - cached[2] < app_settings.safety_cache_ttl:
+            return dict(cached[0])
+        return self._load(user_id)
+
+    def _load(self, user_id: str) -> dict:
+        row = self.db.query(Settings.value, Settings.version).filter(
             Settings.user_id == user_id, Settings.key == "safety"
         ).first()
-        if row:
-            return {**DEFAULT_SAFETY, **json.loads(row.value)}
-        return DEFAULT_SAFETY.copy()
+        loaded = {**DEFAULT_SAFETY, **json.loads(row.value)} if row else DEFAULT_SAFETY.copy()
+        self._state.settings[user_id] = (loaded, row.version if row else None, time.monotonic())
+        return dict(loaded)
 
     def update_settings(self, user_id: str, updates: dict) -> dict:
-        current = self.get_settings(user_id)
+        current = self._load(user_id)
         current.update(updates)
         row = self.db.query(Settings).filter(
             Settings.user_id == user_id, Settings.key == "safety"
@@ -41,6 +88,7 @@ class SafetyService:
         else:
             self.db.add(Settings(user_id=user_id, key="safety", value=json.dumps(current)))
         self.db.commit()
+        self._state.settings[user_id] = (dict(current), row.version if row else None, time.monotonic())
         return current
 
     def activate_kill_switch(self, user_id: str) -> dict:
@@ -54,7 +102,20 @@ class SafetyService:
         return {"status": "kill_switch_inactive"}
 
     def can_trade(self, user_id: str) -> bool:
-        settings = self.get_settings(user_id)
+        # One query: the settings version (a kill switch set by another worker
+        # must apply immediately) and today's count
+        today = date.today()
+        version, today_trades = self.db.execute(select(
+            select(Settings.version)
+            .where(Settings.user_id == user_id, Settings.key == "safety").scalar_subquery(),
+            select(DailyTradeCount.count)
+            .where(DailyTradeCount.user_id == user_id, DailyTradeCount.day == today).scalar_subquery(),
+        )).one()
+        cached = self._state.settings.get(user_id)
+        if cached is not None and cached[1] == version:
+            settings = dict(cached[0])
+        else:
+            settings = self._load(user_id)
 
         if settings["kill_switch"]:
             logger.warning("Trade blocked: kill switch active")
@@ -63,17 +124,71 @@ class SafetyService:
         if settings["paper_trading"]:
             return True  # Paper trades always allowed
 
-        # Check daily trade limit
-        today_trades = (
+        if today_trades is None:
+            today_trades = self._seed(user_id, today)
+        if today_trades >= settings["max_daily_trades"]:
+            logger.warning(f"Trade blocked: daily limit ({settings['max_daily_trades']}) reached")
+            return False
+
+        return True
+
+    def trades_today(self, user_id: str) -> int:
+        today = date.today()
+        count = self.db.query(DailyTradeCount.count).filter(
+            DailyTradeCount.user_id == user_id, DailyTradeCount.day == today
+        ).scalar()
+        return count if count is not None else self._seed(user_id, today)
+
+    def _seed(self, user_id: str, day: date) -> int:
+        """Create the day's counter row from TradeHistory (once per user and day); return its count."""
+        # A concurrent seed by another worker is ignored
+        self.db.execute(
+            insert(DailyTradeCount)
+            .values(user_id=user_id, day=day, count=self._count_trades(user_id, day))
+            .on_conflict_do_nothing()
+        )
+        self.db.commit()
+        return self.db.query(DailyTradeCount.count).filter(
+            DailyTradeCount.user_id == user_id, DailyTradeCount.day == day
+        ).scalar()
+
+    def reserve_trades(self, user_id: str, n: int = 1) -> bool:
+        """Count ``n`` trades against today's limit; False (nothing reserved) if they exceed it.
+
+        Paper trades are not limited but are still counted.
+        """
+        if n <= 0:
+            return True
+        settings = self._load(user_id)
+        today = date.today()
+        query = self.db.query(DailyTradeCount).filter(
+            DailyTradeCount.user_id == user_id, DailyTradeCount.day == today,
+        )
+        if query.with_entities(DailyTradeCount.count).scalar() is None:
+            self._seed(user_id, today)
+        if not settings["paper_trading"]:
+            query = query.filter(DailyTradeCount.count + n <= settings["max_daily_trades"])
+        reserved = query.update({DailyTradeCount.count: DailyTradeCount.count + n}, synchronize_session=False)
+        self.db.commit()
+        if not reserved:
+            logger.warning(f"Trade blocked: daily limit ({settings['max_daily_trades']}) reached")
+        return bool(reserved)
+
+    def release_trades(self, user_id: str, n: int = 1) -> None:
+        """Return reserved trades that were not placed (e.g. the broker rejected them)."""
+        if n <= 0:
+            return
+        self.db.query(DailyTradeCount).filter(
+            DailyTradeCount.user_id == user_id, DailyTradeCount.day == date.today(),
+        ).update({DailyTradeCount.count: DailyTradeCount.count - n}, synchronize_session=False)
+        self.db.commit()
+
+    def _count_trades(self, user_id: str, day: date) -> int:
+        return (
             self.db.query(TradeHistory)
             .filter(
                 TradeHistory.user_id == user_id,
-                TradeHistory.timestamp >= date.today().isoformat(),
+                TradeHistory.timestamp >= day.isoformat(),
             )
             .count()
         )
-        if today_trades >= settings["max_daily_trades"]:
-            logger.warning(f"Trade blocked: daily limit ({settings['max_daily_trades']}) reached")
-            return False
-
-        return True
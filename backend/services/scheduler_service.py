@@ -1,10 +1,13 @@
+import asyncio
 import json
 import logging
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from sqlalchemy.orm import Session
 
+from backend.core.config import settings
 from backend.models.scheduled_job import ScheduledJob
 
 logger = logging.getLogger(__name__)
@@ -27,8 +30,40 @@ class SchedulerService:
     def start(self):
         if not self.scheduler.running:
             self.scheduler.start()
+            self._add_system_jobs()
             self._load_jobs()
 
+    def _add_system_jobs(self):
+        """Housekeeping jobs that run regardless of user configuration."""
+        self.scheduler.add_job(
+            _close_idle_brokers, trigger=IntervalTrigger(seconds=60),
+            id="system_broker_pool", replace_existing=True,
+        )
+        self.scheduler.add_job(
+            _poll_open_orders, trigger=IntervalTrigger(seconds=settings.order_poll_interval),
+            id="system_order_tracker", replace_existing=True,
+        )
+        # Streaming mode evaluates alerts per tick and only needs holdings kept
+        # fresh for risk alerts; otherwise sweep all users in one batch
+        if settings.alert_streaming:
+            self.scheduler.add_job(
+                _sync_risk_positions, trigger=IntervalTrigger(seconds=settings.risk_positions_interval),
+                id="system_risk_positions", replace_existing=True,
+            )
+        else:
+            self.scheduler.add_job(
+                _run_alert_sweep, trigger=IntervalTrigger(seconds=settings.alert_check_interval),
+                id="system_alert_check", replace_existing=True,
+            )
+        self.scheduler.add_job(
+            _expire_pending_orders, trigger=IntervalTrigger(seconds=60),
+            id="system_pending_orders", replace_existing=True,
+        )
+        self.scheduler.add_job(
+            _refresh_portfolio_snapshots, trigger=IntervalTrigger(seconds=settings.portfolio_snapshot_interval),
+            id="system_portfolio_snapshots", replace_existing=True,
+        )
+
     def _load_jobs(self):
         jobs = self.db.query(ScheduledJob).filter(ScheduledJob.enabled.is_(True)).all()
         for job in jobs:
@@ -164,6 +199,80 @@ def _get_job_handler(job_type: str):
     return handlers.get(job_type)
 
 
+async def _close_idle_brokers():
+    from backend.services.broker_pool import broker_pool
+    closed = broker_pool.close_idle()
+    if closed:
+        logger.info(f"Closed {closed} idle broker client(s)")
+
+
+def _sync_risk_positions_sync():
+    from backend.core.database import SessionLocal
+    from backend.services.risk_state_service import sync_risk_positions
+    db = SessionLocal()
+    try:
+        sync_risk_positions(db)
+    finally:
+        db.close()
+
+
+async def _sync_risk_positions():
+    try:
+        await asyncio.to_thread(_sync_risk_positions_sync)
+    except Exception as e:
+        logger.warning(f"Risk position refresh failed: {e}")
+
+
+def _poll_open_orders_sync():
+    from backend.core.database import SessionLocal
+    from backend.services.order_tracking_service import OrderTracker
+    db = SessionLocal()
+    try:
+        return OrderTracker(db).poll_once()
+    finally:
+        db.close()
+
+
+async def _poll_open_orders():
+    # Broker calls block, so keep them off the event loop
+    try:
+        events = await asyncio.to_thread(_poll_open_orders_sync)
+    except Exception as e:
+        logger.warning(f"Order status poll failed: {e}")
+        return
+    if events:
+        logger.info(f"Order tracker recorded {len(events)} status change(s)")
+
+
+async def _expire_pending_orders():
+    from backend.core.database import SessionLocal
+    from backend.services.broker_service import expire_pending_orders
+    db = SessionLocal()
+    try:
+        expired = expire_pending_orders(db)
+        if expired:
+            logger.info(f"Expired {expired} unconfirmed order(s)")
+    finally:
+        db.close()
+
+
+def _refresh_portfolio_snapshots_sync():
+    from backend.core.database import SessionLocal
+    from backend.services.portfolio_snapshot_service import PortfolioSnapshotService
+    db = SessionLocal()
+    try:
+        PortfolioSnapshotService(db).refresh()
+    finally:
+        db.close()
+
+
+async def _refresh_portfolio_snapshots():
+    try:
+        await asyncio.to_thread(_refresh_portfolio_snapshots_sync)
+    except Exception as e:
+        logger.warning(f"Portfolio snapshot refresh failed: {e}")
+
+
 async def _run_market_scan(config: dict, user_id: str):
     logger.info(f"Running market scan for user {user_id}: {config}")
     from backend.core.database import SessionLocal
@@ -188,8 +297,32 @@ async def _run_ai_analysis(config: dict, user_id: str):
     logger.info(f"Running AI analysis for user {user_id}")
 
 
+def _evaluate_alerts_sync(user_id: str | None) -> list[dict]:
+    from backend.core.database import SessionLocal
+    from backend.services.alert_service import AlertService
+    db = SessionLocal()
+    try:
+        return AlertService(db).evaluate_all(user_id)
+    finally:
+        db.close()
+
+
 async def _run_alert_check(config: dict, user_id: str):
     logger.info(f"Running alert check for user {user_id}")
+    # A job with {"all_users": true} checks every user's alerts in the same batch
+    target = None if config.get("all_users") else user_id
+    triggered = await asyncio.to_thread(_evaluate_alerts_sync, target)
+    logger.info(f"Alert check complete: {len(triggered)} triggered")
+
+
+async def _run_alert_sweep():
+    try:
+        triggered = await asyncio.to_thread(_evaluate_alerts_sync, None)
+    except Exception as e:
+        logger.warning(f"Alert sweep failed: {e}")
+        return
+    if triggered:
+        logger.info(f"Alert sweep triggered {len(triggered)} alert(s)")
 
 
 async def _run_live_adaptation(config: dict, user_id: str):
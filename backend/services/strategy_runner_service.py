@@ -84,11 +84,16 @@ class StrategyRunnerService:
             if safety.can_trade(user_id):
                 from backend.services.broker_service import BrokerService
                 broker = BrokerService(self.db)
+                orders = []
                 for sig in result["signals"]:
                     if sig.get("signal", 0) > 0:
-                        broker.submit_order(sig.get("symbol", symbols[0]), "buy", 1)
+                        orders.append({"symbol": sig.get("symbol", symbols[0]), "side": "buy", "qty": 1})
                     elif sig.get("signal", 0) < 0:
-                        broker.submit_order(sig.get("symbol", symbols[0]), "sell", 1)
+                        orders.append({"symbol": sig.get("symbol", symbols[0]), "side": "sell", "qty": 1})
+                if orders:
+                    basket = broker.submit_basket(orders, user_id=user_id)
+                    result["basket_id"] = basket.get("basket_id")
+                    result["rejected_orders"] = basket.get("rejected", [])
                 result["trades_submitted"] = True
             else:
                 result["trades_submitted"] = False
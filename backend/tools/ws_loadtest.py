@@ -0,0 +1,289 @@
+"""WebSocket load-test harness for /ws/prices, /ws/alerts and /ws/optimize.
+
+Runs fully offline: the server is started with the simulated price feed and a
+throwaway SQLite database, and a background publisher pushes sequenced
+messages to the alert and optimize broadcasters. Every run with the same
+arguments produces the same subscriptions and the same price paths.
+
+Usage:
+    python -m backend.tools.ws_loadtest --clients 200 --symbols 500 --rate 4 --duration 30
+
+Reports per-channel delivery latency percentiles, messages dropped (gaps in
+the broadcast sequence), per-connection queue metrics from the server and the
+server process's CPU usage.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+# --- Server side ---
+
+
+def create_app():
+    """uvicorn factory: the regular app plus a sequenced alert/optimize publisher."""
+    from backend.main import app
+
+    rate = float(os.environ.get("PUFFLING_LOADTEST_BROADCAST_RATE", "0"))
+    started = False
+
+    async def wrapper(scope, receive, send):
+        nonlocal started
+        if not started and rate > 0:
+            started = True
+            asyncio.get_running_loop().create_task(_publish_loop(rate))
+        await app(scope, receive, send)
+
+    return wrapper
+
+
+async def _publish_loop(rate: float) -> None:
+    from backend.api.ws.optimize_ws import _optimize_clients
+    from backend.services.alert_service import alert_connections
+
+    interval = 1.0 / rate
+    seq = 0
+    while True:
+        seq += 1
+        msg = {"type": "loadtest", "seq": seq, "sent_at": time.time()}
+        alert_connections.publish(json.dumps(msg))
+        _optimize_clients.publish(json.dumps(msg))
+        await asyncio.sleep(interval)
+
+
+def start_server(args) -> subprocess.Popen:
+    db_path = os.path.join(tempfile.mkdtemp(prefix="puffling-loadtest-"), "loadtest.db")
+    env = dict(
+        os.environ,
+        PUFFLING_DATABASE_URL=f"sqlite:///{db_path}",
+        PUFFLING_PRICE_FEED="simulated",
+        PUFFLING_SIM_FEED_RATE=str(args.rate),
+        PUFFLING_SIM_FEED_SYMBOLS=str(args.symbols),
+        PUFFLING_SIM_FEED_SEED=str(args.seed),
+        PUFFLING_PRICE_BATCH_INTERVAL=str(args.batch_interval),
+        PUFFLING_LOADTEST_BROADCAST_RATE=str(args.broadcast_rate),
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.tools.ws_loadtest:create_app", "--factory",
+         "--host", args.host, "--port", str(args.port), "--log-level", "warning"],
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        try:
+            urllib.request.urlopen(f"http://{args.host}:{args.port}/api/health", timeout=1)
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("server did not become healthy within 30s")
+
+
+def cpu_seconds(pid: int) -> float | None:
+    """User + system CPU seconds consumed by a live process (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+# --- Client side ---
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(len(ordered) * pct / 100))
+    return ordered[rank - 1]
+
+
+class ChannelStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: list[float] = []
+        self.received = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def record(self, sent_at: float, received_at: float) -> None:
+        self.received += 1
+        self.latencies.append(max(received_at - sent_at, 0.0) * 1000)
+
+    def summary(self) -> dict:
+        lat = self.latencies
+        return {
+            "received": self.received,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "p50_ms": round(percentile(lat, 50), 2),
+            "p95_ms": round(percentile(lat, 95), 2),
+            "p99_ms": round(percentile(lat, 99), 2),
+            "max_ms": round(max(lat), 2) if lat else 0.0,
+        }
+
+
+def _decode(raw) -> dict:
+    if isinstance(raw, bytes):
+        import msgpack
+        return msgpack.unpackb(raw)
+    return json.loads(raw)
+
+
+async def price_client(url: str, symbols: list[str], encoding: str, stats: ChannelStats, stop: asyncio.Event):
+    import websockets
+
+    try:
+        async with websockets.connect(f"{url}/ws/prices?encoding={encoding}", max_queue=None) as ws:
+            await ws.send(json.dumps({"action": "subscribe", "symbols": symbols}))
+            while not stop.is_set():
+                try:
+                    raw = await asyncio.wait_for(ws.recv(), timeout=0.5)
+                except asyncio.TimeoutError:
+                    continue
+                now = time.time()
+                msg = _decode(raw)
+                if msg.get("type") != "prices":
+                    continue
+                for update in msg["data"]:
+                    ts = update["timestamp"] if isinstance(update, dict) else update[2]
+                    stats.record(ts, now)
+    except Exception:
+        stats.errors += 1
+
+
+async def broadcast_client(url: str, path: str, stats: ChannelStats, stop: asyncio.Event):
+    import websockets
+
+    last_seq = None
+    try:
+        async with websockets.connect(f"{url}{path}", max_queue=None) as ws:
+            while not stop.is_set():
+                try:
+                    raw = await asyncio.wait_for(ws.recv(), timeout=0.5)
+                except asyncio.TimeoutError:
+                    continue
+                now = time.time()
+                msg = json.loads(raw)
+                if msg.get("type") != "loadtest":
+                    continue
+                if last_seq is not None and msg["seq"] > last_seq + 1:
+                    stats.dropped += msg["seq"] - last_seq - 1
+                last_seq = msg["seq"]
+                stats.record(msg["sent_at"], now)
+    except Exception:
+        stats.errors += 1
+
+
+async def run_clients(args) -> dict:
+    url = f"ws://{args.host}:{args.port}"
+    rng = random.Random(args.seed)
+    universe = [f"SIM{i:04d}" for i in range(args.symbols)]
+    stats = {name: ChannelStats(name) for name in ("prices", "alerts", "optimize")}
+    stop = asyncio.Event()
+    ramp = asyncio.Semaphore(args.ramp)
+
+    async def ramped(coro):
+        async with ramp:
+            await asyncio.sleep(0.01)  # spread connection setup
+        await coro
+
+    tasks = []
+    for _ in range(args.clients):
+        subs = rng.sample(universe, min(args.subs_per_client, len(universe)))
+        tasks.append(ramped(price_client(url, subs, args.encoding, stats["prices"], stop)))
+    for _ in range(args.alert_clients):
+        tasks.append(ramped(broadcast_client(url, "/ws/alerts", stats["alerts"], stop)))
+    for _ in range(args.optimize_clients):
+        tasks.append(ramped(broadcast_client(url, "/ws/optimize", stats["optimize"], stop)))
+
+    running = [asyncio.create_task(t) for t in tasks]
+    await asyncio.sleep(args.duration)
+    # Server-side queue metrics while every client is still connected
+    server_queues = await asyncio.to_thread(_fetch_json, f"http://{args.host}:{args.port}/api/monitor/ws")
+    stop.set()
+    await asyncio.gather(*running, return_exceptions=True)
+    return {"channels": {n: s.summary() for n, s in stats.items()}, "server_queues": server_queues}
+
+
+def _fetch_json(url: str) -> dict:
+    try:
+        with urllib.request.urlopen(url, timeout=5) as resp:
+            return json.loads(resp.read())
+    except OSError:
+        return {}
+
+
+def summarize_queues(server_queues: dict) -> dict:
+    """Collapse per-connection queue metrics into per-broadcaster totals."""
+    out = {}
+    for name, queues in server_queues.items():
+        out[name] = {
+            "connections": len(queues),
+            "dropped": sum(q["dropped"] for q in queues),
+            "conflated": sum(q["conflated"] for q in queues),
+            "max_depth": max((q["depth"] for q in queues), default=0),
+            "max_lag_ms": max((q["max_lag_ms"] for q in queues), default=0.0),
+        }
+    return out
+
+
+def main(argv: list[str] | None = None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=100, help="price WebSocket clients")
+    parser.add_argument("--symbols", type=int, default=200, help="simulated symbol universe size")
+    parser.add_argument("--subs-per-client", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=2.0, help="ticks per second per symbol")
+    parser.add_argument("--batch-interval", type=float, default=0.05)
+    parser.add_argument("--alert-clients", type=int, default=20)
+    parser.add_argument("--optimize-clients", type=int, default=20)
+    parser.add_argument("--broadcast-rate", type=float, default=10.0, help="alert/optimize messages per second")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds to measure")
+    parser.add_argument("--ramp", type=int, default=50, help="concurrent connection attempts")
+    parser.add_argument("--encoding", choices=("json", "compact", "msgpack"), default="json")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--no-server", action="store_true", help="target an already running server")
+    args = parser.parse_args(argv)
+
+    proc = None if args.no_server else start_server(args)
+    cpu_before = cpu_seconds(proc.pid) if proc else None
+    wall_start = time.monotonic()
+    try:
+        result = asyncio.run(run_clients(args))
+        wall = time.monotonic() - wall_start
+        cpu_after = cpu_seconds(proc.pid) if proc else None
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    if proc is not None:
+        if cpu_before is None or cpu_after is None:
+            # No procfs: fall back to the reaped child's totals
+            usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+            cpu_before, cpu_after = 0.0, usage.ru_utime + usage.ru_stime
+        cpu = cpu_after - cpu_before
+        result["server_cpu"] = {"seconds": round(cpu, 2), "percent": round(100 * cpu / wall, 1)}
+    result["server_queues"] = summarize_queues(result["server_queues"])
+
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -44,15 +44,18 @@ export default function Dashboard() {
         subscribeToPrices();
         return;
       }
-      if (data.symbol && data.price != null) {
+      if (data.type === "prices" && Array.isArray(data.data)) {
+        const updates: { symbol: string; price: number; timestamp: number }[] = data.data;
         setPrices((prev) => {
           const next = new Map(prev);
-          const existing = next.get(data.symbol);
-          next.set(data.symbol, {
-            price: data.price,
-            prev: existing?.price ?? null,
-            timestamp: data.timestamp,
-          });
+          for (const u of updates) {
+            const existing = next.get(u.symbol);
+            next.set(u.symbol, {
+              price: u.price,
+              prev: existing?.price ?? null,
+              timestamp: u.timestamp,
+            });
+          }
           return next;
         });
       }
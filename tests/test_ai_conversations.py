@@ -0,0 +1,53 @@
+"""Tests for the row-per-message conversation store."""
+import json
+
+import pytest
+
+from backend.models.ai_conversation import AIConversation
+from backend.models.ai_message import AIMessage
+from backend.models.user import User
+from backend.services import llm_service
+from backend.services.ai_service import AIService
+from backend.services.llm_service import LLMClient, ResponseCache
+
+
+@pytest.fixture
+def svc(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_service, "_client", LLMClient(provider="stub", cache=ResponseCache(str(tmp_path))))
+    db.add(User(id="u", name="U"))
+    db.commit()
+    return AIService(db)
+
+
+def test_chat_appends_rows_and_pages_backwards(svc, db):
+    conv_id = svc.chat("u", "First question about   SPY")["conversation_id"]
+    for i in range(4):
+        assert svc.chat("u", f"follow-up {i}", conv_id)["conversation_id"] == conv_id
+
+    assert db.query(AIMessage).filter(AIMessage.conversation_id == conv_id).count() == 10
+    page = svc.get_messages(conv_id, "u", limit=4)
+    assert [m["seq"] for m in page["messages"]] == [6, 7, 8, 9]
+    assert page["messages"][0]["content"] == "follow-up 2"
+    older = svc.get_messages(conv_id, "u", before=page["next_before"], limit=4)
+    assert [m["seq"] for m in older["messages"]] == [2, 3, 4, 5]
+    first = svc.get_messages(conv_id, "u", before=2, limit=4)
+    assert [m["seq"] for m in first["messages"]] == [0, 1] and first["next_before"] is None
+    assert svc.get_messages(conv_id, "someone-else") is None
+
+    (summary,) = svc.get_conversations("u")
+    assert summary.title == "First question about SPY"
+    assert summary.message_count == 10
+    assert summary.last_message.startswith("[stub:")
+
+
+def test_legacy_blob_is_migrated_on_access(svc, db):
+    legacy = [{"role": "user", "content": "old question"}, {"role": "assistant", "content": "old answer"}]
+    conv = AIConversation(user_id="u", messages=json.dumps(legacy))
+    db.add(conv)
+    db.commit()
+
+    page = svc.get_messages(conv.id, "u")
+    assert [(m["seq"], m["content"]) for m in page["messages"]] == [(0, "old question"), (1, "old answer")]
+    svc.chat("u", "new question", conv.id)
+    db.refresh(conv)
+    assert conv.messages == "" and conv.message_count == 4 and conv.title == "old question"
@@ -0,0 +1,98 @@
+"""Tests for the AI tool executor."""
+import threading
+import time
+
+import pytest
+
+from backend.services import ai_tools
+from backend.services.ai_tools import ToolExecutor, TurnDataCache
+
+
+class _Provider:
+    def __init__(self):
+        self.calls = 0
+
+    def get_data(self, symbols, start=None, end=None, **kwargs):
+        self.calls += 1
+        time.sleep(0.1)
+        return {"symbols": list(symbols), "start": start, "end": end}
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    monkeypatch.setattr(ai_tools, "_memo", ai_tools.OrderedDict())
+    log = []
+    lock = threading.Lock()
+
+    def fake_execute(tool_name, args, user_id, db, provider=None):
+        with lock:
+            log.append((tool_name, threading.current_thread().name))
+        if tool_name == "place_order":
+            return {"status": "pending", "n": len(log)}
+        data = provider.get_data(args["symbols"], start=args["start"], end=args["end"])
+        return {"tool": tool_name, "rows": len(data["symbols"])}
+
+    monkeypatch.setattr(ai_tools, "execute_tool", fake_execute)
+    return log
+
+
+def test_independent_tools_run_concurrently_on_shared_data(calls):
+    provider = _Provider()
+    executor = ToolExecutor("u", db=None, data=TurnDataCache(provider))
+    args = {"symbols": ["SPY", "QQQ"], "start": "2024-01-01", "end": "2024-12-31"}
+    turn = [
+        {"name": "get_market_data", "args": args},
+        {"name": "place_order", "args": {"symbol": "SPY", "side": "buy", "qty": 1}},
+        {"name": "compute_factors", "args": args},
+        {"name": "check_risk", "args": args},
+    ]
+
+    started = time.monotonic()
+    results = executor.execute_many(turn)
+    assert time.monotonic() - started < 0.25  # one shared 0.1s fetch, not three
+    assert provider.calls == 1
+    assert [r.get("tool") for r in results] == ["get_market_data", None, "compute_factors", "check_risk"]
+    # place_order ran on the caller's thread, after the read-only tools
+    order_call = [c for c in calls if c[0] == "place_order"]
+    assert order_call == [("place_order", threading.current_thread().name)]
+    assert calls[-1][0] == "place_order"
+
+
+def test_idempotent_tools_are_memoized_but_orders_are_not(calls):
+    args = {"symbols": ["SPY"], "start": "2024-01-01", "end": "2024-12-31"}
+    ToolExecutor("u", db=None, data=TurnDataCache(_Provider())).execute("check_risk", args)
+    provider = _Provider()
+    executor = ToolExecutor("u", db=None, data=TurnDataCache(provider))
+    assert executor.execute("check_risk", args) == {"tool": "check_risk", "rows": 1}
+    assert provider.calls == 0  # served from the cross-turn memo
+
+    order = {"symbol": "SPY", "side": "buy", "qty": 1}
+    first = executor.execute("place_order", order)
+    second = executor.execute("place_order", order)
+    assert first != second  # each order call reaches the broker service
+
+
+def test_market_data_and_risk_tools_share_one_fetch(monkeypatch):
+    import pandas as pd
+
+    from backend.services.risk_service import RiskService
+
+    monkeypatch.setattr(ai_tools, "_memo", ai_tools.OrderedDict())
+    monkeypatch.setattr(RiskService, "assess", lambda self, returns, weights: {"rows": len(returns)})
+    fetched = []
+
+    class Provider:
+        def get_data(self, symbols, start=None, end=None, **kwargs):
+            fetched.append((symbols, kwargs))
+            index = pd.date_range(start, periods=3, name="Date")
+            return pd.DataFrame({"Close": [100.0, 101.0, 99.0]}, index=index)
+
+    executor = ToolExecutor("u", db=None, data=TurnDataCache(Provider()))
+    window = {"start": "2024-01-01", "end": "2024-01-03"}
+    # get_market_data asks for "SPY" at interval 1d, check_risk for ["SPY"] with no interval
+    ohlcv, risk = executor.execute_many([
+        {"name": "get_market_data", "args": {"symbol": "SPY", **window}},
+        {"name": "check_risk", "args": {"symbols": ["SPY"], "weights": [1.0], **window}},
+    ])
+    assert len(fetched) == 1
+    assert len(ohlcv["data"]) == 3 and risk == {"rows": 2}
@@ -0,0 +1,322 @@
+"""Tests for streaming price-alert evaluation."""
+import asyncio
+
+from backend.services.alert_engine import AlertEngine, PriceAlertIndex
+from backend.services.alert_service import AlertGate
+
+
+def _index():
+    index = PriceAlertIndex()
+    index.add(1, "u", {"symbol": "aapl", "above": 200})
+    index.add(2, "u", {"symbol": "AAPL", "above": 210})
+    index.add(3, "u", {"symbol": "AAPL", "below": 180})
+    index.add(4, "u", {"symbol": "MSFT", "below": 400, "above": 450})
+    index.add(5, "u", {"symbol": "TSLA"})  # no threshold: ignored
+    return index
+
+
+def test_index_fires_only_on_crossings():
+    index = _index()
+    assert index.symbols() == {"AAPL", "MSFT"}
+    assert index.crossed("AAPL", 205.0, last=None) == [(1, "above")]
+    assert index.crossed("AAPL", 206.0, last=205.0) == []  # already above, no new crossing
+    assert index.crossed("AAPL", 215.0, last=205.0) == [(2, "above")]
+    assert index.crossed("AAPL", 179.0, last=215.0) == [(3, "below")]
+    assert index.crossed("MSFT", 460.0, last=390.0) == [(4, "above")]
+    assert index.crossed("NVDA", 1.0, last=None) == []
+
+
+def test_gate_hysteresis_cooldown_and_rate_limit():
+    gate = AlertGate(cooldown=60.0, hysteresis=0.01, max_per_minute=2)
+    cond = {"above": 100.0}
+    assert gate.check(1, "u", 101.0, cond, now=0.0) == "above"
+    assert gate.check(1, "u", 102.0, cond, now=1.0) is None  # still fired
+    assert gate.check(1, "u", 99.5, cond, now=2.0) is None  # inside the re-arm band
+    assert gate.check(1, "u", 101.0, cond, now=3.0) is None
+    assert gate.check(1, "u", 98.0, cond, now=4.0) is None  # re-armed...
+    assert gate.check(1, "u", 101.0, cond, now=5.0) is None  # ...but cooling down
+    assert gate.check(1, "u", 101.0, cond, now=61.0) == "above"
+
+    assert gate.check(2, "u", 1.0, {"below": 5.0}, now=62.0) == "below"
+    assert gate.check(3, "u", 1.0, {"below": 5.0}, now=63.0) is None  # two per minute per user
+    assert gate.check(3, "v", 1.0, {"below": 5.0}, now=63.0) == "below"
+
+    rows = {r["id"]: r for r in gate.drain()}
+    assert rows[1]["state"] == "fired" and rows[1]["suppressed_count"] == 1
+    assert rows[3]["suppressed_count"] == 1
+    assert gate.drain() == []
+
+
+class _Hub:
+    def __init__(self):
+        self.listeners, self.pins = [], {}
+
+    def add_listener(self, fn):
+        self.listeners.append(fn)
+
+    def remove_listener(self, fn):
+        self.listeners.remove(fn)
+
+    def pin(self, owner, symbols):
+        self.pins[owner] = set(symbols)
+
+
+def test_engine_pins_symbols_and_records_fired_alerts(db):
+    from backend.models.alert_config import AlertConfig
+    from backend.models.alert_history import AlertHistory
+    from backend.models.user import User
+
+    db.add(User(id="u", name="U"))
+    db.add_all([
+        AlertConfig(user_id="u", alert_type="price", condition='{"symbol": "SPY", "above": 500}', enabled=True),
+        AlertConfig(user_id="u", alert_type="price", condition='{"symbol": "QQQ", "below": 1}', enabled=False),
+    ])
+    db.commit()
+
+    import threading
+
+    threads = set()
+
+    def session():
+        threads.add(threading.get_ident())
+        return db
+
+    async def scenario():
+        hub = _Hub()
+        engine = AlertEngine(hub=hub, session_factory=session, gate=AlertGate())
+        await engine.start()
+        assert threading.get_ident() not in threads  # the database is read off the event loop
+        assert hub.pins["alerts"] == {"SPY"}
+        assert hub.listeners == [engine.on_tick]
+        assert engine.on_tick("SPY", 499.0, 1.0) == []
+        fired = engine.on_tick("SPY", 501.0, 2.0)
+        # Oscillating around the threshold does not re-notify
+        assert engine.on_tick("SPY", 499.9, 3.0) == [] and engine.on_tick("SPY", 502.0, 4.0) == []
+        engine.stop()  # flushes buffered history
+        return fired, hub
+
+    fired, hub = asyncio.run(scenario())
+    assert [e["message"] for e in fired] == ["SPY is at $501.00, above $500"]
+    assert hub.pins["alerts"] == set()
+    assert db.query(AlertHistory).count() == 1
+    assert db.query(AlertConfig).filter(AlertConfig.enabled.is_(True)).one().state == "fired"
+
+
+def test_engine_rechecks_breaches_held_back_by_cooldown(monkeypatch):
+    from types import SimpleNamespace
+
+    from backend.services import alert_service
+
+    clock = [0.0]
+    monkeypatch.setattr(alert_service, "time", SimpleNamespace(time=lambda: clock[0]))
+    engine = AlertEngine(hub=_Hub(), gate=AlertGate(cooldown=60.0, hysteresis=0.01))
+    engine.index.add(1, "u", {"symbol": "SPY", "above": 100})
+
+    def tick(price, t):
+        clock[0] = t
+        return len(engine.on_tick("SPY", price, t))
+
+    assert tick(101.0, 1.0) == 1
+    assert tick(98.0, 2.0) == 0  # re-armed
+    assert tick(101.0, 3.0) == 0  # crossed again inside the cooldown
+    # Still in breach once the cooldown ends: notifies without a new crossing
+    assert [tick(p, t) for p, t in ((101.5, 70.0), (102.0, 200.0), (103.0, 400.0))] == [1, 0, 0]
+
+
+def test_hub_pins_keep_symbols_streaming_without_clients():
+    from backend.services.price_hub import PriceHub
+    from backend.services.price_stream_service import SimulatedFeed
+
+    async def scenario():
+        feed = SimulatedFeed()
+        hub = PriceHub(feed=feed)
+        ticks = []
+        hub.add_listener(lambda s, p, t: ticks.append(s))
+        hub.pin("alerts", {"SPY"})
+        running = hub._engine is not None
+        hub._on_tick("SPY", 500.0, 1.0)
+        pinned_symbols = set(feed.symbols)
+        hub.pin("alerts", set())
+        return running, pinned_symbols, ticks, hub._engine
+
+    running, symbols, ticks, engine = asyncio.run(scenario())
+    assert running and symbols == {"SPY"} and ticks == ["SPY"]
+    assert engine is None  # stopped once nothing needs prices
+
+
+def test_evaluate_all_fetches_each_symbol_once(db, monkeypatch):
+    from backend.models.alert_config import AlertConfig
+    from backend.models.alert_history import AlertHistory
+    from backend.models.user import User
+    from backend.services import alert_service
+    from backend.services.alert_service import AlertService
+
+    db.add_all([User(id="a", name="A"), User(id="b", name="B")])
+    for user in ("a", "b"):
+        for threshold in (100, 150, 200):
+            db.add(AlertConfig(user_id=user, alert_type="price", enabled=True,
+                               condition=f'{{"symbol": "SPY", "above": {threshold}}}'))
+    db.add(AlertConfig(user_id="a", alert_type="price", enabled=True, condition='{"symbol": "QQQ", "below": 300}'))
+    db.add(AlertConfig(user_id="b", alert_type="price", enabled=True, condition='{"symbol": "IWM", "below": 1}'))
+    db.commit()
+
+    calls = []
+
+    def fake_prices(symbols):
+        calls.append(list(symbols))
+        return {"SPY": 175.0, "QQQ": 290.0}  # IWM has no quote
+
+    monkeypatch.setattr(alert_service, "_latest_prices", fake_prices)
+    monkeypatch.setattr(alert_service, "alert_gate", AlertGate())
+    triggered = AlertService(db).evaluate_all()
+
+    assert calls == [["IWM", "QQQ", "SPY"]]
+    assert sorted((t["user_id"], t["message"]) for t in triggered) == [
+        ("a", "QQQ is at $290.00, below $300"),
+        ("a", "SPY is at $175.00, above $100"),
+        ("a", "SPY is at $175.00, above $150"),
+        ("b", "SPY is at $175.00, above $100"),
+        ("b", "SPY is at $175.00, above $150"),
+    ]
+    assert db.query(AlertHistory).count() == 5
+    # Fired alerts stay quiet until they re-arm; the per-user entry point shares the batch path
+    assert AlertService(db).evaluate_alerts("b") == []
+    assert db.query(AlertHistory).count() == 5
+    assert {a.state for a in db.query(AlertConfig).filter(AlertConfig.user_id == "b")} == {"fired", "armed"}
+
+
+def test_evaluate_all_keeps_gate_state_between_sweeps(db, monkeypatch):
+    from backend.models.alert_config import AlertConfig
+    from backend.models.user import User
+    from backend.services import alert_service
+    from backend.services.alert_service import AlertService
+
+    db.add(User(id="u", name="U"))
+    alert = AlertConfig(user_id="u", alert_type="price", enabled=True, condition='{"symbol": "SPY", "above": 100}')
+    db.add(alert)
+    db.commit()
+    monkeypatch.setattr(alert_service, "_latest_prices", lambda symbols: {"SPY": 101.0})
+    monkeypatch.setattr(alert_service, "alert_gate", AlertGate(cooldown=0))
+
+    assert len(AlertService(db).evaluate_all()) == 1
+    # A stale "armed" row (e.g. written by a lagging flush) must not re-arm the gate
+    alert.state = "armed"
+    db.commit()
+    assert AlertService(db).evaluate_all() == []
+
+
+def test_risk_state_tracks_value_drawdown_and_volatility():
+    from backend.services.risk_state_service import PortfolioRiskState, risk_breach
+
+    state = PortfolioRiskState(window=50, sample_interval=60.0)
+    state.set_positions([
+        {"symbol": "AAPL", "qty": 10, "current_price": 100.0},
+        {"symbol": "MSFT", "qty": 5, "current_price": 200.0},
+        {"symbol": "FLAT", "qty": 0, "current_price": 1.0},
+    ], now=0.0)
+    assert state.symbols() == {"AAPL", "MSFT"}
+    assert state.on_price("TSLA", 250.0, now=1.0) is False  # not held
+    assert state.on_price("AAPL", 110.0, now=2.0) is True
+    assert state.value == 2100.0
+    state.on_price("AAPL", 90.0, now=3.0)
+    m = state.metrics()
+    assert abs(m["drawdown"] - (1 - 1900 / 2100)) < 1e-12
+    assert abs(m["concentration"] - 1000 / 1900) < 1e-12
+    assert m["var"] is None and m["volatility"] is None  # too few samples
+
+    for i in range(1, 20):
+        state.on_price("AAPL", 90.0 + (i % 2), now=60.0 * i + 3)
+    m = state.metrics()
+    assert m["samples"] >= state.MIN_SAMPLES
+    assert m["var"] > 0 and m["volatility"] > m["var"]
+
+    assert risk_breach(m, {"metric": "drawdown", "above": 0.05}).startswith("Portfolio drawdown is")
+    assert risk_breach(m, {"metric": "drawdown", "above": 0.5}) is None
+    assert risk_breach(m, {"metric": "beta", "above": 0.0}) is None
+
+
+def test_risk_state_rebalance_is_not_a_return():
+    from backend.services.risk_state_service import PortfolioRiskState
+
+    state = PortfolioRiskState(window=50, sample_interval=60.0)
+    state.set_positions([{"symbol": "SPY", "qty": 10, "current_price": 100.0}], now=0.0)
+    state.on_price("SPY", 110.0, now=60.0)
+    state.on_price("SPY", 99.0, now=120.0)
+    drawdown = state.metrics()["drawdown"]
+    assert abs(drawdown - 0.1) < 1e-12
+
+    # Selling half and buying a new position at unchanged prices leaves drawdown as it was
+    state.set_positions([{"symbol": "SPY", "qty": 5}], now=150.0)
+    assert abs(state.metrics()["drawdown"] - drawdown) < 1e-12
+    state.set_positions([{"symbol": "SPY", "qty": 5}, {"symbol": "QQQ", "qty": 2, "current_price": 400.0}], now=160.0)
+    assert abs(state.metrics()["drawdown"] - drawdown) < 1e-12
+
+    # The next sample is a price return only
+    state.on_price("SPY", 100.0, now=180.0)
+    assert abs(state._returns[-1] - 5.0 / 1295.0) < 1e-12
+
+    flat = PortfolioRiskState(window=50, sample_interval=60.0)
+    flat.set_positions([{"symbol": "SPY", "qty": 10, "current_price": 100.0}], now=0.0)
+    flat.set_positions([{"symbol": "SPY", "qty": 4}], now=90.0)
+    assert flat.metrics()["drawdown"] == 0.0 and flat.metrics()["samples"] == 0
+
+
+def test_batch_risk_alerts_follow_broker_prices(db, monkeypatch):
+    from backend.models.alert_config import AlertConfig
+    from backend.models.user import User
+    from backend.services import alert_service, risk_state_service
+    from backend.services.alert_service import AlertService
+    from backend.services.broker_service import BrokerService
+    from backend.services.risk_state_service import PortfolioRiskState
+
+    monkeypatch.setattr(risk_state_service, "portfolio_risk_state", PortfolioRiskState())
+    monkeypatch.setattr(alert_service, "alert_gate", AlertGate(cooldown=0))
+    quote = {"price": 500.0}
+    monkeypatch.setattr(BrokerService, "get_positions_snapshot", lambda self: (
+        [{"symbol": "SPY", "qty": 10, "current_price": quote["price"]}], 0.0,
+    ))
+    db.add(User(id="u", name="U"))
+    db.add(AlertConfig(user_id="u", alert_type="risk", enabled=True,
+                       condition='{"metric": "drawdown", "above": 0.05}'))
+    db.commit()
+
+    # No streaming: each sweep's positions refresh is the only price source
+    fired = []
+    for price in (500.0, 490.0, 470.0, 465.0):
+        quote["price"] = price
+        fired.append(len(AlertService(db).evaluate_all()))
+    assert fired == [0, 0, 1, 0]
+    assert abs(risk_state_service.portfolio_risk_state.metrics()["drawdown"] - 0.07) < 1e-12
+
+
+def test_engine_fires_risk_alert_once_per_breach(db, monkeypatch):
+    from backend.models.alert_config import AlertConfig
+    from backend.models.user import User
+    from backend.services import risk_state_service
+    from backend.services.risk_state_service import PortfolioRiskState
+
+    state = PortfolioRiskState()
+    state.set_positions([{"symbol": "SPY", "qty": 10, "current_price": 500.0}], now=0.0)
+    monkeypatch.setattr(risk_state_service, "portfolio_risk_state", state)
+    monkeypatch.setattr(risk_state_service, "refresh_positions", lambda db: None)
+
+    db.add(User(id="u", name="U"))
+    db.add(AlertConfig(user_id="u", alert_type="risk", enabled=True,
+                       condition='{"metric": "drawdown", "above": 0.05}'))
+    db.commit()
+
+    async def scenario():
+        hub = _Hub()
+        engine = AlertEngine(hub=hub, session_factory=lambda: db, gate=AlertGate(cooldown=0))
+        engine.RISK_CHECK_INTERVAL = 0.0
+        await engine.start()
+        pins = hub.pins["risk"]
+        fired = [engine.on_tick("SPY", p, 1.0 + i) for i, p in enumerate((490.0, 470.0, 460.0, 499.0, 460.0))]
+        await asyncio.sleep(0.05)
+        engine.stop()
+        return pins, fired
+
+    pins, fired = asyncio.run(scenario())
+    assert pins == {"SPY"}
+    assert [len(f) for f in fired] == [0, 1, 0, 0, 1]  # re-arms after recovering
+    assert fired[1][0]["metric"] == "drawdown"
@@ -55,6 +55,59 @@ def test_portfolio_goals_crud(client):
     assert res.status_code == 200
 
 
+def test_goal_drift_and_snapshot_without_broker(client, monkeypatch):
+    from backend.services import portfolio_snapshot_service
+    from backend.services.broker_service import BrokerService
+
+    def no_broker(self):
+        raise ConnectionError("no broker configured")
+
+    monkeypatch.setattr(portfolio_snapshot_service, "_store", portfolio_snapshot_service._SnapshotStore())
+    monkeypatch.setattr(BrokerService, "get_positions", no_broker)
+    monkeypatch.setattr(BrokerService, "get_account_snapshot", no_broker)
+
+    goal_id = client.post("/api/portfolio/goals/", json={
+        "name": "spy", "target_weights": {"SPY": 1.0}, "drift_threshold": 0.05,
+    }).json()["id"]
+    res = client.get(f"/api/portfolio/goals/{goal_id}/drift")
+    assert res.status_code == 200
+    assert res.json()["snapshot_age"] is None and res.json()["needs_rebalance"] is True
+
+    res = client.get("/api/portfolio/snapshot")
+    assert res.status_code == 200
+    assert res.json()["age"] is None and res.json()["positions"] == []
+
+
+def test_agent_context_reads_the_database_while_the_snapshot_refreshes(db, monkeypatch):
+    import threading
+    import time
+
+    from backend.services.autonomous_agent_service import AutonomousAgentService
+    from backend.services.portfolio_snapshot_service import PortfolioSnapshotService
+
+    caller = threading.get_ident()
+    sessions = set()
+
+    def slow_snapshot(self, analytics=True, max_age=None):
+        time.sleep(0.3)
+        return {"positions": [{"symbol": "SPY", "qty": 1}], "account": {"equity": 1.0}, "version": 1, "age": 0.0}
+
+    def slow_read(self, user_id):
+        sessions.add(threading.get_ident())
+        time.sleep(0.2)
+        return []
+
+    monkeypatch.setattr(PortfolioSnapshotService, "get", slow_snapshot)
+    monkeypatch.setattr(AutonomousAgentService, "_recent_alerts", slow_read)
+    monkeypatch.setattr(AutonomousAgentService, "_active_strategies", slow_read)
+
+    started = time.monotonic()
+    context = AutonomousAgentService(db)._gather_context("default")
+    assert time.monotonic() - started < 0.6  # 0.3s snapshot overlaps 0.4s of reads
+    assert sessions == {caller}  # the session stays on its own thread
+    assert context["positions"] and context["snapshot_version"] == 1
+
+
 def test_alerts_crud(client):
     # Create
     res = client.post("/api/alerts/", json={
@@ -127,3 +180,92 @@ def test_safety_service_can_trade(db):
     # Resume allows trading
     svc.deactivate_kill_switch("default")
     assert svc.can_trade("default") is True
+
+
+def test_safety_daily_limit_reserves_trades_atomically(db):
+    from backend.models.trade_history import TradeHistory
+    from backend.models.user import User
+    from backend.services.safety_service import SafetyService
+
+    db.add(User(id="live", name="Live"))
+    db.add(TradeHistory(user_id="live", symbol="SPY", side="buy", qty=1, price=1.0))
+    db.commit()
+
+    svc = SafetyService(db)
+    svc.update_settings("live", {"paper_trading": False, "max_daily_trades": 3})
+    assert svc.trades_today("live") == 1
+    assert svc.can_trade("live") is True
+
+    # Reservations are all-or-nothing against the limit, seeded from TradeHistory
+    assert svc.reserve_trades("live", 3) is False
+    assert svc.reserve_trades("live", 2) is True
+    assert svc.trades_today("live") == 3
+    assert SafetyService(db).can_trade("live") is False
+    assert svc.reserve_trades("live") is False
+
+    svc.release_trades("live", 1)
+    assert svc.reserve_trades("live") is True
+
+
+def test_kill_switch_is_not_served_from_cache(db):
+    import json
+
+    from backend.models.settings import Settings
+    from backend.models.user import User
+    from backend.services.safety_service import SafetyService
+
+    db.add(User(id="k", name="K"))
+    db.commit()
+    svc = SafetyService(db)
+    svc.update_settings("k", {"paper_trading": True})
+    assert svc.can_trade("k") is True
+
+    # Another worker flips the kill switch directly in the DB
+    row = db.query(Settings).filter(Settings.user_id == "k", Settings.key == "safety").one()
+    row.value = json.dumps({**json.loads(row.value), "kill_switch": True})
+    db.commit()
+    assert svc.can_trade("k") is False
+
+
+def test_can_trade_runs_one_query_once_seeded(db):
+    from sqlalchemy import event
+
+    from backend.models.user import User
+    from backend.services.safety_service import SafetyService
+
+    db.add(User(id="q", name="Q"))
+    db.commit()
+    svc = SafetyService(db)
+    svc.update_settings("q", {"paper_trading": False, "max_daily_trades": 5})
+    assert svc.can_trade("q") is True  # seeds today's counter
+
+    statements = []
+    listener = lambda conn, cursor, sql, *args: statements.append(sql)  # noqa: E731
+    event.listen(db.get_bind(), "before_cursor_execute", listener)
+    try:
+        assert SafetyService(db).can_trade("q") is True
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", listener)
+    assert len(statements) == 1 and "trade_history" not in statements[0]
+
+
+def test_agent_runs_requested_tools_in_one_batch(db, monkeypatch):
+    from backend.services.ai_tools import ToolExecutor
+    from backend.services.autonomous_agent_service import AutonomousAgentService
+
+    batches = []
+    monkeypatch.setattr(AutonomousAgentService, "_gather_context", lambda self, user_id: {})
+    monkeypatch.setattr(AutonomousAgentService, "_analyze", lambda self, context, user_id: {
+        "response": "ok", "suggestions": [],
+        "tool_calls": [
+            {"name": "check_risk", "args": {"symbols": ["SPY"]}},
+            {"name": "place_order", "args": {"symbol": "SPY", "side": "buy", "qty": 1}},
+            {"name": "get_market_data", "args": {"symbol": "SPY"}},
+        ],
+    })
+    monkeypatch.setattr(ToolExecutor, "execute_many", lambda self, calls: batches.append(calls) or [{}] * len(calls))
+
+    report = AutonomousAgentService(db).run("default")["report"]
+    # Orders the model asks for directly are not placed; they go through suggestions and safety checks
+    assert [[c["name"] for c in batch] for batch in batches] == [["check_risk", "get_market_data"]]
+    assert report["tool_results"] == [{}, {}]
@@ -0,0 +1,116 @@
+"""Tests for per-client WebSocket send queues."""
+import asyncio
+
+from backend.core.broadcast import Broadcaster, ClientQueue
+
+
+class _SlowWS:
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.sent: list[str] = []
+        self.delay = delay
+        self.fail = fail
+        self.closed_with = None
+
+    async def send_text(self, text: str):
+        if self.fail:
+            raise RuntimeError("connection reset")
+        await asyncio.sleep(self.delay)
+        self.sent.append(text)
+
+    async def close(self, code: int = 1000):
+        self.closed_with = code
+
+
+def test_drop_oldest_keeps_newest_messages():
+    async def scenario():
+        ws = _SlowWS()
+        queue = ClientQueue(ws, maxsize=2, policy="drop_oldest")
+        for i in range(4):
+            queue.put(str(i))
+        queue.start()
+        await asyncio.sleep(0.01)
+        queue.close()
+        return ws, queue
+
+    ws, queue = asyncio.run(scenario())
+    assert ws.sent == ["2", "3"]
+    assert queue.dropped == 2
+
+
+def test_conflate_replaces_pending_message_with_same_key():
+    async def scenario():
+        ws = _SlowWS()
+        queue = ClientQueue(ws, maxsize=10, policy="conflate")
+        queue.put("AAPL 1", key="AAPL")
+        queue.put("MSFT 1", key="MSFT")
+        queue.put("AAPL 2", key="AAPL")
+        queue.start()
+        await asyncio.sleep(0.01)
+        queue.close()
+        return ws, queue
+
+    ws, queue = asyncio.run(scenario())
+    assert ws.sent == ["AAPL 2", "MSFT 1"]
+    assert queue.conflated == 1
+    assert queue.metrics()["sent"] == 2
+
+
+def test_disconnect_policy_closes_overflowing_client():
+    async def scenario():
+        closed = []
+        ws = _SlowWS()
+        queue = ClientQueue(ws, maxsize=1, policy="disconnect", on_close=closed.append)
+        assert queue.put("a") is True
+        assert queue.put("b") is False
+        await asyncio.sleep(0.01)
+        return ws, queue, closed
+
+    ws, queue, closed = asyncio.run(scenario())
+    assert queue.closed and closed == [queue]
+    assert ws.closed_with == 1013
+
+
+def test_slow_client_does_not_block_others():
+    async def scenario():
+        hub = Broadcaster("test-slow", maxsize=100, policy="drop_oldest")
+        slow, fast = _SlowWS(delay=0.5), _SlowWS()
+        hub.add(slow)
+        hub.add(fast)
+        for i in range(5):
+            hub.publish(str(i))
+        await asyncio.sleep(0.05)
+        result = (list(fast.sent), list(slow.sent))
+        hub.remove(slow)
+        hub.remove(fast)
+        return result
+
+    fast_sent, slow_sent = asyncio.run(scenario())
+    assert fast_sent == ["0", "1", "2", "3", "4"]
+    assert slow_sent == []
+
+
+def test_failed_client_is_removed():
+    async def scenario():
+        gone = []
+        hub = Broadcaster("test-fail", on_disconnect=gone.append)
+        bad = _SlowWS(fail=True)
+        hub.add(bad)
+        hub.publish("hello")
+        await asyncio.sleep(0.01)
+        return hub, bad, gone
+
+    hub, bad, gone = asyncio.run(scenario())
+    assert bad not in hub and gone == [bad]
+
+
+def test_publish_from_worker_thread():
+    async def scenario():
+        hub = Broadcaster("test-thread")
+        ws = _SlowWS()
+        hub.add(ws)
+        await asyncio.to_thread(hub.publish, "from thread")
+        await asyncio.sleep(0.01)
+        hub.remove(ws)
+        return ws
+
+    assert asyncio.run(scenario()).sent == ["from thread"]
@@ -1,7 +1,8 @@
 """Tests for multi-asset order support (options, futures, forex, non-US stocks)."""
 from unittest.mock import MagicMock, patch
 
-from backend.services.broker_service import BrokerService, _pending_orders
+from backend.models.pending_order import PendingOrder
+from backend.services.broker_service import BrokerService
 
 
 def test_submit_options_order(client):
@@ -110,7 +111,7 @@ def test_confirm_options_order_uses_contract_spec(db):
     result = svc.submit_order(
         symbol="AAPL", side="buy", qty=1, order_type="limit",
         asset_type="OPT", expiry="20260320", strike=200.0, right="C",
-        multiplier="100", limit_price=5.50,
+        multiplier="100", limit_price=5.50, user_id="test-user",
     )
     order_id = result["order_id"]
 
@@ -139,7 +140,7 @@ def test_confirm_stock_order_uses_submit_order(db):
     db.add(user)
     db.commit()
 
-    result = svc.submit_order(symbol="MSFT", side="buy", qty=5, order_type="market")
+    result = svc.submit_order(symbol="MSFT", side="buy", qty=5, order_type="market", user_id="test-user2")
     order_id = result["order_id"]
 
     mock_broker = MagicMock()
@@ -161,3 +162,130 @@ def test_needs_contract_spec_logic():
     assert svc._needs_contract_spec({"currency": "EUR"}) is True
     assert svc._needs_contract_spec({"asset_type": "STK", "exchange": "SMART", "currency": "USD"}) is False
     assert svc._needs_contract_spec({}) is False
+
+
+def test_thread_affine_proxy_pins_calls_to_one_thread():
+    """All calls through ThreadAffineProxy run on the thread that built the client."""
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    from backend.services.ib_session_service import ThreadAffineProxy
+
+    class Client:
+        def __init__(self):
+            self.owner = threading.get_ident()
+            self.paper = True
+
+        def whoami(self):
+            return threading.get_ident()
+
+    proxy = ThreadAffineProxy(Client)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        idents = set(pool.map(lambda _: proxy.whoami(), range(8)))
+    assert idents == {proxy.owner}
+    assert proxy.paper is True
+    proxy.close()
+
+
+def test_basket_confirms_all_legs_and_reports_failures_per_leg(db):
+    """A basket is confirmed in one call; a failing leg does not block the others."""
+    from backend.models.trade_history import TradeHistory
+
+    svc = BrokerService(db)
+    basket = svc.submit_basket([
+        {"symbol": "AAPL", "side": "buy", "qty": 3},
+        {"symbol": "BAD", "side": "buy", "qty": 1},
+        {"symbol": "MSFT", "side": "sell", "qty": 2, "order_type": "limit", "limit_price": 400.0},
+    ], user_id="basket-user")
+    assert basket["status"] == "pending_confirmation" and len(basket["legs"]) == 3
+    assert "limit=400.0" in basket["legs"][2]["summary"]
+
+    # Legs belong to the basket and cannot be confirmed one by one
+    assert "error" in svc.confirm_order(basket["legs"][0]["order_id"], "basket-user")
+
+    def send(broker, order):
+        if order["symbol"] == "BAD":
+            raise ValueError("rejected: unknown symbol")
+        return f"broker-{order['symbol']}"
+
+    with patch.object(svc, "_get_broker", return_value=MagicMock()), \
+            patch.object(svc, "_send", side_effect=send):
+        result = svc.confirm_basket(basket["basket_id"], "basket-user")
+
+    assert result["status"] == "partial"
+    assert (result["submitted"], result["failed"]) == (2, 1)
+    by_symbol = {leg["symbol"]: leg for leg in result["legs"]}
+    assert by_symbol["AAPL"]["broker_order"] == "broker-AAPL"
+    assert "rejected" in by_symbol["BAD"]["error"]
+    assert {t.symbol for t in db.query(TradeHistory).all()} == {"AAPL", "MSFT"}
+    # Confirming twice is a no-op
+    assert "error" in svc.confirm_basket(basket["basket_id"], "basket-user")
+    assert {r.status for r in db.query(PendingOrder).all()} == {"submitted", "failed"}
+    # Only the submitted legs count against the daily limit
+    from backend.services.safety_service import SafetyService
+    assert SafetyService(db).trades_today("basket-user") == 2
+
+
+def test_confirm_over_daily_limit_leaves_orders_pending(db):
+    from backend.models.user import User
+    from backend.services.safety_service import SafetyService
+
+    db.add(User(id="live", name="Live"))
+    db.commit()
+    SafetyService(db).update_settings("live", {"paper_trading": False, "max_daily_trades": 1})
+    svc = BrokerService(db)
+    basket = svc.submit_basket([{"symbol": "SPY", "side": "buy", "qty": 1}] * 2, user_id="live")
+
+    assert svc.confirm_basket(basket["basket_id"], "live") == {"error": "Daily trade limit reached"}
+    assert {r.status for r in db.query(PendingOrder).all()} == {"pending"}
+    assert SafetyService(db).trades_today("live") == 0
+
+
+def test_cancel_basket_drops_every_leg(db):
+    svc = BrokerService(db)
+    basket = svc.submit_basket([{"symbol": "SPY", "side": "buy", "qty": 1}] * 2, user_id="alice")
+    assert "error" in svc.cancel_basket(basket["basket_id"], "bob")
+    assert svc.cancel_basket(basket["basket_id"], "alice")["status"] == "cancelled"
+    assert {r.status for r in db.query(PendingOrder).all()} == {"cancelled"}
+
+
+def test_pending_orders_are_listed_per_user_and_expire(db):
+    from datetime import datetime, timedelta
+
+    from backend.models.user import User
+    from backend.services.broker_service import expire_pending_orders
+
+    db.add_all([User(id="alice", name="Alice"), User(id="bob", name="Bob")])
+    db.commit()
+    svc = BrokerService(db)
+    live = svc.submit_order(symbol="AAPL", side="buy", qty=1, user_id="alice")
+    stale = svc.submit_order(symbol="MSFT", side="buy", qty=1, user_id="alice")
+    svc.submit_order(symbol="TSLA", side="sell", qty=1, user_id="bob")
+    db.get(PendingOrder, stale["order_id"]).expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+
+    assert [o["order_id"] for o in svc.get_pending("alice")] == [live["order_id"]]
+    assert expire_pending_orders(db) == 1
+    assert db.get(PendingOrder, stale["order_id"]).status == "expired"
+    # An expired order can no longer be confirmed
+    assert "error" in svc.confirm_order(stale["order_id"], "alice")
+
+
+def test_orders_can_only_be_confirmed_or_cancelled_by_their_owner(db):
+    from backend.models.user import User
+
+    db.add_all([User(id="alice", name="Alice"), User(id="bob", name="Bob")])
+    db.commit()
+    svc = BrokerService(db)
+    order = svc.submit_order(symbol="AAPL", side="buy", qty=1, user_id="alice")["order_id"]
+    basket = svc.submit_basket([{"symbol": "SPY", "side": "buy", "qty": 1}] * 2, user_id="alice")
+
+    mock_broker = MagicMock()
+    with patch.object(svc, "_get_broker", return_value=mock_broker):
+        assert "error" in svc.confirm_order(order, "bob")
+        assert "error" in svc.confirm_basket(basket["basket_id"], "bob")
+    assert "error" in svc.cancel_order(order, "bob")
+    mock_broker.submit_order.assert_not_called()
+    assert {r.status for r in db.query(PendingOrder).all()} == {"pending"}
+
+    assert svc.cancel_order(order, "alice")["status"] == "cancelled"
@@ -0,0 +1,109 @@
+"""Tests for the process-wide broker client pool."""
+import pytest
+
+from backend.services.broker_pool import BrokerPool
+
+
+class _Client:
+    def __init__(self):
+        self.connected = True
+        self.disconnects = 0
+
+    def is_connected(self):
+        return self.connected
+
+    def disconnect(self):
+        self.disconnects += 1
+        self.connected = False
+
+
+def _pool(**kwargs):
+    built = []
+
+    def factory():
+        built.append(_Client())
+        return built[-1]
+
+    return BrokerPool(factories={"alpaca": factory, "ibkr": factory}, **kwargs), built
+
+
+def test_pool_reuses_one_client_per_kind():
+    pool, built = _pool(idle_timeout=60)
+    assert pool.get("ibkr") is pool.get("ibkr")
+    assert pool.get("alpaca") is not pool.get("ibkr")
+    assert len(built) == 2 and pool.stats()["reused"] == 2
+
+
+def test_pool_reconnects_unhealthy_client():
+    pool, built = _pool(idle_timeout=60)
+    first = pool.get("ibkr")
+    first.connected = False
+    second = pool.get("ibkr")
+    assert second is not first and len(built) == 2
+
+
+def test_pool_drops_client_on_connection_error():
+    pool, built = _pool(idle_timeout=60)
+    client = pool.get("ibkr")
+    with pytest.raises(ConnectionError):
+        with pool.lease(client):
+            raise ConnectionError("socket closed")
+    assert client.disconnects == 1
+    assert pool.get("ibkr") is not client
+
+
+def test_pool_closes_idle_clients_but_not_busy_ones():
+    pool, built = _pool(idle_timeout=0)
+    idle = pool.get("alpaca")
+    busy = pool.get("ibkr")
+    with pool.lease(busy):
+        assert pool.close_idle() == 1
+    assert idle.disconnects == 1 and busy.disconnects == 0
+
+
+def test_pool_concurrent_leases_balance_in_use():
+    from concurrent.futures import ThreadPoolExecutor
+
+    pool, _ = _pool(idle_timeout=60)
+    client = pool.get("ibkr")
+
+    def call(_):
+        with pool.lease(client):
+            return pool.stats()["clients"]["ibkr"]["in_use"]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assert all(n >= 1 for n in executor.map(call, range(200)))
+    assert pool.stats()["clients"]["ibkr"]["in_use"] == 0
+
+
+# --- Account / positions snapshot cache ---
+
+def test_snapshot_cache_serves_within_ttl_and_invalidates():
+    from backend.services.broker_service import SnapshotCache
+
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return {"equity": len(calls)}
+
+    cache = SnapshotCache(ttl=60)
+    value, age = cache.get(("alpaca", "account"), fetch)
+    again, age2 = cache.get(("alpaca", "account"), fetch)
+    assert value == again == {"equity": 1} and age == 0.0 and age2 >= 0.0
+    cache.invalidate()
+    assert cache.get(("alpaca", "account"), fetch)[0] == {"equity": 2}
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_snapshot_cache_discards_fetch_racing_an_invalidation():
+    from backend.services.broker_service import SnapshotCache
+
+    cache = SnapshotCache(ttl=60)
+
+    def fetch_then_order_fills():
+        cache.invalidate()  # an order goes out while the request is in flight
+        return ["stale"]
+
+    assert cache.get(("k",), fetch_then_order_fills)[0] == ["stale"]
+    assert cache.get(("k",), lambda: ["fresh"])[0] == ["fresh"]
@@ -0,0 +1,100 @@
+"""Tests for the cached LLM client."""
+from backend.services.llm_service import LLMClient, ResponseCache, fingerprint
+
+
+def test_fingerprint_normalizes_whitespace_and_includes_model():
+    assert fingerprint("Analyze  the\n portfolio ", "m1") == fingerprint("Analyze the portfolio", "m1")
+    assert fingerprint("Analyze the portfolio", "m1") != fingerprint("Analyze the portfolio", "m2")
+    assert fingerprint("p", "m1", temperature=0) != fingerprint("p", "m1", temperature=1)
+
+
+def test_client_reuses_provider_and_caches_on_disk(tmp_path):
+    client = LLMClient(provider="stub", cache=ResponseCache(str(tmp_path)), ttl=60, enabled=True)
+    first = client.generate("How is my portfolio?")
+    assert client.generate("How is my   portfolio?") == first
+    assert client.provider.calls == 1
+    assert (client.hits, client.misses) == (1, 1)
+
+    # Bypass switch still uses the same provider instance
+    client.generate("How is my portfolio?", use_cache=False)
+    assert client.provider.calls == 2
+
+    # Entries survive a new client (a restart) until they expire
+    restarted = LLMClient(provider="stub", cache=ResponseCache(str(tmp_path)), ttl=60, enabled=True)
+    assert restarted.generate("How is my portfolio?") == first
+    assert restarted.provider.calls == 0
+    assert restarted.generate("How is my portfolio?", ttl=0) == first
+    assert restarted.provider.calls == 1
+
+    disabled = LLMClient(provider="stub", cache=ResponseCache(str(tmp_path)), enabled=False)
+    disabled.generate("How is my portfolio?")
+    assert disabled.provider.calls == 1
+
+
+def test_stream_yields_chunks_without_blocking_the_loop(tmp_path):
+    import asyncio
+    import time
+
+    from backend.services.llm_service import astream
+
+    client = LLMClient(provider="stub", cache=ResponseCache(str(tmp_path)), ttl=60, enabled=True)
+
+    def slow_stream(prompt, **kwargs):
+        for word in ("one", " two", " three"):
+            time.sleep(0.1)
+            yield word
+
+    client.provider.stream = slow_stream
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        started = time.monotonic()
+        received = []
+        async for chunk in astream(client.stream("hi")):
+            received.append((chunk, time.monotonic() - started))
+        task.cancel()
+        return received, ticks
+
+    received, ticks = asyncio.run(scenario())
+    assert [c for c, _ in received] == ["one", " two", " three"]
+    assert received[0][1] < 0.2  # first token arrives before the answer is complete
+    assert ticks > 10  # the loop kept running other tasks meanwhile
+
+    # The completed stream was cached and replays as one chunk
+    assert list(client.stream("hi")) == ["one two three"]
+
+
+def test_claude_provider_streams_through_the_anthropic_client():
+    from contextlib import contextmanager
+    from types import SimpleNamespace
+
+    from backend.services.llm_service import ClaudeStreamingProvider
+
+    requests = []
+
+    @contextmanager
+    def stream(**params):
+        requests.append(params)
+        yield SimpleNamespace(text_stream=iter(["Risk ", "is ", "moderate."]))
+
+    class Provider:
+        model = "claude-test"
+        client = SimpleNamespace(messages=SimpleNamespace(stream=stream))
+
+        def generate(self, prompt, **kwargs):
+            raise AssertionError("stream must not fall back to generate")
+
+    provider = ClaudeStreamingProvider(Provider())
+    assert provider.model == "claude-test"
+    assert list(provider.stream("Assess my risk", max_tokens=256)) == ["Risk ", "is ", "moderate."]
+    assert requests == [{
+        "model": "claude-test", "messages": [{"role": "user", "content": "Assess my risk"}], "max_tokens": 256,
+    }]
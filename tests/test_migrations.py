@@ -0,0 +1,138 @@
+"""Tests for additive schema migrations of databases created before a model gained columns."""
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.core.database import Base
+from backend.core.migrations import migrate
+import backend.models  # noqa: F401
+
+# Tables as the baseline models created them
+BASELINE_DDL = [
+    """CREATE TABLE users (id VARCHAR NOT NULL, PRIMARY KEY (id))""",
+    """CREATE TABLE trade_history (
+        id INTEGER NOT NULL, user_id VARCHAR NOT NULL, symbol VARCHAR NOT NULL,
+        side VARCHAR NOT NULL, qty FLOAT NOT NULL, price FLOAT NOT NULL,
+        timestamp DATETIME NOT NULL, asset_type VARCHAR, exchange VARCHAR,
+        currency VARCHAR, expiry VARCHAR, strike FLOAT, "right" VARCHAR,
+        PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES users (id)
+    )""",
+    "INSERT INTO trade_history (id, user_id, symbol, side, qty, price, timestamp)"
+    " VALUES (1, 'default', 'AAPL', 'buy', 5, 190.0, '2024-01-02 15:30:00')",
+    """CREATE TABLE alert_configs (
+        id INTEGER NOT NULL, user_id VARCHAR NOT NULL, alert_type VARCHAR NOT NULL,
+        condition TEXT NOT NULL, enabled BOOLEAN NOT NULL,
+        PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES users (id)
+    )""",
+    "INSERT INTO alert_configs (id, user_id, alert_type, condition, enabled)"
+    """ VALUES (1, 'default', 'price', '{"symbol": "SPY", "above": 500}', 1)""",
+    """CREATE TABLE ai_conversations (
+        id INTEGER NOT NULL, user_id VARCHAR NOT NULL, messages TEXT NOT NULL,
+        created_at DATETIME NOT NULL,
+        PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES users (id)
+    )""",
+    """CREATE TABLE settings (
+        id INTEGER NOT NULL, user_id VARCHAR NOT NULL, "key" VARCHAR NOT NULL, value TEXT NOT NULL,
+        PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES users (id)
+    )""",
+    """INSERT INTO settings (id, user_id, "key", value) VALUES (1, 'default', 'safety', '{"kill_switch": false}')""",
+    "INSERT INTO ai_conversations (id, user_id, messages, created_at) VALUES (1, 'default', '"
+    '[{"role": "user", "content": "Is SPY overbought?"}, {"role": "assistant", "content": "RSI is 71."}]'
+    "', '2024-01-02 15:30:00')",
+]
+
+
+def _baseline_engine():
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    with engine.begin() as conn:
+        for statement in BASELINE_DDL:
+            conn.exec_driver_sql(statement)
+    Base.metadata.create_all(bind=engine)  # as init_db does: new tables only
+    return engine
+
+
+def _columns(engine, table):
+    with engine.connect() as conn:
+        return {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+
+
+def _indexes(engine, table):
+    with engine.connect() as conn:
+        return {row[1] for row in conn.exec_driver_sql(f"PRAGMA index_list({table})")}
+
+
+def test_migrate_adds_trade_history_columns_to_baseline_db():
+    from backend.models.trade_history import TradeHistory
+
+    engine = _baseline_engine()
+    added = migrate(engine)
+    assert {"trade_history.status", "trade_history.broker_order_id"} <= set(added)
+    assert {"status", "filled_qty", "filled_at"} <= _columns(engine, "trade_history")
+    assert "ix_trade_history_broker_order_id" in _indexes(engine, "trade_history")
+
+    db = sessionmaker(bind=engine)()
+    old = db.get(TradeHistory, 1)
+    assert (old.symbol, old.status) == ("AAPL", None)
+    db.add(TradeHistory(user_id="default", symbol="MSFT", side="buy", qty=1, price=0.0, status="submitted"))
+    db.commit()
+    assert db.query(TradeHistory).filter(TradeHistory.status == "submitted").count() == 1
+    db.close()
+
+
+def test_migrate_adds_alert_state_columns_to_baseline_db():
+    from backend.models.alert_config import AlertConfig
+    from backend.services.alert_service import AlertService
+
+    engine = _baseline_engine()
+    migrate(engine)
+    db = sessionmaker(bind=engine)()
+    # Existing alerts start armed with nothing suppressed
+    alert = db.get(AlertConfig, 1)
+    assert (alert.state, alert.last_fired_at, alert.suppressed_count) == ("armed", None, 0)
+    assert [a.id for a in AlertService(db).get_alerts("default")] == [1]
+    db.close()
+
+
+def test_migrate_lets_legacy_conversations_load_and_new_ones_save(monkeypatch):
+    from backend.services import llm_service
+    from backend.services.ai_service import AIService
+    from backend.services.llm_service import LLMClient
+
+    monkeypatch.setattr(llm_service, "_client", LLMClient(provider="stub", enabled=False))
+
+    engine = _baseline_engine()
+    migrate(engine)
+    db = sessionmaker(bind=engine)()
+    convs = AIService(db).get_conversations("default")
+    assert [(c.id, c.title) for c in convs] == [(1, "Is SPY overbought?")]
+    assert convs[0].updated_at == convs[0].created_at
+
+    page = AIService(db).get_messages(1, "default")
+    assert [m["content"] for m in page["messages"]] == ["Is SPY overbought?", "RSI is 71."]
+
+    # The legacy messages column is still NOT NULL; new conversations must save
+    result = AIService(db).chat("default", "And QQQ?")
+    assert AIService(db).get_messages(result["conversation_id"], "default")["message_count"] == 2
+    db.close()
+
+
+def test_migrate_adds_settings_version_to_baseline_db():
+    from backend.services.safety_service import SafetyService
+
+    engine = _baseline_engine()
+    assert "settings.version" in migrate(engine)
+    db = sessionmaker(bind=engine)()
+    assert SafetyService(db).can_trade("default") is True
+    SafetyService(db).activate_kill_switch("default")
+    assert SafetyService(db).can_trade("default") is False
+    db.close()
+
+
+def test_migrate_is_idempotent_and_skips_fresh_databases():
+    engine = _baseline_engine()
+    migrate(engine)
+    assert migrate(engine) == []
+
+    fresh = create_engine("sqlite:///:memory:", poolclass=StaticPool)
+    Base.metadata.create_all(bind=fresh)
+    assert migrate(fresh) == []
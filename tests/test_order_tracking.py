@@ -0,0 +1,74 @@
+"""Tests for order status tracking and fill capture."""
+from types import SimpleNamespace
+
+from backend.models.trade_history import TradeHistory
+from backend.services.order_tracking_service import (
+    OrderTracker,
+    broker_order_id,
+    fetch_order_updates,
+    normalize_status,
+)
+
+
+class _Broker:
+    def __init__(self, open_orders, closed=None):
+        self.open_orders = open_orders
+        self.closed = closed or {}
+        self.calls = []
+
+    def get_orders(self):
+        self.calls.append("get_orders")
+        return self.open_orders
+
+    def get_order(self, order_id):
+        self.calls.append(order_id)
+        return self.closed[order_id]
+
+
+def _trade(db, oid, symbol="AAPL"):
+    trade = TradeHistory(
+        user_id="default", symbol=symbol, side="buy", qty=10, price=0.0,
+        broker_order_id=oid, status="submitted",
+    )
+    db.add(trade)
+    db.commit()
+    return trade
+
+
+def test_normalize_status_and_order_id():
+    assert normalize_status("Filled") == "filled"
+    assert normalize_status(SimpleNamespace(value="partially_filled")) == "partially_filled"
+    assert normalize_status("OrderStatus.CANCELED") == "cancelled"
+    assert normalize_status("PreSubmitted") == "submitted"
+    assert broker_order_id(SimpleNamespace(id="abc")) == "abc"
+    assert broker_order_id({"order_id": 42}) == "42"
+    assert broker_order_id(None) is None
+
+
+def test_fetch_order_updates_uses_one_bulk_call_for_open_orders():
+    broker = _Broker(
+        open_orders=[SimpleNamespace(id="1", status="partially_filled", filled_qty="4", filled_avg_price="101.5")],
+        closed={"2": SimpleNamespace(id="2", status="filled", filled_qty=10, filled_avg_price=99.0)},
+    )
+    updates = fetch_order_updates(broker, ["1", "2"])
+    assert broker.calls == ["get_orders", "2"]  # only the completed order is looked up
+    assert updates["1"] == {"status": "partially_filled", "filled_qty": 4.0, "fill_price": 101.5}
+    assert updates["2"]["status"] == "filled"
+
+
+def test_tracker_records_fills_and_ignores_unchanged_orders(db):
+    filled = _trade(db, "1")
+    waiting = _trade(db, "2", symbol="MSFT")
+    broker = _Broker(open_orders=[
+        SimpleNamespace(id="1", status="filled", filled_qty=10, filled_avg_price=190.25),
+        SimpleNamespace(id="2", status="new", filled_qty=0, filled_avg_price=None),
+    ])
+    events = OrderTracker(db).poll_once(broker)
+
+    assert [(e["type"], e["symbol"], e["status"]) for e in events] == [("fill", "AAPL", "filled")]
+    db.refresh(filled)
+    assert (filled.price, filled.filled_qty, filled.status) == (190.25, 10.0, "filled")
+    assert filled.filled_at is not None
+    assert waiting.status == "submitted" and waiting.price == 0.0
+    # Filled orders are no longer polled
+    assert [t.broker_order_id for t in OrderTracker(db).open_trades()] == ["2"]
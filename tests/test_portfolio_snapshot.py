@@ -0,0 +1,151 @@
+"""Tests for the shared portfolio snapshot."""
+import time
+
+import pytest
+
+from backend.core.config import settings
+from backend.services import portfolio_snapshot_service as snap_module
+from backend.services.broker_service import BrokerService
+from backend.services.portfolio_snapshot_service import PortfolioSnapshotService, invalidate_portfolio_snapshots
+
+
+@pytest.fixture
+def sources(monkeypatch):
+    monkeypatch.setattr(snap_module, "_store", snap_module._SnapshotStore())
+    monkeypatch.setattr(settings, "portfolio_snapshot_timeout", 0.5)
+    state = {
+        "positions": [{"symbol": "SPY", "qty": 3, "current_price": 100.0},
+                      {"symbol": "QQQ", "qty": 1, "current_price": 100.0}],
+        "calls": {"positions": 0, "returns": 0, "assess": 0, "factors": 0},
+        "delay": 0.2,
+        "account_delay": None,  # defaults to "delay"
+        "returns_delay": 0.0,
+    }
+
+    def positions(self):
+        state["calls"]["positions"] += 1
+        time.sleep(state["delay"])
+        return [dict(p) for p in state["positions"]]
+
+    def account(self):
+        time.sleep(state["delay"] if state["account_delay"] is None else state["account_delay"])
+        return {"equity": 400.0}, 0.0
+
+    class FakeRisk:
+        def returns_matrix(self, symbols, start, end):
+            state["calls"]["returns"] += 1
+            time.sleep(state["returns_delay"])
+            return tuple(symbols)
+
+        def assess(self, returns, weights):
+            state["calls"]["assess"] += 1
+            return {"risk": {"symbols": list(returns), "weights": weights}}
+
+    def factors(symbols, start, end):
+        state["calls"]["factors"] += 1
+        raise RuntimeError("factor data unavailable")
+
+    import backend.services.risk_service as risk_module
+    monkeypatch.setattr(BrokerService, "get_positions", positions)
+    monkeypatch.setattr(BrokerService, "get_account_snapshot", account)
+    monkeypatch.setattr(risk_module, "RiskService", FakeRisk)
+    monkeypatch.setattr(snap_module, "_factor_exposure", factors)
+    return state
+
+
+def test_snapshot_fetches_sources_concurrently_and_tolerates_failures(db, sources):
+    started = time.monotonic()
+    snap = PortfolioSnapshotService(db).get()
+    assert time.monotonic() - started < 0.35  # positions and account overlap
+
+    assert snap["weights"] == {"SPY": 0.75, "QQQ": 0.25}
+    assert snap["account"] == {"equity": 400.0}
+    assert snap["portfolio_risk"]["risk"]["symbols"] == ["QQQ", "SPY"]
+    assert snap["factor_exposure"] == {} and snap["parts"]["factor_exposure"] is None
+    assert snap["version"] > 0 and snap["age"] < 1.0
+
+
+def test_analytics_start_without_waiting_for_the_account(db, sources):
+    sources.update(delay=0.1, account_delay=0.4, returns_delay=0.3)
+    started = time.monotonic()
+    snap = PortfolioSnapshotService(db).get()
+    # Positions (0.1s) then analytics (0.3s) overlap the slow account call (0.4s)
+    assert time.monotonic() - started < 0.55
+    assert snap["account"] == {"equity": 400.0} and snap["portfolio_risk"]
+
+
+def test_snapshot_recomputes_only_changed_parts(db, sources):
+    svc = PortfolioSnapshotService(db)
+    first = svc.get()
+    calls = dict(sources["calls"])
+
+    # Fresh enough: served without touching the broker or analytics
+    again = svc.get()
+    assert again["version"] == first["version"]
+    assert sources["calls"]["positions"] == calls["positions"]
+
+    # Same holdings and weights after a fill: refetch positions, reuse returns and risk
+    invalidate_portfolio_snapshots()
+    svc.get()
+    assert sources["calls"]["positions"] == calls["positions"] + 1
+    assert sources["calls"]["returns"] == calls["returns"]
+    assert sources["calls"]["assess"] == calls["assess"]
+
+    # Weights change: risk is reassessed on the cached returns matrix
+    sources["positions"][0]["qty"] = 1
+    invalidate_portfolio_snapshots()
+    snap = svc.get()
+    assert snap["version"] > first["version"]
+    assert sources["calls"]["returns"] == calls["returns"]
+    assert sources["calls"]["assess"] == calls["assess"] + 1
+    assert snap["portfolio_risk"]["risk"]["weights"] == [0.5, 0.5]
+
+
+def test_slow_source_times_out_and_keeps_previous_value(db, sources):
+    svc = PortfolioSnapshotService(db)
+    first = svc.get(analytics=False)
+    sources["delay"] = 2.0
+    started = time.monotonic()
+    snap = svc.get(analytics=False, max_age=0)
+    assert time.monotonic() - started < 1.0
+    assert snap["positions"] == first["positions"]  # stale but served
+
+
+def test_concurrent_readers_share_one_refresh(db, sources):
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        snaps = list(pool.map(lambda _: PortfolioSnapshotService(db).get(analytics=False), range(4)))
+    assert sources["calls"]["positions"] == 1
+    assert {s["version"] for s in snaps} == {snaps[0]["version"]}
+
+
+def test_fresh_snapshot_is_served_while_another_reader_refreshes(db, sources):
+    import threading
+
+    svc = PortfolioSnapshotService(db)
+    svc.get(analytics=False)
+    sources["delay"] = 0.5
+    slow = threading.Thread(target=svc.get, kwargs={"analytics": False, "max_age": 0})
+    slow.start()
+    time.sleep(0.05)
+    started = time.monotonic()
+    snap = svc.get(analytics=False)  # within the TTL: no need to wait for the refresh
+    assert time.monotonic() - started < 0.2 and snap["positions"]
+    slow.join()
+
+
+def test_snapshot_without_positions_is_json_safe(db, monkeypatch):
+    import json
+
+    monkeypatch.setattr(snap_module, "_store", snap_module._SnapshotStore())
+    monkeypatch.setattr(settings, "portfolio_snapshot_timeout", 0.5)
+
+    def no_broker(self):
+        raise ConnectionError("no broker configured")
+
+    monkeypatch.setattr(BrokerService, "get_positions", no_broker)
+    monkeypatch.setattr(BrokerService, "get_account_snapshot", no_broker)
+    snap = PortfolioSnapshotService(db).get()
+    assert snap["age"] is None and snap["positions"] == []
+    json.dumps(snap, allow_nan=False)
@@ -0,0 +1,78 @@
+"""Tests for the vectorized pre-trade risk checks."""
+from unittest.mock import patch
+
+from backend.services.pretrade_risk_service import PreTradeRiskEngine
+
+
+def _order(symbol, side, qty, **kw):
+    return {"symbol": symbol, "side": side, "qty": qty, **kw}
+
+
+def test_position_limit_nets_legs_per_symbol():
+    engine = PreTradeRiskEngine(max_position_pct=0.10, large_order_threshold=50_000)
+    orders = [
+        _order("AAPL", "buy", 30),  # 30 * 200 = 6% of equity on its own...
+        _order("AAPL", "buy", 30),  # ...but the basket takes AAPL to 12%
+        _order("MSFT", "buy", 10),
+        _order("TSLA", "sell", 40),  # reduces an existing long
+    ]
+    results = engine.check(
+        orders, positions={"TSLA": 50}, prices={"AAPL": 200.0, "MSFT": 400.0, "TSLA": 250.0},
+        equity=100_000,
+    )
+    assert [r["accepted"] for r in results] == [False, False, True, True]
+    assert "12.0% of equity" in results[0]["reasons"][0]
+
+
+def test_large_orders_are_flagged_not_rejected():
+    engine = PreTradeRiskEngine(max_position_pct=1.0, large_order_threshold=1000)
+    results = engine.check(
+        [_order("SAP", "buy", 10, limit_price=180.0), _order("ES", "buy", 1)],
+        positions={}, prices={}, equity=None,
+    )
+    assert results[0]["accepted"] and results[0]["large"] and results[0]["notional"] == 1800.0
+    assert results[1]["accepted"] and results[1]["notional"] is None
+    assert "no price" in results[1]["warnings"][0]
+
+
+def test_basket_stages_only_accepted_legs(db):
+    from backend.services.broker_service import BrokerService
+
+    def fake_check(db, user_id, orders):
+        return [
+            {"accepted": o["symbol"] != "BIG", "reasons": ["too big"] if o["symbol"] == "BIG" else [],
+             "warnings": [], "notional": None, "large": False}
+            for o in orders
+        ]
+
+    with patch("backend.services.broker_service.check_orders", side_effect=fake_check):
+        svc = BrokerService(db)
+        basket = svc.submit_basket([_order("SPY", "buy", 1), _order("BIG", "buy", 1000)])
+        single = svc.submit_order("BIG", "buy", 1000)
+
+    assert len(basket["legs"]) == 1 and basket["rejected"][0]["reasons"] == ["too big"]
+    assert single["status"] == "rejected" and "order_id" not in single
+
+
+def test_check_orders_prices_from_the_fresher_of_stream_and_broker(db, monkeypatch):
+    import time
+
+    from backend.services.broker_service import BrokerService
+    from backend.services.price_hub import price_hub
+    from backend.services.pretrade_risk_service import check_orders
+
+    now = time.time()
+    hub_quotes = {"AAPL": (210.0, now - 1), "MSFT": (500.0, now - 3600), "TSLA": (260.0, now - 50)}
+    monkeypatch.setattr(price_hub, "last_prices", lambda symbols=None: {
+        s: q for s, q in hub_quotes.items() if symbols is None or s in set(symbols)
+    })
+    held = [
+        {"symbol": "AAPL", "qty": 0, "current_price": 200.0},
+        {"symbol": "TSLA", "qty": 0, "current_price": 250.0},
+    ]
+    monkeypatch.setattr(BrokerService, "get_positions_snapshot", lambda self: (held, 5.0))
+    monkeypatch.setattr(BrokerService, "get_account_snapshot", lambda self: ({"equity": 1e9}, 5.0))
+
+    results = check_orders(db, None, [_order("AAPL", "buy", 1), _order("MSFT", "buy", 1), _order("TSLA", "buy", 1)])
+    # AAPL: the live quote is newer; MSFT: the stale quote is dropped; TSLA: the broker's price is newer
+    assert [r["notional"] for r in results] == [210.0, None, 250.0]
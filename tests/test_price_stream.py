@@ -0,0 +1,369 @@
+"""Tests for the streaming price engine and feed adapters."""
+import asyncio
+
+from backend.services.price_stream_service import (
+    PollingFeed,
+    PriceFeed,
+    PriceStreamEngine,
+    SimulatedFeed,
+)
+
+
+def test_simulated_feed_is_deterministic():
+    a, b = SimulatedFeed(seed=7), SimulatedFeed(seed=7)
+    a.subscribe({"AAPL", "MSFT"})
+    b.subscribe({"MSFT", "AAPL"})
+    assert [a.step() for _ in range(5)] == [b.step() for _ in range(5)]
+
+
+def test_simulated_feed_only_steps_subscribed_symbols():
+    feed = SimulatedFeed(seed=1)
+    feed.subscribe({"SPY", "QQQ"})
+    feed.unsubscribe({"QQQ"})
+    prices = feed.step()
+    assert set(prices) == {"SPY"}
+    assert prices["SPY"] > 0
+
+
+def test_polling_feed_falls_back_to_yfinance(monkeypatch):
+    from backend.services import price_stream_service
+
+    def broken(symbols):
+        raise ConnectionError("down")
+
+    monkeypatch.setattr(price_stream_service, "_fetch_yfinance", lambda s: {sym: 1.0 for sym in s})
+    feed = PollingFeed(fetcher=broken, interval=60)
+    feed.subscribe({"SPY"})
+    assert feed.poll_once() == {"SPY": 1.0}
+
+
+def test_engine_delivers_ticks_on_event_loop():
+    async def scenario():
+        ticks = []
+        feed = SimulatedFeed(rate=50, seed=3)
+        engine = PriceStreamEngine(lambda s, p, t: ticks.append((s, p)), feed=feed)
+        engine.start()
+        engine.subscribe({"AAPL"})
+        for _ in range(100):
+            if ticks:
+                break
+            await asyncio.sleep(0.02)
+        engine.stop()
+        return ticks
+
+    ticks = asyncio.run(scenario())
+    assert ticks and ticks[0][0] == "AAPL"
+
+
+class _FailingFeed(PriceFeed):
+    name = "failing"
+    stopped = False
+
+    def _run(self):
+        raise ConnectionError("stream refused")
+
+    def stop(self):
+        super().stop()
+        self.stopped = True
+
+
+def test_engine_falls_back_to_polling_when_stream_fails(monkeypatch):
+    from backend.services import price_stream_service
+
+    monkeypatch.setattr(price_stream_service, "_resolve_fetcher", lambda: lambda s: {x: 2.0 for x in s})
+
+    async def scenario():
+        ticks = []
+        failed = _FailingFeed()
+        engine = PriceStreamEngine(lambda s, p, t: ticks.append((s, p)), feed=failed)
+        engine.subscribe({"SPY"})
+        engine.start()
+        for _ in range(100):
+            if ticks:
+                break
+            await asyncio.sleep(0.02)
+        engine.stop()
+        return engine, ticks, failed
+
+    engine, ticks, failed = asyncio.run(scenario())
+    assert failed.stopped  # detached before the poller starts
+    assert isinstance(engine.feed, PollingFeed)
+    assert engine.feed.symbols == {"SPY"}
+    assert ticks == [("SPY", 2.0)]
+
+
+# --- Subscription index / hub fan-out ---
+
+class _FakeWS:
+    def __init__(self, fail: bool = False):
+        self.sent: list[str] = []
+        self.fail = fail
+
+    async def send_text(self, text: str):
+        if self.fail:
+            raise RuntimeError("closed")
+        self.sent.append(text)
+
+
+def test_subscription_index_tracks_first_and_last_subscriber():
+    from backend.services.price_hub import SubscriptionIndex
+
+    index = SubscriptionIndex()
+    a, b = object(), object()
+    assert index.subscribe(a, "AAPL") is True
+    assert index.subscribe(b, "AAPL") is False
+    assert index.subscribe(a, "AAPL") is False
+    assert index.subscribers("AAPL") == {a, b}
+    assert index.unsubscribe(a, "AAPL") is False
+    assert index.unsubscribe(b, "AAPL") is True
+    assert index.symbols() == set()
+
+
+def test_subscription_index_remove_connection_returns_orphans():
+    from backend.services.price_hub import SubscriptionIndex
+
+    index = SubscriptionIndex()
+    a, b = object(), object()
+    index.subscribe(a, "AAPL")
+    index.subscribe(a, "MSFT")
+    index.subscribe(b, "MSFT")
+    assert index.remove_connection(a) == {"AAPL"}
+    assert index.symbols() == {"MSFT"}
+    assert a not in index
+
+
+def test_hub_broadcast_reaches_only_interested_clients():
+    from backend.services.price_hub import PriceHub
+
+    async def scenario():
+        hub = PriceHub(feed=SimulatedFeed())
+        aapl, msft, dead = _FakeWS(), _FakeWS(), _FakeWS(fail=True)
+        for ws in (aapl, msft, dead):
+            hub.connect(ws)
+        hub.subscribe(aapl, "AAPL")
+        hub.subscribe(msft, "MSFT")
+        hub.subscribe(dead, "AAPL")
+        await hub.broadcast("AAPL", 190.0, 1.0)
+        await asyncio.sleep(0.01)  # let the writer tasks drain
+        symbols = hub.index.symbols()
+        for ws in (aapl, msft):
+            hub.disconnect(ws)
+        return aapl, msft, dead, symbols, hub
+
+    aapl, msft, dead, symbols, hub = asyncio.run(scenario())
+    assert len(aapl.sent) == 1 and msft.sent == []
+    assert symbols == {"AAPL", "MSFT"}  # dead client dropped, AAPL still wanted
+    assert hub._engine is None
+
+
+# --- Batched frames ---
+
+def test_encode_price_frame_formats():
+    import json
+
+    from backend.services.price_hub import encode_price_frame
+
+    updates = [("AAPL", 190.5, 1.0), ("MSFT", 410.0, 1.0)]
+    frame = json.loads(encode_price_frame(updates))
+    assert frame["type"] == "prices"
+    assert frame["data"][0] == {"symbol": "AAPL", "price": 190.5, "timestamp": 1.0}
+    compact = json.loads(encode_price_frame(updates, "compact"))
+    assert compact["data"] == [["AAPL", 190.5, 1.0], ["MSFT", 410.0, 1.0]]
+
+
+def test_negotiate_encoding_defaults_to_json():
+    from backend.services.price_hub import negotiate_encoding
+
+    assert negotiate_encoding(None) == "json"
+    assert negotiate_encoding("COMPACT") == "compact"
+    assert negotiate_encoding("xml") == "json"
+
+
+def test_hub_sends_one_shared_frame_per_client_per_tick():
+    from backend.services.price_hub import PriceHub
+
+    async def scenario():
+        hub = PriceHub(feed=SimulatedFeed(), batch_interval=0.01)
+        a, b, c = _FakeWS(), _FakeWS(), _FakeWS()
+        for ws in (a, b, c):
+            hub.connect(ws)
+        for ws in (a, b):
+            hub.subscribe(ws, "AAPL")
+            hub.subscribe(ws, "MSFT")
+        hub.subscribe(c, "MSFT")
+        hub._on_tick("AAPL", 190.0, 1.0)
+        hub._on_tick("MSFT", 410.0, 1.0)
+        hub._on_tick("AAPL", 191.0, 1.1)  # superseded within the same tick
+        await asyncio.sleep(0.05)
+        for ws in (a, b, c):
+            hub.disconnect(ws)
+        return a, b, c
+
+    a, b, c = asyncio.run(scenario())
+    assert len(a.sent) == 1 and a.sent == b.sent
+    assert a.sent[0] is b.sent[0]  # serialized once, shared
+    assert '"price": 191.0' in a.sent[0] and "MSFT" in a.sent[0]
+    assert len(c.sent) == 1 and "AAPL" not in c.sent[0]
+
+
+# --- Last-value cache ---
+
+def test_hub_suppresses_unchanged_and_sub_threshold_ticks():
+    from backend.services.price_hub import PriceHub
+
+    async def scenario():
+        hub = PriceHub(feed=SimulatedFeed(), min_tick=0.05)
+        ws = _FakeWS()
+        hub.connect(ws)
+        hub.subscribe(ws, "AAPL")
+        for price, ts in [(190.00, 1.0), (190.00, 2.0), (190.01, 3.0), (190.10, 4.0)]:
+            await hub.broadcast("AAPL", price, ts)
+            await asyncio.sleep(0.01)
+        hub.disconnect(ws)
+        return ws, hub
+
+    ws, hub = asyncio.run(scenario())
+    assert len(ws.sent) == 2
+    assert hub.last["AAPL"] == (190.10, 4.0)
+    assert hub.last_prices(["AAPL", "MSFT"]) == {"AAPL": (190.10, 4.0)}
+    snapshot = hub.last_prices()
+    snapshot["MSFT"] = (1.0, 1.0)  # a copy: readers on other threads never see the live dict
+    assert "MSFT" not in hub.last
+
+
+def test_hub_caches_ticks_without_subscribers():
+    from backend.services.price_hub import PriceHub
+
+    hub = PriceHub(feed=SimulatedFeed(), min_tick=0.05)
+    hub._on_tick("SPY", 500.0, 1.0)  # e.g. pinned for alerts, no client watching
+    hub._on_tick("SPY", 500.01, 2.0)
+    assert hub.last_prices(["SPY"]) == {"SPY": (500.01, 2.0)}
+    assert not hub._pending
+
+
+def test_hub_sends_snapshot_on_subscribe():
+    import json
+
+    from backend.services.price_hub import PriceHub
+
+    async def scenario():
+        hub = PriceHub(feed=SimulatedFeed())
+        first, late = _FakeWS(), _FakeWS()
+        hub.connect(first)
+        hub.subscribe(first, "SPY")
+        await hub.broadcast("SPY", 500.0, 1.0)
+        hub.connect(late)
+        hub.subscribe(late, "SPY", "QQQ")
+        await asyncio.sleep(0.01)
+        for ws in (first, late):
+            hub.disconnect(ws)
+        return late
+
+    late = asyncio.run(scenario())
+    assert len(late.sent) == 1
+    assert json.loads(late.sent[0])["data"] == [{"symbol": "SPY", "price": 500.0, "timestamp": 1.0}]
+
+
+# --- yfinance fallback path ---
+
+def test_circuit_breaker_opens_and_half_opens(monkeypatch):
+    from backend.services import price_stream_service
+    from backend.services.price_stream_service import CircuitBreaker
+
+    now = [1000.0]
+    monkeypatch.setattr(price_stream_service.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(threshold=2, cooldown=60)
+    breaker.failure("BAD")
+    assert breaker.allow("BAD")
+    breaker.failure("BAD")
+    assert not breaker.allow("BAD")
+    now[0] += 61
+    assert breaker.allow("BAD")  # one trial request
+    breaker.failure("BAD")
+    assert not breaker.allow("BAD")
+    breaker.success("BAD")
+    assert breaker.allow("BAD")
+
+
+def test_fetch_yfinance_batches_and_retries_missing(monkeypatch):
+    from backend.services import price_stream_service
+    from backend.services.price_stream_service import CircuitBreaker
+
+    batches = []
+
+    def fake_batch(symbols):
+        batches.append(list(symbols))
+        return {s: 10.0 for s in symbols if s not in ("ODD", "DEAD")}
+
+    def fake_single(symbol):
+        if symbol == "DEAD":
+            raise ValueError("no data")
+        return 20.0
+
+    monkeypatch.setattr(price_stream_service, "_yf_download_batch", fake_batch)
+    monkeypatch.setattr(price_stream_service, "_yf_fast_info", fake_single)
+    monkeypatch.setattr(price_stream_service, "_yf_breaker", CircuitBreaker(threshold=1, cooldown=600))
+    monkeypatch.setattr(price_stream_service.settings, "yfinance_batch_size", 2)
+
+    symbols = ["A", "B", "C", "ODD", "DEAD"]
+    prices = price_stream_service._fetch_yfinance(symbols)
+    assert sorted(map(len, batches)) == [1, 2, 2]
+    assert prices == {"A": 10.0, "B": 10.0, "C": 10.0, "ODD": 20.0}
+
+    # DEAD tripped the breaker and is no longer requested
+    batches.clear()
+    price_stream_service._fetch_yfinance(symbols)
+    assert "DEAD" not in sum(batches, [])
+
+
+def test_collect_cancels_unfinished_requests(monkeypatch):
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from backend.services import price_stream_service
+
+    monkeypatch.setitem(price_stream_service._yf_stats, "timeouts", 0)
+    release = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=1)
+    try:
+        hung = pool.submit(release.wait)
+        queued = pool.submit(lambda: 1.0)
+        assert price_stream_service._collect({hung: "HUNG", queued: "QUEUED"}, timeout=0.05) == {}
+        assert queued.cancelled()
+        assert price_stream_service._yf_stats["timeouts"] == 2
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+# --- Simulated universe / load-test helpers ---
+
+def test_simulated_universe_ticks_without_subscribers():
+    feed = SimulatedFeed(seed=5, start_price=None, n_symbols=3)
+    prices = feed.step()
+    assert set(prices) == {"SIM0000", "SIM0001", "SIM0002"}
+    # Start prices are seeded per symbol, so symbols do not all sit at one level
+    assert len({round(p) for p in prices.values()}) > 1
+
+
+def test_simulated_start_price_independent_of_subscription_order():
+    a = SimulatedFeed(seed=2, start_price=None)
+    b = SimulatedFeed(seed=2, start_price=None)
+    a.subscribe({"AAPL"})
+    b.subscribe({"ZZZ"})
+    assert a._initial_price("AAPL") == b._initial_price("AAPL")
+
+
+def test_loadtest_percentile_and_queue_summary():
+    from backend.tools.ws_loadtest import percentile, summarize_queues
+
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 95) == 0.0
+    queues = {"prices": [
+        {"depth": 2, "dropped": 1, "conflated": 4, "max_lag_ms": 3.0},
+        {"depth": 0, "dropped": 0, "conflated": 1, "max_lag_ms": 9.5},
+    ]}
+    assert summarize_queues(queues)["prices"] == {
+        "connections": 2, "dropped": 1, "conflated": 5, "max_depth": 2, "max_lag_ms": 9.5,
+    }